@@ -0,0 +1,60 @@
+"""
+Batch bodies encoded per second on one core: fresh dicts with uuid4 ids through json.dumps,
+as simulations.utils.generate_transactions and the former BatchSender did, against bodies
+rendered from a PayloadPool template.
+"""
+import argparse
+import json
+import time
+from uuid import uuid4
+
+from simulations.payload_pool import PayloadPool
+
+BATCH_SIZES = [3, 100, 500, 2000]
+DURATION = 2.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Batch body encoding rate: fresh dicts against templates.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES, help="Transactions per batch.")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds per measurement.")
+    return parser.parse_args()
+
+
+def fresh_dicts(batch_size: int) -> bytes:
+    return json.dumps([{"operation": "foo", "serial": str(uuid4()), "version": 6}
+                       for _ in range(batch_size)]).encode()
+
+
+def bodies_per_second(encode, batch_size: int, duration: float) -> float:
+    bodies = 0
+    start_time = time.perf_counter()
+    deadline = start_time + duration
+    while time.perf_counter() < deadline:
+        for _ in range(10):
+            encode(batch_size)
+        bodies += 10
+    return bodies / (time.perf_counter() - start_time)
+
+
+def generators():
+    pool = PayloadPool(batch_sizes=[1], transaction={"operation": "foo", "serial": None, "version": 6},
+                       id_field="serial")
+    yield "fresh dicts", fresh_dicts
+    try:
+        from simulations.utils import generate_transactions
+    except ImportError as error:
+        print(f"generate_transactions skipped, simulations.utils is not importable: {error}")
+    else:
+        yield "generate_transactions", lambda batch_size: json.dumps(generate_transactions(batch_size)).encode()
+    yield "payload pool", pool.body
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    encoders = list(generators())
+    for batch_size in args.batch_sizes:
+        rates = {name: bodies_per_second(encode, batch_size, args.duration) for name, encode in encoders}
+        baseline = rates["fresh dicts"]
+        print(f"batch size {batch_size}: " + ", ".join(
+            f"{name} {rate:,.0f} bodies/s ({rate / baseline:.1f}x)" for name, rate in rates.items()))
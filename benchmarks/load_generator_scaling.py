@@ -0,0 +1,88 @@
+"""
+Achieved batch rate of the sharded load generator by worker count, against a local stub of
+the node batches endpoint served by its own processes, so the target is not the bottleneck.
+"""
+import argparse
+import multiprocessing
+import socket
+import time
+
+from aiohttp import web
+
+from historical_nodes_registry.registry_process import pin_to_cpus, port_accepts
+from simulations.sharded_load import ShardedLoadGenerator
+
+HOST = '127.0.0.1'
+PORT = 8096
+APP_NAME = 'simple_app'
+TARGET_PROCESSES = 2
+RATE = 20_000.0
+DURATION = 5.0
+WORKER_COUNTS = [1, 2, 4]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sharded load generator throughput by worker count.")
+    parser.add_argument("--rate", type=float, default=RATE,
+                        help="Offered batches per second; set it above what one worker can send.")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds of load per worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=WORKER_COUNTS, help="Worker counts to measure.")
+    parser.add_argument("--target-processes", type=int, default=TARGET_PROCESSES,
+                        help="Processes serving the stub endpoint.")
+    parser.add_argument("--target-cpus", type=int, nargs="+", default=None, help="CPUs to pin the stub to.")
+    parser.add_argument("--worker-cpus", type=int, nargs="+", default=None, help="CPUs to pin the workers to.")
+    return parser.parse_args()
+
+
+async def accept_batch(request: web.Request) -> web.Response:
+    await request.read()
+    return web.json_response({"status": "success"})
+
+
+def serve_target(listener: socket.socket, cpus) -> None:
+    pin_to_cpus(cpus)
+    app = web.Application()
+    app.router.add_put(f'/node/{APP_NAME}/batches', accept_batch)
+    web.run_app(app, sock=listener, print=None)
+
+
+def start_target(processes: int, cpus) -> list:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((HOST, PORT))
+    listener.listen(1024)
+    context = multiprocessing.get_context('fork')
+    servers = [context.Process(target=serve_target, args=(listener, cpus), daemon=True) for _ in range(processes)]
+    for server in servers:
+        server.start()
+    listener.close()
+    deadline = time.monotonic() + 20.0
+    while not port_accepts(HOST, PORT):
+        if time.monotonic() > deadline:
+            raise TimeoutError("Stub target did not start.")
+        time.sleep(0.05)
+    return servers
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    servers = start_target(args.target_processes, args.target_cpus)
+    try:
+        print(f"offered {args.rate:.0f} batches/s over {args.duration:.0f} s, {multiprocessing.cpu_count()} CPUs")
+        baseline = None
+        for workers in args.workers:
+            report = ShardedLoadGenerator(app_name=APP_NAME,
+                                          node_sockets=[f"http://{HOST}:{PORT}"],
+                                          rate=args.rate,
+                                          workers=workers,
+                                          duration=args.duration,
+                                          cpus=args.worker_cpus).run()
+            baseline = baseline or report["achieved_rate"]
+            response = report["latency"]["response"]
+            print(f"{workers} workers: {report['achieved_rate']:9.0f} batches/s "
+                  f"({report['achieved_rate'] / baseline:4.2f}x), "
+                  f"{report['dropped']} dropped, {report['late']} late, "
+                  f"response p50 {response['p50_ms']:.1f} ms, p99 {response['p99_ms']:.1f} ms")
+    finally:
+        for server in servers:
+            server.terminate()
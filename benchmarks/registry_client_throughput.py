@@ -0,0 +1,86 @@
+"""Benchmark registry client calls per second: unpooled requests, pooled sync client and async client."""
+import argparse
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import uvicorn
+
+from historical_nodes_registry import AsyncNodesRegistryClient, NodeInfo, NodesRegistryClient, create_server_app
+
+HOST = '127.0.0.1'
+PORT = 8091
+NODES = 50
+CALLS = 2_000
+CONCURRENCY = [1, 8, 32]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Registry client calls per second.")
+    parser.add_argument("--nodes", type=int, default=NODES, help="Nodes in the served snapshot.")
+    parser.add_argument("--calls", type=int, default=CALLS, help="GET /snapshot/ calls per measurement.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY,
+                        help="Concurrent callers to measure.")
+    return parser.parse_args()
+
+
+def start_registry(nodes: int) -> str:
+    server = uvicorn.Server(uvicorn.Config(create_server_app(), host=HOST, port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    socket = f'{HOST}:{PORT}'
+    snapshot = {
+        f'0x{node_idx:040x}': NodeInfo(id=f'0x{node_idx:040x}', public_key_g2='1 2 3 4' * 40,
+                                       address=f'0x{node_idx:040x}', socket=f'http://127.0.0.1:{6000 + node_idx}',
+                                       stake=10)
+        for node_idx in range(nodes)
+    }
+    NodesRegistryClient(socket=socket).add_snapshot(snapshot)
+    return socket
+
+
+def unpooled_get(socket: str) -> None:
+    """What NodesRegistryClient.get_network_snapshot did before it kept a session."""
+    response = requests.get(f'http://{socket}/snapshot/')
+    response.raise_for_status()
+    {address: NodeInfo(**node_info) for address, node_info in response.json()['snapshot'].items()}
+
+
+def measure_threads(call, calls: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in executor.map(lambda _: call(), range(calls)):
+            pass
+    return calls / (time.perf_counter() - start)
+
+
+async def measure_async(socket: str, calls: int, concurrency: int) -> float:
+    async with AsyncNodesRegistryClient(socket=socket, max_connections=concurrency) as client:
+        await client.get_network_snapshot(None)
+        start = time.perf_counter()
+        await asyncio.gather(*(client.get_network_snapshot(None) for _ in range(calls)))
+        return calls / (time.perf_counter() - start)
+
+
+def main() -> None:
+    args = parse_args()
+    logging.getLogger("uvicorn").setLevel(logging.WARNING)
+    socket = start_registry(args.nodes)
+
+    print(f"{args.nodes} nodes per snapshot, {args.calls} calls per measurement")
+    print(f"{'concurrency':>12} {'unpooled/s':>12} {'pooled/s':>12} {'async/s':>12}")
+    for concurrency in args.concurrency:
+        unpooled = measure_threads(lambda: unpooled_get(socket), args.calls, concurrency)
+        with NodesRegistryClient(socket=socket, pool_size=concurrency) as client:
+            pooled = measure_threads(lambda: client.get_network_snapshot(None), args.calls, concurrency)
+        asynchronous = asyncio.run(measure_async(socket, args.calls, concurrency))
+        print(f"{concurrency:>12} {unpooled:>12.0f} {pooled:>12.0f} {asynchronous:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
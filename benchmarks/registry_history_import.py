@@ -0,0 +1,78 @@
+"""Benchmark loading a recorded history by bulk archive import against replaying it through add_snapshot."""
+import argparse
+import itertools
+import logging
+import os
+import random
+import tempfile
+import time
+
+from historical_nodes_registry.history_archive import open_archive, read_archive, write_archive
+from historical_nodes_registry.node_record import NodeRecord
+from historical_nodes_registry.registry_state_manager import RegistryStateManager
+
+OPERATORS = 500
+SNAPSHOTS = 100_000
+CHANGES_PER_SNAPSHOT = 5
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="History import throughput of the historical nodes registry.")
+    parser.add_argument("--operators", type=int, default=OPERATORS, help="Network size.")
+    parser.add_argument("--snapshots", type=int, default=SNAPSHOTS, help="Snapshots in the recorded history.")
+    parser.add_argument("--changes", type=int, default=CHANGES_PER_SNAPSHOT, help="Stake changes per snapshot.")
+    parser.add_argument("--replay-snapshots", type=int, default=5_000,
+                        help="Snapshots replayed through add_snapshot for the baseline.")
+    parser.add_argument("--gzip", action="store_true", help="Compress the archive.")
+    return parser.parse_args()
+
+
+def make_node_record(node_idx: int, stake: int) -> NodeRecord:
+    address = f'0x{node_idx:040x}'
+    return NodeRecord.create(address, '1 2 3 4' * 40, address, f'http://127.0.0.1:{6000 + node_idx}', stake)
+
+
+def record_history(operators: int, snapshots: int, changes: int) -> RegistryStateManager:
+    manager = RegistryStateManager(logging.getLogger(__name__))
+    manager.add_snapshot({node_record.id: node_record
+                          for node_record in (make_node_record(node_idx, 0) for node_idx in range(operators))})
+    for stake in range(1, snapshots):
+        manager.update_nodes_info([make_node_record(random.randrange(operators), stake) for _ in range(changes)])
+    return manager
+
+
+def main() -> None:
+    args = parse_args()
+    recorded = record_history(args.operators, args.snapshots, args.changes)
+    archive_path = os.path.join(tempfile.mkdtemp(), 'history.zhna' + ('.gz' if args.gzip else ''))
+
+    start = time.perf_counter()
+    with open_archive(archive_path, 'wb') as stream:
+        entries = write_archive(stream, recorded.export_history())
+    export_time = time.perf_counter() - start
+    records = sum(len(delta.upserts) + len(delta.removals) for _, delta in recorded.export_history())
+
+    start = time.perf_counter()
+    imported = RegistryStateManager(logging.getLogger(__name__))
+    with open_archive(archive_path, 'rb') as stream:
+        imported.import_history(read_archive(stream))
+    import_time = time.perf_counter() - start
+
+    replayed = RegistryStateManager(logging.getLogger(__name__))
+    snapshots = [snapshot for _, snapshot in itertools.islice(recorded.iter_snapshots(0.0), args.replay_snapshots)]
+    start = time.perf_counter()
+    for snapshot in snapshots:
+        replayed.add_snapshot(snapshot)
+    replay_rate = len(snapshots) / (time.perf_counter() - start)
+
+    print(f"{entries} snapshots of a {args.operators}-operator network, {records} node records, "
+          f"archive {os.path.getsize(archive_path) / 2 ** 20:.1f} MiB")
+    print(f"export:      {export_time:8.2f}s {entries / export_time:>12.0f} snapshots/s")
+    print(f"import:      {import_time:8.2f}s {entries / import_time:>12.0f} snapshots/s "
+          f"{records / import_time:>12.0f} records/s")
+    print(f"add_snapshot replay: {'':>5}{replay_rate:>12.0f} snapshots/s "
+          f"(~{entries / replay_rate:.1f}s for the whole history)")
+
+
+if __name__ == "__main__":
+    main()
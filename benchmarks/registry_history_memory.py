@@ -0,0 +1,148 @@
+"""Compare memory and latency of full-copy snapshot history against keyframe/delta history."""
+import argparse
+import random
+import secrets
+import time
+import tracemalloc
+
+from historical_nodes_registry.node_record import NodeRecord
+from historical_nodes_registry.schema import NodeInfo
+from historical_nodes_registry.snapshot_history import DEFAULT_KEYFRAME_INTERVAL, SnapshotDelta, SnapshotHistory
+
+OPERATORS = 1_000
+CHANGES = 100_000
+LEGACY_SAMPLE = 100
+READS = 5_000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Memory and latency of registry snapshot history storage.")
+    parser.add_argument("--operators", type=int, default=OPERATORS, help="Initial network size.")
+    parser.add_argument("--changes", type=int, default=CHANGES, help="Membership changes to record.")
+    parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL)
+    parser.add_argument("--legacy-sample", type=int, default=LEGACY_SAMPLE,
+                        help="Full-copy snapshots to measure before extrapolating to --changes.")
+    parser.add_argument("--reads", type=int, default=READS, help="Random historical reads to time.")
+    return parser.parse_args()
+
+
+def random_node_info(node_idx: int) -> NodeInfo:
+    address = "0x" + secrets.token_hex(20)
+    public_key_g2 = " ".join(str(random.getrandbits(254)) for _ in range(4))
+    return NodeInfo(id=address, public_key_g2=public_key_g2, address=address,
+                    socket=f"http://127.0.0.1:{6000 + node_idx}", stake=10)
+
+
+def random_node_record(node_idx: int) -> NodeRecord:
+    return NodeRecord.from_node_info(random_node_info(node_idx))
+
+
+def generate_changes(operators: int, changes: int):
+    """Yield one join, leave or stake update delta per membership change."""
+    current = {}
+    for node_idx in range(operators):
+        node_info = random_node_record(node_idx)
+        current[node_info.id] = node_info
+    yield SnapshotDelta(upserts=dict(current), removals=())
+
+    node_ids = list(current)
+    next_idx = operators
+    for _ in range(changes):
+        action = random.random()
+        if action < 1 / 3 and len(node_ids) > 1:
+            node_id = node_ids.pop(random.randrange(len(node_ids)))
+            del current[node_id]
+            yield SnapshotDelta(upserts={}, removals=(node_id,))
+        elif action < 2 / 3:
+            node_info = random_node_record(next_idx)
+            next_idx += 1
+            current[node_info.id] = node_info
+            node_ids.append(node_info.id)
+            yield SnapshotDelta(upserts={node_info.id: node_info}, removals=())
+        else:
+            node_id = random.choice(node_ids)
+            node_info = NodeRecord.create(*current[node_id][:4], current[node_id].stake + 1)
+            current[node_id] = node_info
+            yield SnapshotDelta(upserts={node_id: node_info}, removals=())
+
+
+def measure_legacy_bytes_per_snapshot(operators: int, sample: int) -> float:
+    """Full copy per snapshot, with freshly parsed NodeInfo objects as every POST produced."""
+    template = [random_node_info(node_idx).model_dump_json() for node_idx in range(operators)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    snapshots = []
+    for _ in range(sample):
+        snapshot = {}
+        for node_json in template:
+            node_info = NodeInfo.model_validate_json(node_json)
+            snapshot[node_info.id] = node_info
+        snapshots.append((time.time(), snapshot))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / sample
+
+
+def measure_legacy_append_ns(history_length: int) -> float:
+    """Cost of the `[*snapshots, entry]` copy the old add_snapshot paid at a given history length."""
+    snapshots = [(0.0, {})] * history_length
+    rounds = 50
+    start = time.perf_counter_ns()
+    for _ in range(rounds):
+        [*snapshots, (0.0, {})]
+    return (time.perf_counter_ns() - start) / rounds
+
+
+def percentile(sorted_samples, percent: float) -> float:
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * percent / 100))]
+
+
+def measure_delta_bytes(operators: int, changes: int, keyframe_interval: int) -> int:
+    """Memory retained by a delta history of the changes, recorded untimed under tracemalloc."""
+    history = SnapshotHistory(keyframe_interval=keyframe_interval)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for timestamp, delta in enumerate(generate_changes(operators, changes)):
+        history.append_delta(float(timestamp), delta)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+
+def main() -> None:
+    args = parse_args()
+
+    # Latency is timed without tracemalloc, which slows every allocation, as for the full-copy
+    # appends below; memory is measured in a pass of its own
+    history = SnapshotHistory(keyframe_interval=args.keyframe_interval)
+    append_ns = 0
+    for timestamp, delta in enumerate(generate_changes(args.operators, args.changes)):
+        start = time.perf_counter_ns()
+        history.append_delta(float(timestamp), delta)
+        append_ns += time.perf_counter_ns() - start
+    delta_bytes = measure_delta_bytes(args.operators, args.changes, args.keyframe_interval)
+
+    read_samples = []
+    for _ in range(args.reads):
+        index = random.randrange(len(history))
+        start = time.perf_counter_ns()
+        history.snapshot_at(index)
+        read_samples.append(time.perf_counter_ns() - start)
+    read_samples.sort()
+
+    legacy_bytes = measure_legacy_bytes_per_snapshot(args.operators, args.legacy_sample) * len(history)
+    legacy_append_ns = measure_legacy_append_ns(len(history) // 2)
+
+    print(f"network: {args.operators} operators, {args.changes} membership changes, "
+          f"keyframe interval {args.keyframe_interval}")
+    print(f"full-copy history : {legacy_bytes / 2 ** 20:10.1f} MiB "
+          f"(extrapolated from {args.legacy_sample} snapshots)")
+    print(f"delta history     : {delta_bytes / 2 ** 20:10.1f} MiB")
+    print(f"append full-copy  : {legacy_append_ns / 1000:10.1f} us mean (list copy at half history)")
+    print(f"append delta      : {append_ns / len(history) / 1000:10.1f} us mean")
+    print(f"read delta        : {percentile(read_samples, 50) / 1000:10.1f} us p50, "
+          f"{percentile(read_samples, 99) / 1000:.1f} us p99 (full-copy read is a list index)")
+
+
+if __name__ == "__main__":
+    main()
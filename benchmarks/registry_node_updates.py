@@ -0,0 +1,47 @@
+"""Benchmark stake changes absorbed per second by single and batched node updates."""
+import argparse
+import logging
+import random
+import time
+
+from historical_nodes_registry.registry_state_manager import RegistryStateManager
+from historical_nodes_registry.schema import NodeInfo
+
+OPERATORS = 500
+UPDATES = 20_000
+BATCH_SIZES = [1, 10, 100, 1_000]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Node update throughput of the historical nodes registry.")
+    parser.add_argument("--operators", type=int, default=OPERATORS, help="Network size.")
+    parser.add_argument("--updates", type=int, default=UPDATES, help="Stake changes per measurement.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES, help="Updates per call.")
+    return parser.parse_args()
+
+
+def make_node_info(node_idx: int, stake: int) -> NodeInfo:
+    address = f'0x{node_idx:040x}'
+    return NodeInfo(id=address, public_key_g2='1 2 3 4' * 40, address=address,
+                    socket=f'http://127.0.0.1:{6000 + node_idx}', stake=stake)
+
+
+def main() -> None:
+    args = parse_args()
+    updates = [make_node_info(random.randrange(args.operators), stake) for stake in range(args.updates)]
+
+    print(f"{args.operators} operators, {args.updates} stake changes")
+    print(f"{'batch':>6} {'changes/s':>12} {'snapshots':>10}")
+    for batch_size in args.batch_sizes:
+        manager = RegistryStateManager(logging.getLogger(__name__))
+        manager.add_snapshot({node_info.id: node_info
+                              for node_info in (make_node_info(node_idx, 0) for node_idx in range(args.operators))})
+        start = time.perf_counter()
+        for batch_start in range(0, len(updates), batch_size):
+            manager.update_nodes_info(updates[batch_start:batch_start + batch_size])
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>6} {len(updates) / elapsed:>12.0f} {len(manager._history):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare registry latency under client load with the registry in a thread of the load
+generator's interpreter against a dedicated registry process.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+
+import requests
+
+from historical_nodes_registry import NodeInfo, NodesRegistryClient, RegistryProcess, run_registry_server
+from historical_nodes_registry.registry_process import port_accepts
+
+HOST = '127.0.0.1'
+PORT = 8095
+NODES = 200
+SENDER_THREADS = 4
+BATCH_SIZE = 500
+PROBE_RATE = 100.0
+DURATION = 10.0
+MODES = ['process', 'thread']
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Registry latency in-thread against in its own process.")
+    parser.add_argument("--nodes", type=int, default=NODES, help="Nodes in the served snapshot.")
+    parser.add_argument("--senders", type=int, default=SENDER_THREADS,
+                        help="Threads building and encoding transaction batches, as the batch senders do.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Transactions per encoded batch.")
+    parser.add_argument("--probe-rate", type=float, default=PROBE_RATE, help="Registry requests per second.")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds of load per mode.")
+    parser.add_argument("--cpus", type=int, nargs="+", default=None, help="CPUs to pin the registry process to.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="Modes to measure.")
+    return parser.parse_args()
+
+
+def start_in_thread(port: int) -> None:
+    threading.Thread(target=run_registry_server, args=(HOST, port), daemon=True).start()
+    deadline = time.monotonic() + 20.0
+    while not port_accepts(HOST, port):
+        if time.monotonic() > deadline:
+            raise TimeoutError("In-thread registry did not start.")
+        time.sleep(0.05)
+
+
+def send_batches(stop: threading.Event, batch_size: int) -> None:
+    """CPU-bound stand-in for a batch sender: build and encode transaction batches."""
+    while not stop.is_set():
+        json.dumps([{"operation": "foo", "tx_id": str(uuid.uuid4()), "t": int(time.time())}
+                    for _ in range(batch_size)])
+
+
+def probe(url: str, stop: threading.Event, rate: float, latencies: list) -> None:
+    session = requests.Session()
+    interval = 1.0 / rate
+    next_send = time.perf_counter()
+    while not stop.is_set():
+        next_send += interval
+        start = time.perf_counter()
+        session.get(f'{url}/snapshot/').raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(max(0.0, next_send - time.perf_counter()))
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def measure(port: int, args: argparse.Namespace) -> list:
+    client = NodesRegistryClient(f'{HOST}:{port}')
+    client.add_snapshot({
+        f'0x{node_idx:040x}': NodeInfo(id=f'0x{node_idx:040x}', public_key_g2='1 2 3 4' * 40,
+                                       address=f'0x{node_idx:040x}', socket=f'http://127.0.0.1:{6000 + node_idx}',
+                                       stake=10)
+        for node_idx in range(args.nodes)})
+    stop = threading.Event()
+    latencies = []
+    threads = [threading.Thread(target=send_batches, args=(stop, args.batch_size)) for _ in range(args.senders)]
+    threads.append(threading.Thread(target=probe, args=(f'http://{HOST}:{port}', stop, args.probe_rate, latencies)))
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies)
+
+
+def main() -> None:
+    args = parse_args()
+    print(f"{args.senders} sender threads, {args.probe_rate:.0f} registry GETs/s of a {args.nodes}-node snapshot")
+    print(f"{'mode':>8} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode_idx, mode in enumerate(args.modes):
+        port = PORT + mode_idx
+        if mode == 'process':
+            with RegistryProcess(HOST, port, cpus=args.cpus):
+                latencies = measure(port, args)
+        else:
+            # The in-thread registry cannot be stopped and lives on until the benchmark exits
+            start_in_thread(port)
+            latencies = measure(port, args)
+        print(f"{mode:>8} {len(latencies):>9} {percentile(latencies, 0.5) * 1000:>8.2f} "
+              f"{percentile(latencies, 0.99) * 1000:>8.2f} {latencies[-1] * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark registry read throughput while writer threads append snapshots at full speed."""
+import argparse
+import logging
+import random
+import threading
+import time
+
+from historical_nodes_registry.registry_state_manager import RegistryStateManager
+from historical_nodes_registry.schema import NodeInfo
+
+OPERATORS = 500
+HISTORY = 10_000
+READERS = 4
+WRITER_COUNTS = [0, 1, 2, 4]
+DURATION = 3.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Read throughput of the registry under concurrent writes.")
+    parser.add_argument("--operators", type=int, default=OPERATORS, help="Network size.")
+    parser.add_argument("--history", type=int, default=HISTORY, help="Snapshots stored before measuring.")
+    parser.add_argument("--readers", type=int, default=READERS, help="Reader threads.")
+    parser.add_argument("--writers", type=int, nargs="+", default=WRITER_COUNTS, help="Writer thread counts.")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds per measurement.")
+    parser.add_argument("--locked-readers", action="store_true",
+                        help="Make readers take the writer lock, as a baseline for lock-free reads.")
+    return parser.parse_args()
+
+
+def make_node_info(node_idx: int, stake: int) -> NodeInfo:
+    address = f'0x{node_idx:040x}'
+    return NodeInfo(id=address, public_key_g2='1 2 3 4' * 40, address=address,
+                    socket=f'http://127.0.0.1:{6000 + node_idx}', stake=stake)
+
+
+def build_manager(operators: int, history: int) -> RegistryStateManager:
+    manager = RegistryStateManager(logging.getLogger(__name__))
+    manager.add_snapshot({node_info.id: node_info
+                          for node_info in (make_node_info(node_idx, 0) for node_idx in range(operators))})
+    for stake in range(1, history):
+        manager.update_node_info(make_node_info(random.randrange(operators), stake))
+    return manager
+
+
+def measure(manager: RegistryStateManager, args: argparse.Namespace, writers: int):
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    counts_lock = threading.Lock()
+    first, last = manager._history.timestamps[0], manager.find_snapshot_timestamp(None)
+
+    def read():
+        reads = errors = 0
+        while not stop.is_set():
+            query = None if random.random() < 0.5 else random.uniform(first, last)
+            try:
+                if args.locked_readers:
+                    with manager._lock:
+                        manager.get_snapshot_by_timestamp(query)
+                else:
+                    manager.get_snapshot_by_timestamp(query)
+                reads += 1
+            except Exception:
+                errors += 1
+        with counts_lock:
+            counts['reads'] += reads
+            counts['errors'] += errors
+
+    def write(writer_idx: int):
+        writes = 0
+        stake = 10 ** 9 * (writer_idx + 1)
+        while not stop.is_set():
+            stake += 1
+            manager.update_node_info(make_node_info(random.randrange(args.operators), stake))
+            writes += 1
+        with counts_lock:
+            counts['writes'] += writes
+
+    threads = ([threading.Thread(target=read) for _ in range(args.readers)]
+               + [threading.Thread(target=write, args=(writer_idx,)) for writer_idx in range(writers)])
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts['reads'] / args.duration, counts['writes'] / args.duration, counts['errors']
+
+
+def main() -> None:
+    args = parse_args()
+    manager = build_manager(args.operators, args.history)
+    mode = 'locked' if args.locked_readers else 'lock-free'
+    print(f"{args.operators} operators, {args.history} snapshots, {args.readers} {mode} reader threads")
+    print(f"{'writers':>8} {'reads/s':>10} {'writes/s':>10} {'errors':>7}")
+    for writers in args.writers:
+        reads, writes, errors = measure(manager, args, writers)
+        print(f"{writers:>8} {reads:>10.0f} {writes:>10.0f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Compare registry RSS when history holds pydantic NodeInfo models against interned NodeRecord tuples."""
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import secrets
+
+from historical_nodes_registry.registry_state_manager import RegistryStateManager
+from historical_nodes_registry.schema import NodeInfo
+from historical_nodes_registry.snapshot_history import DEFAULT_KEYFRAME_INTERVAL
+
+OPERATORS = 500
+SNAPSHOTS = 10_000
+MODES = ['pydantic', 'records']
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="RSS of registry history storage.")
+    parser.add_argument("--operators", type=int, default=OPERATORS, help="Network size.")
+    parser.add_argument("--snapshots", type=int, default=SNAPSHOTS, help="Snapshots to store.")
+    return parser.parse_args()
+
+
+def rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def random_node_json(node_idx: int, stake: int) -> str:
+    address = "0x" + secrets.token_hex(20)
+    public_key_g2 = " ".join(str(random.getrandbits(254)) for _ in range(4))
+    return NodeInfo(id=address, public_key_g2=public_key_g2, address=address,
+                    socket=f"http://127.0.0.1:{6000 + node_idx}", stake=stake).model_dump_json()
+
+
+def posted_snapshots(operators: int, snapshots: int):
+    """Yield each snapshot as the server parses it from a POST: fresh NodeInfo objects for every node."""
+    nodes_json = [random_node_json(node_idx, 10) for node_idx in range(operators)]
+    for _ in range(snapshots):
+        node_idx = random.randrange(operators)
+        node_info = NodeInfo.model_validate_json(nodes_json[node_idx])
+        nodes_json[node_idx] = node_info.model_copy(update={"stake": node_info.stake + 1}).model_dump_json()
+        snapshot = {}
+        for node_json in nodes_json:
+            node_info = NodeInfo.model_validate_json(node_json)
+            snapshot[node_info.id] = node_info
+        yield snapshot
+
+
+class PydanticHistory:
+    """Keyframe/delta history holding the parsed NodeInfo models, as the registry did before NodeRecord."""
+
+    def __init__(self):
+        self.keyframes = []
+        self.deltas = []
+        self.head = {}
+
+    def append(self, snapshot) -> None:
+        upserts = {node_id: node_info for node_id, node_info in snapshot.items()
+                   if self.head.get(node_id) != node_info}
+        removals = tuple(node_id for node_id in self.head if node_id not in snapshot)
+        for node_id in removals:
+            del self.head[node_id]
+        self.head.update(upserts)
+        if len(self.deltas) % DEFAULT_KEYFRAME_INTERVAL == 0:
+            self.keyframes.append(dict(self.head))
+        self.deltas.append((upserts, removals))
+
+
+def measure(mode: str, operators: int, snapshots: int, results) -> None:
+    random.seed(0)
+    gc.collect()
+    before = rss_bytes()
+    if mode == 'pydantic':
+        store = PydanticHistory()
+        for snapshot in posted_snapshots(operators, snapshots):
+            store.append(snapshot)
+    else:
+        store = RegistryStateManager(logging.getLogger(__name__))
+        for snapshot in posted_snapshots(operators, snapshots):
+            store.add_snapshot(snapshot)
+    gc.collect()
+    results.put((mode, rss_bytes() - before))
+
+
+def main() -> None:
+    args = parse_args()
+    context = multiprocessing.get_context('spawn')
+    measured = {}
+    for mode in MODES:
+        # A fresh interpreter per mode so freed arenas of one run do not hide the growth of the next
+        results = context.Queue()
+        process = context.Process(target=measure, args=(mode, args.operators, args.snapshots, results))
+        process.start()
+        name, used = results.get()
+        process.join()
+        measured[name] = used
+
+    print(f"{args.snapshots} snapshots of a {args.operators}-operator network, one stake change each")
+    for mode in MODES:
+        print(f"{mode:>9}: {measured[mode] / 2 ** 20:8.1f} MiB RSS growth")
+    print(f"reduction: {1 - measured['records'] / measured['pydantic']:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark RegistryStateManager timestamp lookups against history length.
+
+find_snapshot_timestamp is the bisect alone and stays flat, around a microsecond.
+get_snapshot_by_timestamp also rebuilds the snapshot from its keyframe, replaying up to
+keyframe_interval - 1 deltas, so it is not flat: it grows with the history until the history
+spans a few keyframe intervals, then levels off at tens of microseconds for the default
+interval. --keyframe-interval trades that replay cost against keyframe memory.
+"""
+import argparse
+import logging
+import random
+import time
+from typing import List
+
+from historical_nodes_registry.registry_state_manager import RegistryStateManager
+from historical_nodes_registry.schema import NodeInfo
+from historical_nodes_registry.snapshot_history import DEFAULT_KEYFRAME_INTERVAL
+
+HISTORY_SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+QUERIES_PER_SIZE = 20_000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Timestamp lookup latency of the historical nodes registry.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=HISTORY_SIZES, help="History lengths to measure.")
+    parser.add_argument("--queries", type=int, default=QUERIES_PER_SIZE, help="Lookups per history length.")
+    parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL)
+    return parser.parse_args()
+
+
+def make_snapshots():
+    """Two alternating snapshots so every add_snapshot call is stored."""
+    node_info = NodeInfo(id="0x01", public_key_g2="1 2 3 4", address="0x01", socket="http://127.0.0.1:6001", stake=10)
+    return {}, {node_info.id: node_info}
+
+
+def percentile(sorted_samples, percent: float) -> int:
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * percent / 100))]
+
+
+def time_queries(lookup, queries) -> List[int]:
+    samples = []
+    for query in queries:
+        start = time.perf_counter_ns()
+        lookup(query)
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    return samples
+
+
+def main() -> None:
+    args = parse_args()
+    manager = RegistryStateManager(logging.getLogger(__name__), keyframe_interval=args.keyframe_interval)
+    snapshots = make_snapshots()
+    stored = 0
+    first = last = None
+
+    print(f"keyframe interval {args.keyframe_interval}; lookup is the bisect alone, read also rebuilds the snapshot")
+    print(f"{'snapshots':>10} {'lookup p50 ns':>14} {'lookup p99 ns':>14} "
+          f"{'read mean ns':>13} {'read p50 ns':>12} {'read p99 ns':>12}")
+    for size in sorted(args.sizes):
+        while stored < size:
+            last = manager.add_snapshot(snapshots[stored % 2])
+            if first is None:
+                first = last
+            stored += 1
+
+        queries = [random.uniform(first, last) for _ in range(args.queries)]
+        lookups = time_queries(manager.find_snapshot_timestamp, queries)
+        reads = time_queries(manager.get_snapshot_by_timestamp, queries)
+        mean = sum(reads) / len(reads)
+        print(f"{size:>10} {percentile(lookups, 50):>14} {percentile(lookups, 99):>14} "
+              f"{mean:>13.0f} {percentile(reads, 50):>12} {percentile(reads, 99):>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark GET /snapshot/ throughput of the historical nodes registry against worker count."""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from historical_nodes_registry import NodeInfo, NodesRegistryClient
+
+WORKER_COUNTS = [1, 2, 4, 8]
+HOST = '127.0.0.1'
+PORT = 8090
+NODES = 200
+DURATION = 10.0
+LOAD_PROCESSES = 4
+CONCURRENCY = 32
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Registry read throughput against worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=WORKER_COUNTS, help="Worker counts to measure.")
+    parser.add_argument("--nodes", type=int, default=NODES, help="Nodes in the served snapshot.")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds of load per worker count.")
+    parser.add_argument("--load-processes", type=int, default=LOAD_PROCESSES, help="Load generator processes.")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="In-flight requests per load process.")
+    return parser.parse_args()
+
+
+def wait_for_port(host: str, port: int, timeout: float = 30.0) -> None:
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Registry did not start on {host}:{port} within {timeout} seconds.")
+
+
+async def generate_load(url: str, duration: float, concurrency: int) -> int:
+    completed = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(session: aiohttp.ClientSession):
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            async with session.get(url) as response:
+                await response.read()
+                if response.status == 200:
+                    completed += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return completed
+
+
+def load_process(url: str, duration: float, concurrency: int, results) -> None:
+    results.put(asyncio.run(generate_load(url, duration, concurrency)))
+
+
+def measure(workers: int, args: argparse.Namespace) -> float:
+    log_path = os.path.join(tempfile.mkdtemp(prefix='registry_bench_'), 'snapshots.log')
+    server = subprocess.Popen([sys.executable, '-m', 'historical_nodes_registry.runner',
+                               '--host', HOST, '--port', str(PORT),
+                               '--workers', str(workers), '--log-path', log_path],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(HOST, PORT)
+        snapshot = {
+            f'0x{node_idx:040x}': NodeInfo(id=f'0x{node_idx:040x}', public_key_g2='1 2 3 4' * 40,
+                                           address=f'0x{node_idx:040x}', socket=f'http://127.0.0.1:{6000 + node_idx}',
+                                           stake=10)
+            for node_idx in range(args.nodes)
+        }
+        NodesRegistryClient(socket=f'{HOST}:{PORT}').add_snapshot(snapshot)
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=load_process,
+                                             args=(f'http://{HOST}:{PORT}/snapshot/', args.duration,
+                                                   args.concurrency, results))
+                     for _ in range(args.load_processes)]
+        for process in processes:
+            process.start()
+        completed = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        return completed / args.duration
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    args = parse_args()
+    print(f"{os.cpu_count()} CPUs, {args.nodes} nodes per snapshot, "
+          f"{args.load_processes}x{args.concurrency} concurrent clients")
+    print(f"{'workers':>8} {'reads/s':>10}")
+    for workers in args.workers:
+        print(f"{workers:>8} {measure(workers, args):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
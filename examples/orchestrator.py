@@ -5,16 +5,14 @@ import sys
 # sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import json
-import time
 import secrets
 import shutil
 import subprocess
 import threading
-import socket
 import config
 from pathlib import Path
 from typing import Any, Optional
-from historical_nodes_registry import NodesRegistryClient, NodeInfo, run_registry_server
+from historical_nodes_registry import NodesRegistryClient, NodeInfo, RegistryProcess
 from eigensdk.crypto.bls import attestation
 from web3 import Account
 
@@ -176,20 +174,6 @@ def prepare_nodes() -> None:
         subprocess.run(['chmod', '+x', nodes_file_path])
 
 
-def wait_for_server(host: str, port: int, timeout: float = 20.0, interval: float = 0.5) -> None:
-    """Wait for the server to be up and running."""
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            with socket.create_connection((host, port), timeout=interval):
-                print(f"Server is up and running on {host}:{port}")
-                return
-        except (socket.timeout, ConnectionRefusedError):
-            print(f"Waiting for server at {host}:{port}...")
-            time.sleep(interval)
-    raise TimeoutError(f"Server did not start within {timeout} seconds.")
-
-
 shutdown_event = threading.Event()
 
 
@@ -199,35 +183,21 @@ def signal_handler(signum, frame):
     shutdown_event.set()
 
 
-def wait_for_server(host: str, port: int) -> None:
-    """Wait for the server to be up and running."""
-    while not shutdown_event.is_set():
-        try:
-            with socket.create_connection((host, port), timeout=1):
-                print(f"Server is up and running on {host}:{port}")
-                return
-        except (socket.timeout, ConnectionRefusedError):
-            print(f"Waiting for server at {host}:{port}...")
-            time.sleep(0.5)
-
-
 def orchestrate_simulation():
-    registry_thread = threading.Thread(
-        target=run_registry_server,
-        args=(HISTORICAL_NODES_REGISTRY_HOST, HISTORICAL_NODES_REGISTRY_PORT),
-        daemon=True)
-    registry_thread.start()
-
-    # Wait for the server to be ready
+    # Returns once the registry, running in its own process, accepts requests
+    registry_process = RegistryProcess(HISTORICAL_NODES_REGISTRY_HOST, HISTORICAL_NODES_REGISTRY_PORT)
     try:
-        wait_for_server(HISTORICAL_NODES_REGISTRY_HOST, HISTORICAL_NODES_REGISTRY_PORT)
-    except TimeoutError as e:
+        registry_process.start()
+    except (RuntimeError, TimeoutError) as e:
         print(f"Error: {e}")
         return
 
-    prepare_nodes()
+    try:
+        prepare_nodes()
 
-    # Wait until a shutdown signal is received
-    print("Historical Nodes Registry server is running. Press Ctrl+C to stop.")
-    shutdown_event.wait()
+        # Wait until a shutdown signal is received
+        print("Historical Nodes Registry server is running. Press Ctrl+C to stop.")
+        shutdown_event.wait()
+    finally:
+        registry_process.stop()
     print("Main program exiting.")
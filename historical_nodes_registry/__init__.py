@@ -1,12 +1,18 @@
 from historical_nodes_registry.server import create_server_app
 from historical_nodes_registry.client import NodesRegistryClient
+from historical_nodes_registry.async_client import AsyncNodesRegistryClient
 from historical_nodes_registry.schema import NodeInfo, SnapShotType
 from historical_nodes_registry.runner import run_registry_server
+from historical_nodes_registry.registry_process import RegistryProcess
+from historical_nodes_registry.retention import RetentionPolicy
 
 __all__ = [
     'NodesRegistryClient',
+    'AsyncNodesRegistryClient',
     'NodeInfo',
     'SnapShotType',
     'create_server_app',
-    'run_registry_server'
+    'run_registry_server',
+    'RegistryProcess',
+    'RetentionPolicy'
 ]
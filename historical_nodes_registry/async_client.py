@@ -0,0 +1,169 @@
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import aiohttp
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from historical_nodes_registry.client import (
+    MAX_CACHED_QUERIES, POOL_SIZE, REQUEST_TIMEOUT, RETRY_ATTEMPTS, RETRY_BACKOFF, RETRY_MAX_BACKOFF,
+    RETRY_STATUSES, parse_diff, parse_snapshot, serialize_snapshot, to_base_url
+)
+from historical_nodes_registry.http_protocol import HTTP_304_NOT_MODIFIED
+from historical_nodes_registry.schema import NodeInfo, SnapShotType
+from historical_nodes_registry.snapshot_history import SnapshotDelta
+
+KEEPALIVE_TIMEOUT = 30.0
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Connection failures, timeouts and gateway/unavailable responses are worth another attempt."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+class AsyncNodesRegistryClient:
+    """
+    asyncio client of the historical nodes registry.
+
+    All calls share one pooled keep-alive aiohttp session, at most max_connections of them are in
+    flight at once, and failed calls are retried with jittered exponential backoff like
+    NodesRegistryClient. Pass a session to share its pool with other clients; the client then
+    leaves closing it to the caller.
+    """
+
+    def __init__(self,
+                 socket: str,
+                 session: Optional[aiohttp.ClientSession] = None,
+                 max_connections: int = POOL_SIZE,
+                 timeout: float = REQUEST_TIMEOUT,
+                 retry_attempts: int = RETRY_ATTEMPTS):
+        self.base_url = to_base_url(socket)
+        self._session = session
+        self._owns_session = session is None
+        self._max_connections = max_connections
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._retry_attempts = retry_attempts
+        self._semaphore = asyncio.Semaphore(max_connections)
+        # Last (ETag, decoded snapshot) seen per queried timestamp, revalidated with If-None-Match
+        self._etag_cache: "OrderedDict[Optional[float], Tuple[str, SnapShotType]]" = OrderedDict()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the running event loop
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._max_connections, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+        return self._session
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _request(self, method: str, path: str, **kwargs) -> Tuple[int, dict, Optional[bytes]]:
+        """Send a request and return (status, headers, body), retrying transient failures."""
+        session = self._get_session()
+        url = urljoin(self.base_url, path)
+        async for attempt in AsyncRetrying(stop=stop_after_attempt(self._retry_attempts),
+                                           wait=wait_random_exponential(multiplier=RETRY_BACKOFF,
+                                                                        max=RETRY_MAX_BACKOFF),
+                                           retry=retry_if_exception(is_retryable),
+                                           reraise=True):
+            with attempt:
+                async with self._semaphore:
+                    async with session.request(method, url, **kwargs) as response:
+                        if response.status >= 400:
+                            response.raise_for_status()
+                        return response.status, dict(response.headers), await response.read()
+
+    async def add_snapshot(self, nodes_info_snapshot: SnapShotType):
+        try:
+            _, _, body = await self._request('POST', '/snapshot/', json=serialize_snapshot(nodes_info_snapshot))
+            return json.loads(body)
+        except aiohttp.ClientResponseError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    async def add_node_info(self, node_info: NodeInfo):
+        try:
+            _, _, body = await self._request('POST', '/nodeInfo/', json=node_info.dict())
+            return json.loads(body)
+        except aiohttp.ClientResponseError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    async def add_nodes_info(self, nodes_info: List[NodeInfo]):
+        """Apply many node updates atomically as one new snapshot."""
+        try:
+            _, _, body = await self._request('POST', '/nodeInfo/batch',
+                                             json=[node_info.dict() for node_info in nodes_info])
+            return json.loads(body)
+        except aiohttp.ClientResponseError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    async def get_network_snapshot(self, timestamp: Optional[float]) -> SnapShotType:
+        try:
+            params = None if timestamp is None else {"timestamp": timestamp}
+            cached = self._etag_cache.get(timestamp)
+            headers = {"If-None-Match": cached[0]} if cached is not None else None
+            status, response_headers, body = await self._request('GET', '/snapshot/', params=params, headers=headers)
+            if status == HTTP_304_NOT_MODIFIED and cached is not None:
+                self._etag_cache.move_to_end(timestamp)
+                return dict(cached[1])
+            snapshot = parse_snapshot(json.loads(body).get('snapshot'))
+            etag = response_headers.get('ETag')
+            if etag is not None:
+                self._etag_cache[timestamp] = (etag, snapshot)
+                self._etag_cache.move_to_end(timestamp)
+                if len(self._etag_cache) > MAX_CACHED_QUERIES:
+                    self._etag_cache.popitem(last=False)
+            return dict(snapshot)
+        except aiohttp.ClientResponseError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    async def get_stake_aggregates(self,
+                                   timestamp: Optional[float] = None,
+                                   threshold_percent: Optional[float] = None,
+                                   distribution: bool = True) -> Optional[Dict[str, Any]]:
+        """Stake aggregates of the snapshot at timestamp; see NodesRegistryClient.get_stake_aggregates."""
+        try:
+            params = {"distribution": "true" if distribution else "false"}
+            if timestamp is not None:
+                params["timestamp"] = timestamp
+            if threshold_percent is not None:
+                params["threshold_percent"] = threshold_percent
+            _, _, body = await self._request('GET', '/snapshot/stake', params=params)
+            return json.loads(body)
+        except aiohttp.ClientResponseError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    async def get_network_snapshot_diff(self,
+                                        since: Optional[float],
+                                        until: Optional[float] = None
+                                        ) -> Optional[Tuple[Optional[float], float, SnapshotDelta]]:
+        """(since, timestamp, delta) turning the snapshot at since into the one at until (default: latest)."""
+        try:
+            params = {key: value for key, value in (("since", since), ("until", until)) if value is not None}
+            _, _, body = await self._request('GET', '/snapshot/diff', params=params)
+            return parse_diff(json.loads(body))
+        except aiohttp.ClientResponseError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
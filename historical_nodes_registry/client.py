@@ -1,20 +1,147 @@
+import json
+import threading
+import time
 import requests
+from collections import OrderedDict
 from urllib.parse import urljoin
-from typing import Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from historical_nodes_registry.history_archive import ARCHIVE_MEDIA_TYPE, READ_CHUNK_SIZE, open_archive
+from historical_nodes_registry.http_protocol import (FINAL_INTERVALS_HEADER,
+                                                     HTTP_304_NOT_MODIFIED,
+                                                     NEXT_SNAPSHOT_HEADER)
 from historical_nodes_registry.schema import NodeInfo, SnapShotType
+from historical_nodes_registry.snapshot_cache import DEFAULT_MAX_BYTES, SnapshotIntervalCache
+from historical_nodes_registry.snapshot_history import SnapshotDelta, apply_delta
+
+MAX_CACHED_QUERIES = 128
+SUBSCRIBE_RECONNECT_DELAY = 1.0
+# Longer than the server keep-alive interval, so a silent connection is detected as dead
+SUBSCRIBE_READ_TIMEOUT = 60.0
+
+POOL_SIZE = 10
+REQUEST_TIMEOUT = 30.0
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.1
+RETRY_MAX_BACKOFF = 2.0
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+def to_base_url(socket: str) -> str:
+    return f'http://{socket}' if not socket.startswith(('http://', 'https://')) else socket
+
+
+def serialize_snapshot(snapshot: SnapShotType) -> Dict[str, Dict[str, Any]]:
+    return {
+        address: node_info.dict()
+        for address, node_info in snapshot.items()
+    }
+
+
+def parse_snapshot(snapshot_dict: Optional[Dict[str, Dict[str, Any]]]) -> SnapShotType:
+    return {address: NodeInfo(**node_info_dict)
+            for address, node_info_dict in (snapshot_dict or {}).items()}
+
+
+def parse_diff(body: Dict[str, Any]) -> Tuple[Optional[float], Optional[float], SnapshotDelta]:
+    delta = SnapshotDelta(upserts=parse_snapshot(body['upserts']), removals=tuple(body['removals']))
+    return body['since'], body['timestamp'], delta
+
+
+def cache_max_age(cache_control: Optional[str]) -> Optional[float]:
+    """max-age of a Cache-Control header: None if the response is immutable, 0 if it gives none."""
+    directives = [directive.strip() for directive in (cache_control or '').split(',')]
+    if 'immutable' in directives:
+        return None
+    for directive in directives:
+        if directive.startswith('max-age='):
+            try:
+                return float(directive[len('max-age='):])
+            except ValueError:
+                break
+    return 0.0
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Connection failures, timeouts and gateway/unavailable responses are worth another attempt."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return (isinstance(error, requests.HTTPError)
+            and error.response is not None
+            and error.response.status_code in RETRY_STATUSES)
 
 
 class NodesRegistryClient:
-    def __init__(self, socket: str):
-        self.base_url = f'http://{socket}' if not socket.startswith(('http://', 'https://')) else socket
+    """
+    Client of the historical nodes registry.
+
+    Requests share a pooled keep-alive requests.Session and are retried with jittered exponential
+    backoff on connection errors, timeouts and 502/503/504 responses.
+
+    Historical snapshots never change once a later one exists, unless the registry's retention
+    downsamples them away, so they are kept in a local interval cache of up to cache_max_bytes
+    for as long as the registry's Cache-Control allows, and repeated queries falling in a known
+    interval are answered without network I/O.
+    """
+
+    def __init__(self,
+                 socket: str,
+                 pool_size: int = POOL_SIZE,
+                 timeout: float = REQUEST_TIMEOUT,
+                 retry_attempts: int = RETRY_ATTEMPTS,
+                 cache_max_bytes: int = DEFAULT_MAX_BYTES):
+        self.base_url = to_base_url(socket)
+        self._timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._retrying = Retrying(stop=stop_after_attempt(retry_attempts),
+                                  wait=wait_random_exponential(multiplier=RETRY_BACKOFF, max=RETRY_MAX_BACKOFF),
+                                  retry=retry_if_exception(is_retryable),
+                                  reraise=True)
+        # Last (ETag, decoded snapshot, body size) seen per queried timestamp, revalidated with If-None-Match.
+        # The client may be shared between threads, so it is guarded by the interval cache's lock
+        self._cache_lock = threading.Lock()
+        self._etag_cache: "OrderedDict[Optional[float], Tuple[str, SnapShotType, int]]" = OrderedDict()
+        self.snapshot_cache = SnapshotIntervalCache(max_bytes=cache_max_bytes, lock=self._cache_lock)
+        # Local copy of the latest snapshot kept current by sync_network_snapshot
+        self._synced_timestamp: Optional[float] = None
+        self._synced_snapshot: SnapShotType = {}
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _request(self,
+                 method: str,
+                 path: str,
+                 body: Optional[Callable[[], Iterable[bytes]]] = None,
+                 **kwargs) -> requests.Response:
+        """Send a request with retries; body, if given, makes a fresh streamed body for each attempt."""
+        kwargs.setdefault('timeout', self._timeout)
+
+        def send() -> requests.Response:
+            if body is not None:
+                kwargs['data'] = body()
+            response = self._session.request(method, urljoin(self.base_url, path), **kwargs)
+            if response.status_code in RETRY_STATUSES:
+                response.raise_for_status()
+            return response
+
+        return self._retrying(send)
 
     def add_snapshot(self, nodes_info_snapshot: SnapShotType):
-        nodes_info_snapshot_dict = {
-            address: node_info.dict()
-            for address, node_info in nodes_info_snapshot.items()
-        }
         try:
-            response = requests.post(urljoin(self.base_url, '/snapshot/'), json=nodes_info_snapshot_dict)
+            response = self._request('POST', '/snapshot/', json=serialize_snapshot(nodes_info_snapshot))
             response.raise_for_status()
             return response.json()
 
@@ -25,7 +152,19 @@ class NodesRegistryClient:
 
     def add_node_info(self, node_info: NodeInfo):
         try:
-            response = requests.post(urljoin(self.base_url, '/nodeInfo/'), json=node_info.dict())
+            response = self._request('POST', '/nodeInfo/', json=node_info.dict())
+            response.raise_for_status()
+            return response.json()
+
+        except requests.HTTPError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    def add_nodes_info(self, nodes_info: List[NodeInfo]):
+        """Apply many node updates atomically as one new snapshot."""
+        try:
+            response = self._request('POST', '/nodeInfo/batch', json=[node_info.dict() for node_info in nodes_info])
             response.raise_for_status()
             return response.json()
 
@@ -34,17 +173,222 @@ class NodesRegistryClient:
         except Exception as err:
             print(f"An error occurred: {err}")  # General error details
 
-    def get_network_snapshot(self, timestamp: Optional[int]) -> SnapShotType:
+    def get_network_snapshot(self, timestamp: Optional[float]) -> SnapShotType:
         try:
-            if timestamp is None:
-                response = requests.get(urljoin(self.base_url, '/snapshot/'))
+            if timestamp is not None:
+                snapshot = self.snapshot_cache.get(timestamp)
+                if snapshot is not None:
+                    return dict(snapshot)
+
+            params = None if timestamp is None else {"timestamp": timestamp}
+            with self._cache_lock:
+                cached = self._etag_cache.get(timestamp)
+            headers = {"If-None-Match": cached[0]} if cached is not None else None
+            response = self._request('GET', '/snapshot/', params=params, headers=headers)
+            if response.status_code == HTTP_304_NOT_MODIFIED and cached is not None:
+                with self._cache_lock:
+                    if timestamp in self._etag_cache:
+                        self._etag_cache.move_to_end(timestamp)
+                _, snapshot, size = cached
             else:
-                response = requests.get(urljoin(self.base_url, '/snapshot/'), params={"timestamp": timestamp})
+                response.raise_for_status()
+                body = response.json()
+                snapshot = parse_snapshot(body.get('snapshot'))
+                size = len(response.content)
+                etag = response.headers.get('ETag')
+                if etag is not None:
+                    with self._cache_lock:
+                        self._etag_cache[timestamp] = (etag, snapshot, size)
+                        self._etag_cache.move_to_end(timestamp)
+                        if len(self._etag_cache) > MAX_CACHED_QUERIES:
+                            self._etag_cache.popitem(last=False)
+                if body.get('timestamp') is not None and NEXT_SNAPSHOT_HEADER in response.headers:
+                    self.snapshot_cache.put(body['timestamp'], float(response.headers[NEXT_SNAPSHOT_HEADER]),
+                                            snapshot, size, cache_max_age(response.headers.get('Cache-Control')))
+            return dict(snapshot)
+        except requests.HTTPError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    def get_stake_aggregates(self,
+                             timestamp: Optional[float] = None,
+                             threshold_percent: Optional[float] = None,
+                             distribution: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Total stake, node count and, as requested, the sorted stake distribution and the quorum
+        size for threshold_percent of the snapshot at timestamp, without downloading its nodes.
+        """
+        try:
+            params = {"distribution": distribution}
+            if timestamp is not None:
+                params["timestamp"] = timestamp
+            if threshold_percent is not None:
+                params["threshold_percent"] = threshold_percent
+            response = self._request('GET', '/snapshot/stake', params=params)
             response.raise_for_status()
-            snapshot: SnapShotType = {address: NodeInfo(**node_info_dict)
-                                      for address, node_info_dict in response.json().get('snapshot').items()}
-            return snapshot
+            return response.json()
         except requests.HTTPError as http_err:
             print(f"HTTP error occurred: {http_err}")  # HTTP error details
         except Exception as err:
             print(f"An error occurred: {err}")  # General error details
+
+    def get_node_history(self,
+                         node_id: str,
+                         since: Optional[float] = None,
+                         until: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Presence intervals of node_id as [joined, left] pairs, left null while still present,
+        and the timestamps its socket, key or stake changed at, between since and until.
+        """
+        try:
+            params = {key: value for key, value in (("node_id", node_id), ("since", since), ("until", until))
+                      if value is not None}
+            response = self._request('GET', '/nodeInfo/history', params=params)
+            response.raise_for_status()
+            return response.json()
+        except requests.HTTPError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    def export_history(self, path: str) -> Optional[int]:
+        """Download the registry history as an archive to path (gzip-compressed for .gz). Returns its size in bytes."""
+        try:
+            with self._request('GET', '/history/export', stream=True) as response:
+                response.raise_for_status()
+                size = 0
+                with open_archive(path, 'wb') as stream:
+                    for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+                        stream.write(chunk)
+                        size += len(chunk)
+                return size
+        except requests.HTTPError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    def import_history(self, path: str):
+        """Upload the history archive at path for the registry to bulk-load after its own history."""
+        def archive_chunks() -> Iterator[bytes]:
+            with open_archive(path, 'rb') as stream:
+                while True:
+                    chunk = stream.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        try:
+            # Streamed from the file, reopened on every attempt so a retry resends the whole archive
+            response = self._request('POST', '/history/import', body=archive_chunks,
+                                     headers={"Content-Type": ARCHIVE_MEDIA_TYPE})
+            response.raise_for_status()
+            return response.json()
+        except requests.HTTPError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    def _iter_ndjson_snapshots(self,
+                               response: requests.Response,
+                               consecutive: bool = False) -> Iterator[Tuple[float, SnapShotType]]:
+        """
+        Decode NDJSON snapshot lines; consecutive lines of a range also fill the snapshot cache,
+        if the registry marks the intervals between them final.
+        """
+        consecutive = consecutive and FINAL_INTERVALS_HEADER in response.headers
+        previous = None
+        for line in response.iter_lines():
+            if not line:
+                continue
+            body = json.loads(line)
+            timestamp, snapshot = body.get('timestamp'), parse_snapshot(body.get('snapshot'))
+            if consecutive:
+                if previous is not None:
+                    self.snapshot_cache.put(previous[0], timestamp, previous[1], previous[2])
+                previous = timestamp, snapshot, len(line)
+            yield timestamp, snapshot
+
+    def get_network_snapshots(self, timestamps: List[Optional[float]]) -> Iterator[Tuple[float, SnapShotType]]:
+        """Yield (timestamp, snapshot) for each queried timestamp, fetched in a single request."""
+        try:
+            with self._request('POST', '/snapshot/bulk', json=timestamps, stream=True) as response:
+                response.raise_for_status()
+                yield from self._iter_ndjson_snapshots(response)
+        except requests.HTTPError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    def iter_network_snapshots(self,
+                               start: float,
+                               end: Optional[float] = None) -> Iterator[Tuple[float, SnapShotType]]:
+        """Yield the snapshot in effect at start and every later one up to end, streamed in one request."""
+        try:
+            params = {"start": start} if end is None else {"start": start, "end": end}
+            with self._request('GET', '/snapshot/range', params=params, stream=True) as response:
+                response.raise_for_status()
+                yield from self._iter_ndjson_snapshots(response, consecutive=True)
+        except requests.HTTPError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    def get_network_snapshot_diff(self,
+                                  since: Optional[float],
+                                  until: Optional[float] = None
+                                  ) -> Optional[Tuple[Optional[float], float, SnapshotDelta]]:
+        """(since, timestamp, delta) turning the snapshot at since into the one at until (default: latest)."""
+        try:
+            params = {key: value for key, value in (("since", since), ("until", until)) if value is not None}
+            response = self._request('GET', '/snapshot/diff', params=params)
+            response.raise_for_status()
+            return parse_diff(response.json())
+        except requests.HTTPError as http_err:
+            print(f"HTTP error occurred: {http_err}")  # HTTP error details
+        except Exception as err:
+            print(f"An error occurred: {err}")  # General error details
+
+    def sync_network_snapshot(self) -> SnapShotType:
+        """Bring the local copy of the latest snapshot up to date by downloading only what changed."""
+        diff = self.get_network_snapshot_diff(self._synced_timestamp)
+        if diff is not None:
+            _, timestamp, delta = diff
+            if timestamp is not None and timestamp != self._synced_timestamp:
+                snapshot = dict(self._synced_snapshot)
+                apply_delta(snapshot, delta)
+                self._synced_timestamp, self._synced_snapshot = timestamp, snapshot
+        return dict(self._synced_snapshot)
+
+    def subscribe_snapshots(self,
+                            since: Optional[float] = None,
+                            reconnect_delay: float = SUBSCRIBE_RECONNECT_DELAY) -> Iterator[Tuple[float, SnapShotType]]:
+        """
+        Yield (timestamp, snapshot) for the current snapshot and then for every new one as soon as
+        the registry accepts it. Reconnects after errors and resumes from the last received
+        snapshot; stop iterating to unsubscribe.
+        """
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if since is not None:
+                headers["Last-Event-ID"] = repr(since)
+            try:
+                with self._request('GET', '/snapshot/subscribe',
+                                   headers=headers,
+                                   stream=True,
+                                   timeout=(SUBSCRIBE_RECONNECT_DELAY * 5, SUBSCRIBE_READ_TIMEOUT)) as response:
+                    response.raise_for_status()
+                    data_lines = []
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line.startswith('data:'):
+                            data_lines.append(line[len('data:'):].lstrip())
+                        elif not line and data_lines:
+                            body = json.loads('\n'.join(data_lines))
+                            data_lines = []
+                            since = body['timestamp']
+                            yield since, parse_snapshot(body['snapshot'])
+            except requests.HTTPError as http_err:
+                print(f"HTTP error occurred: {http_err}")  # HTTP error details
+            except Exception as err:
+                print(f"An error occurred: {err}")  # General error details
+            time.sleep(reconnect_delay)
@@ -0,0 +1,135 @@
+"""
+Export and import of registry history as a compact, streamable archive.
+
+An archive is a header (magic, format version) followed by one delta record per history
+entry, in timestamp order, encoded exactly like snapshot log delta records. There are no
+keyframes and no index, so an archive is written and read strictly sequentially and can be
+streamed over HTTP or a pipe; paths ending in `.gz` are gzip-compressed.
+
+Importing replays the deltas straight into the history store in one bulk write, without the
+diffing and per-snapshot publishing of add_snapshot.
+
+Usage:
+    python -m historical_nodes_registry.history_archive export <log_path> <archive_path>
+    python -m historical_nodes_registry.history_archive import <archive_path> <log_path>
+"""
+import argparse
+import gzip
+import struct
+from typing import BinaryIO, Iterable, Iterator, Tuple
+
+from historical_nodes_registry.snapshot_history import DEFAULT_KEYFRAME_INTERVAL, SnapshotDelta, SnapshotHistory
+from historical_nodes_registry.snapshot_log import (RECORD_DELTA,
+                                                    RECORD_HEADER,
+                                                    SnapshotLog,
+                                                    SnapshotLogError,
+                                                    decode_delta,
+                                                    encode_delta)
+
+ARCHIVE_MAGIC = b'ZHNA'
+ARCHIVE_VERSION = 2
+ARCHIVE_HEADER = struct.Struct('<4sH')
+ARCHIVE_MEDIA_TYPE = 'application/octet-stream'
+READ_CHUNK_SIZE = 1 << 20
+
+HistoryEntry = Tuple[float, SnapshotDelta]
+
+
+def open_archive(path: str, mode: str) -> BinaryIO:
+    """Open an archive file for 'rb' or 'wb', gzip-compressed if path ends in .gz."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def encode_archive(entries: Iterable[HistoryEntry]) -> Iterator[bytes]:
+    """Yield the archive of entries chunk by chunk: the header, then one record per entry."""
+    yield ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION)
+    for timestamp, delta in entries:
+        payload = encode_delta(delta)
+        yield RECORD_HEADER.pack(RECORD_DELTA, timestamp, len(payload)) + payload
+
+
+def write_archive(stream: BinaryIO, entries: Iterable[HistoryEntry]) -> int:
+    """Write entries to stream as an archive. Returns the number of entries written."""
+    written = -1
+    for chunk in encode_archive(entries):
+        stream.write(chunk)
+        written += 1
+    return written
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise SnapshotLogError("History archive is truncated.")
+    return data
+
+
+def read_archive(stream: BinaryIO) -> Iterator[HistoryEntry]:
+    """Yield (timestamp, delta) for every entry of the archive read from stream, oldest first."""
+    header = stream.read(ARCHIVE_HEADER.size)
+    if len(header) != ARCHIVE_HEADER.size or ARCHIVE_HEADER.unpack(header) != (ARCHIVE_MAGIC, ARCHIVE_VERSION):
+        raise SnapshotLogError(f"Not a version {ARCHIVE_VERSION} history archive.")
+    while True:
+        record_header = stream.read(RECORD_HEADER.size)
+        if not record_header:
+            return
+        if len(record_header) != RECORD_HEADER.size:
+            raise SnapshotLogError("History archive is truncated.")
+        kind, timestamp, payload_length = RECORD_HEADER.unpack(record_header)
+        if kind != RECORD_DELTA:
+            raise SnapshotLogError(f"Unexpected record kind {kind} in history archive.")
+        yield timestamp, decode_delta(_read_exactly(stream, payload_length), 0)
+
+
+def iter_log_entries(log: SnapshotLog) -> Iterator[HistoryEntry]:
+    for index in range(len(log)):
+        yield log.timestamps[index], log.delta(index)
+
+
+def export_log(log_path: str, archive_path: str) -> int:
+    """Write the history of the snapshot log at log_path to an archive."""
+    log = SnapshotLog(log_path, readonly=True)
+    try:
+        with open_archive(archive_path, 'wb') as stream:
+            return write_archive(stream, iter_log_entries(log))
+    finally:
+        log.close()
+
+
+def import_log(archive_path: str, log_path: str, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> int:
+    """
+    Append the archive's entries to the snapshot log at log_path, creating it if needed.
+    No registry process may have the log open meanwhile.
+    """
+    history = SnapshotHistory(store=SnapshotLog(log_path, keyframe_interval=keyframe_interval))
+    try:
+        with open_archive(archive_path, 'rb') as stream:
+            return history.extend(read_archive(stream))
+    finally:
+        history.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert between registry snapshot logs and history archives.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Write a snapshot log's history to an archive.")
+    export_parser.add_argument("log_path", type=str, help="Snapshot log to read.")
+    export_parser.add_argument("archive_path", type=str, help="Archive to write; .gz compresses it.")
+    import_parser = subparsers.add_parser("import", help="Append an archive's history to a snapshot log.")
+    import_parser.add_argument("archive_path", type=str, help="Archive to read.")
+    import_parser.add_argument("log_path", type=str, help="Snapshot log to append to. The registry must not be running on it.")
+    import_parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL,
+                               help="Entries between keyframes if the log is created.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "export":
+        entries = export_log(args.log_path, args.archive_path)
+        print(f"Exported {entries} entries from {args.log_path} to {args.archive_path}.")
+    else:
+        entries = import_log(args.archive_path, args.log_path, keyframe_interval=args.keyframe_interval)
+        print(f"Imported {entries} entries from {args.archive_path} into {args.log_path}.")
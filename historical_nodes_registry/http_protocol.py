@@ -0,0 +1,7 @@
+"""HTTP status codes and headers shared by the registry server and its clients."""
+HTTP_304_NOT_MODIFIED = 304
+# Timestamp of the snapshot after the one returned, sent when the returned one is not the latest
+NEXT_SNAPSHOT_HEADER = 'X-Next-Snapshot-Timestamp'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Set on range responses when every interval between consecutive snapshots is final
+FINAL_INTERVALS_HEADER = 'X-Snapshot-Intervals-Final'
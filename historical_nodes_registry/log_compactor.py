@@ -0,0 +1,18 @@
+import argparse
+
+from historical_nodes_registry.snapshot_history import DEFAULT_KEYFRAME_INTERVAL
+from historical_nodes_registry.snapshot_log import compact_log
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rewrite a registry snapshot log into evenly spaced keyframes.")
+    parser.add_argument("path", type=str, help="Path of the snapshot log. The registry must not be running on it.")
+    parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL,
+                        help="Entries between consecutive keyframes in the rewritten log.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    entries = compact_log(args.path, keyframe_interval=args.keyframe_interval)
+    print(f"Compacted {args.path} into {entries} entries.")
@@ -0,0 +1,34 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class LRUCache:
+    """
+    Thread-safe LRU of values computed once per key and evicted least recently used first.
+
+    Values are computed outside the lock, so a slow miss never holds up hits; concurrent
+    misses for one key may each compute it, which is harmless for values derived from
+    immutable data.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return value
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return value
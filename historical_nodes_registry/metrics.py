@@ -0,0 +1,212 @@
+"""
+Registry metrics in the Prometheus text exposition format.
+
+Collection is a few integer increments under a lock per observation: histograms have fixed
+buckets, labels come from a bounded set of route paths, and nothing is formatted until a
+scrape renders the text. Each server process keeps its own metrics.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOCK_WAIT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+OTHER_ROUTE = 'other'
+METRICS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with fixed upper bounds, safe to observe from any thread."""
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        bucket = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """Cumulative bucket counts (the last one is +Inf), sum and count, read consistently."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = []
+        running = 0
+        for bucket_count in counts:
+            running += bucket_count
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+class TimedLock:
+    """threading.Lock that records how long each acquisition waited in a histogram."""
+
+    def __init__(self, wait: Optional[Histogram] = None):
+        self._lock = threading.Lock()
+        self.wait = wait if wait is not None else Histogram(LOCK_WAIT_BUCKETS)
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self._lock.acquire()
+        self.wait.observe(time.perf_counter() - start)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label_value(value)}"' for key, value in labels.items()) + '}'
+
+
+def format_histogram(name: str, histogram: Histogram, labels: Optional[Dict[str, str]] = None) -> List[str]:
+    labels = labels or {}
+    cumulative, total, count = histogram.snapshot()
+    lines = []
+    for bound, bucket_count in zip((*histogram.bounds, '+Inf'), cumulative):
+        lines.append(f'{name}_bucket{_format_labels({**labels, "le": str(bound)})} {bucket_count}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {total!r}')
+    lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return lines
+
+
+class RouteMetrics:
+    """Request count by status, latency and request/response payload sizes of one route."""
+    __slots__ = ('statuses', 'latency', 'request_size', 'response_size')
+
+    def __init__(self):
+        self.statuses: Dict[int, int] = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+
+
+class HttpMetrics:
+    """
+    Per-route metrics of the HTTP requests a MetricsMiddleware saw.
+
+    Requests to paths that are not routes are counted under the 'other' route, so label
+    cardinality stays bounded.
+    """
+
+    def __init__(self, routes: Callable[[], Iterable[str]]):
+        self._routes = routes
+        self._known_paths: Optional[frozenset] = None
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._lock = threading.Lock()
+
+    def route_metrics(self, method: str, path: str) -> RouteMetrics:
+        if self._known_paths is None:
+            self._known_paths = frozenset(self._routes())
+        key = (method, path if path in self._known_paths else OTHER_ROUTE)
+        route_metrics = self.routes.get(key)
+        if route_metrics is None:
+            with self._lock:
+                route_metrics = self.routes.setdefault(key, RouteMetrics())
+        return route_metrics
+
+    def items(self) -> List[Tuple[Tuple[str, str], RouteMetrics]]:
+        """((method, route), metrics) pairs sorted by route."""
+        with self._lock:
+            return sorted(self.routes.items())
+
+    def count_status(self, route_metrics: RouteMetrics, status: int) -> None:
+        with self._lock:
+            route_metrics.statuses[status] = route_metrics.statuses.get(status, 0) + 1
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request until its last response byte and counting its payload bytes."""
+
+    def __init__(self, app, metrics: HttpMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        route_metrics = self.metrics.route_metrics(scope['method'], scope['path'])
+        request_size = response_size = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal request_size
+            message = await receive()
+            if message['type'] == 'http.request':
+                request_size += len(message.get('body', b''))
+            return message
+
+        async def counting_send(message):
+            nonlocal response_size, status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                response_size += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            route_metrics.latency.observe(time.perf_counter() - start)
+            route_metrics.request_size.observe(request_size)
+            route_metrics.response_size.observe(response_size)
+            self.metrics.count_status(route_metrics, status)
+
+
+class RegistryMetrics:
+    """Renders the /metrics page from the HTTP metrics and the state manager."""
+
+    def __init__(self, http_metrics: HttpMetrics, manager):
+        self._http_metrics = http_metrics
+        self._manager = manager
+
+    def render(self) -> str:
+        lines = ['# HELP registry_http_requests_total HTTP requests handled, by route and status.',
+                 '# TYPE registry_http_requests_total counter']
+        routes = self._http_metrics.items()
+        for (method, route), route_metrics in routes:
+            for status, count in sorted(route_metrics.statuses.items()):
+                labels = {"method": method, "route": route, "status": str(status)}
+                lines.append(f'registry_http_requests_total{_format_labels(labels)} {count}')
+
+        for name, attribute, help_text in (
+                ('registry_http_request_duration_seconds', 'latency', 'Time to the last response byte.'),
+                ('registry_http_request_size_bytes', 'request_size', 'Request body size.'),
+                ('registry_http_response_size_bytes', 'response_size', 'Response body size.')):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (method, route), route_metrics in routes:
+                lines.extend(format_histogram(name, getattr(route_metrics, attribute),
+                                              {"method": method, "route": route}))
+
+        lines.extend(['# HELP registry_lock_wait_seconds Time writers waited for the registry lock.',
+                      '# TYPE registry_lock_wait_seconds histogram',
+                      *format_histogram('registry_lock_wait_seconds', self._manager.lock_wait),
+                      '# HELP registry_snapshots Snapshots held in history.',
+                      '# TYPE registry_snapshots gauge',
+                      f'registry_snapshots {self._manager.snapshot_count()}',
+                      '# HELP registry_history_bytes Estimated memory held by history.',
+                      '# TYPE registry_history_bytes gauge',
+                      f'registry_history_bytes {self._manager.history_bytes()}'])
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,111 @@
+import bisect
+from array import array
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from historical_nodes_registry.node_record import NodeRecord
+
+CHANGE_FIELDS = ('socket', 'public_key_g2', 'stake')
+
+
+class NodeTimeline(NamedTuple):
+    """One node's presence intervals and field change timestamps, as answered by NodeHistoryIndex.query."""
+    node_id: str
+    intervals: List[Tuple[float, Optional[float]]]
+    changes: Dict[str, List[float]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"node_id": self.node_id,
+                "intervals": [list(interval) for interval in self.intervals],
+                "changes": self.changes}
+
+
+class NodeHistory:
+    """
+    Events of one node in timestamp order: joined[i] opens its i-th presence interval and left[i],
+    if present, closes it; each field in CHANGE_FIELDS has the timestamps at which it changed.
+    """
+    __slots__ = ('joined', 'left', 'changes', 'last')
+
+    def __init__(self):
+        self.joined = array('d')
+        self.left = array('d')
+        self.changes = {field: array('d') for field in CHANGE_FIELDS}
+        # Latest record seen, kept after the node leaves so a rejoin with new values is a change
+        self.last: Optional[NodeRecord] = None
+
+    def is_present(self) -> bool:
+        return len(self.joined) > len(self.left)
+
+
+class NodeHistoryIndex:
+    """
+    Per-node index of the history: when each node joined, left, and changed its socket, key or
+    stake. It is fed every delta in order and answers a query in O(log n) bisects over the
+    node's own events plus the size of the answer, instead of a scan over every snapshot.
+
+    Retention downsamples snapshots but not this index, so it keeps every event.
+    Events are only appended, so readers query it without a lock; they pass the last timestamp
+    of the generation they read to ignore events a concurrent writer has recorded since.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, NodeHistory] = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._nodes
+
+    def record(self, timestamp: float, delta) -> None:
+        """Index the SnapshotDelta stored at timestamp."""
+        nodes = self._nodes
+        for node_id in delta.removals:
+            history = nodes.get(node_id)
+            if history is not None and history.is_present():
+                history.left.append(timestamp)
+        for node_id, node_record in delta.upserts.items():
+            history = nodes.get(node_id)
+            if history is None:
+                history = nodes[node_id] = NodeHistory()
+            last = history.last
+            if last is not None:
+                for field in CHANGE_FIELDS:
+                    if getattr(last, field) != getattr(node_record, field):
+                        history.changes[field].append(timestamp)
+            if not history.is_present():
+                history.joined.append(timestamp)
+            history.last = node_record
+
+    def query(self,
+              node_id: str,
+              since: Optional[float] = None,
+              until: Optional[float] = None,
+              last_timestamp: Optional[float] = None) -> Optional[NodeTimeline]:
+        """
+        Presence intervals of node_id overlapping [since, until] and its changes within it, or
+        None if the node never appeared. Events after last_timestamp are ignored, and an
+        interval still open at until reports None as its end.
+        """
+        history = self._nodes.get(node_id)
+        if history is None:
+            return None
+        if last_timestamp is not None:
+            until = last_timestamp if until is None else min(until, last_timestamp)
+
+        joined, left = history.joined, history.left
+        joined_count = len(joined) if until is None else bisect.bisect_right(joined, until)
+        left_count = len(left) if until is None else bisect.bisect_right(left, until)
+        if joined_count == 0:
+            return None
+        # Intervals that ended before since are skipped; left is sorted like joined
+        first = 0 if since is None else bisect.bisect_left(left, since, 0, left_count)
+        intervals = [(joined[index], left[index] if index < left_count else None)
+                     for index in range(first, joined_count)]
+
+        changes = {}
+        for field, timestamps in history.changes.items():
+            start = 0 if since is None else bisect.bisect_left(timestamps, since)
+            stop = len(timestamps) if until is None else bisect.bisect_right(timestamps, until)
+            changes[field] = timestamps[start:stop].tolist()
+        return NodeTimeline(node_id=node_id, intervals=intervals, changes=changes)
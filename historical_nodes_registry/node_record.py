@@ -0,0 +1,94 @@
+import sys
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Union
+
+import xxhash
+
+from historical_nodes_registry.schema import NodeInfo, SnapShotType
+
+FINGERPRINT_MASK = 2 ** 64 - 1
+
+
+def fingerprint_fields(id: str, public_key_g2: str, address: str, socket: str, stake: int) -> int:
+    """xxh3 of the canonical encoding of a node: its fields in declaration order, NUL-separated."""
+    return xxhash.xxh3_64_intdigest('\x00'.join((id, public_key_g2, address, socket, str(stake))).encode('utf-8'))
+
+
+class NodeRecord(NamedTuple):
+    """
+    Immutable storage form of NodeInfo used inside the registry.
+
+    A plain tuple with interned strings, so every version of a node shares its key, address and
+    socket strings, and an unchanged node is one record shared by every snapshot it appears in.
+    The content fingerprint is computed once, so changed nodes are found with one integer compare.
+    NodeInfo is only built at the API boundary.
+    """
+    id: str
+    public_key_g2: str
+    address: str
+    socket: str
+    stake: int
+    fingerprint: int
+
+    @classmethod
+    def create(cls, id: str, public_key_g2: str, address: str, socket: str, stake: int) -> 'NodeRecord':
+        return cls(sys.intern(id), sys.intern(public_key_g2), sys.intern(address), sys.intern(socket), stake,
+                   fingerprint_fields(id, public_key_g2, address, socket, stake))
+
+    @classmethod
+    def from_node_info(cls, node_info: Union[NodeInfo, 'NodeRecord']) -> 'NodeRecord':
+        if isinstance(node_info, NodeRecord):
+            return node_info
+        return cls.create(node_info.id, node_info.public_key_g2, node_info.address, node_info.socket,
+                          node_info.stake)
+
+    def to_node_info(self) -> NodeInfo:
+        return NodeInfo(**self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "public_key_g2": self.public_key_g2, "address": self.address,
+                "socket": self.socket, "stake": self.stake}
+
+
+RecordSnapshot = Dict[str, NodeRecord]
+
+
+def to_records(snapshot: Union[SnapShotType, RecordSnapshot]) -> RecordSnapshot:
+    return {sys.intern(address): NodeRecord.from_node_info(node_info) for address, node_info in snapshot.items()}
+
+
+def to_node_infos(snapshot: RecordSnapshot) -> SnapShotType:
+    return {address: node_record.to_node_info() for address, node_record in snapshot.items()}
+
+
+def entry_fingerprint(address: str, node_record: NodeRecord) -> int:
+    """Fingerprint of one snapshot entry; entries keyed by the node's own id need no extra hashing."""
+    if address == node_record.id:
+        return node_record.fingerprint
+    return xxhash.xxh3_64_intdigest(address.encode('utf-8'), seed=node_record.fingerprint)
+
+
+def snapshot_fingerprint(snapshot: Optional[RecordSnapshot]) -> Optional[int]:
+    """
+    Order-independent content fingerprint of a snapshot: the sum of its entry fingerprints modulo 2**64.
+
+    Being a sum, it is updated in O(changed nodes) when a delta is applied.
+    """
+    if snapshot is None:
+        return None
+    return sum(entry_fingerprint(address, node_record) for address, node_record in snapshot.items()) & FINGERPRINT_MASK
+
+
+def update_fingerprint(fingerprint: int,
+                       removed: Iterable[tuple],
+                       added: Iterable[tuple]) -> int:
+    """Fingerprint after replacing the (address, record) entries in removed with those in added."""
+    for address, node_record in removed:
+        fingerprint -= entry_fingerprint(address, node_record)
+    for address, node_record in added:
+        fingerprint += entry_fingerprint(address, node_record)
+    return fingerprint & FINGERPRINT_MASK
+
+
+def format_version(fingerprint: Optional[int]) -> Optional[str]:
+    """Snapshot version id exposed in responses: the content fingerprint as 16 hex digits."""
+    return None if fingerprint is None else f'{fingerprint:016x}'
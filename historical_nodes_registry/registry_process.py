@@ -0,0 +1,167 @@
+"""
+Supervised out-of-process registry.
+
+Running the registry in a thread of a simulation makes its request handling share the GIL
+with the load generator, so each distorts the other's latency. RegistryProcess runs it in a
+child process started with the spawn method, optionally pinned to its own CPUs, waits until it
+accepts connections and shuts it down with SIGTERM, which uvicorn handles gracefully.
+"""
+import atexit
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Iterable, Optional
+
+import uvicorn
+
+from historical_nodes_registry.retention import RetentionPolicy
+
+STARTUP_TIMEOUT = 20.0
+SHUTDOWN_TIMEOUT = 10.0
+READY_POLL_INTERVAL = 0.05
+READY_MESSAGE = 'ready'
+PROBE_MESSAGE = 'probe'
+
+
+def pin_to_cpus(cpus: Optional[Iterable[int]]) -> None:
+    """Restrict the calling process to cpus; a no-op where CPU affinity is not supported."""
+    if cpus is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, set(cpus))
+
+
+def signal_when_started(server: uvicorn.Server, ready) -> None:
+    while not server.started:
+        if server.should_exit:
+            return
+        time.sleep(READY_POLL_INTERVAL)
+    ready.send(READY_MESSAGE)
+    ready.close()
+
+
+def serve_registry(ready, host: str, port: int, log_path: Optional[str], workers: int,
+                   retention: Optional[RetentionPolicy], history_path: Optional[str],
+                   cpus: Optional[Iterable[int]]) -> None:
+    """Entry point of the registry process; tells the parent through ready once it is serving."""
+    pin_to_cpus(cpus)
+    if workers > 1:
+        # uvicorn supervises the workers itself, so readiness is left to the parent's port probe
+        ready.send(PROBE_MESSAGE)
+        ready.close()
+        from historical_nodes_registry.runner import run_registry_server
+        run_registry_server(host, port, log_path=log_path, workers=workers, retention=retention,
+                            history_path=history_path)
+        return
+
+    from historical_nodes_registry.server import create_server_app
+    app = create_server_app(log_path=log_path, retention=retention, history_path=history_path)
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port))
+    threading.Thread(target=signal_when_started, args=(server, ready), daemon=True).start()
+    server.run()
+
+
+def port_accepts(host: str, port: int) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=READY_POLL_INTERVAL):
+            return True
+    except OSError:
+        return False
+
+
+class RegistryProcess:
+    """
+    Historical nodes registry running in a dedicated child process.
+
+    start() returns once the registry serves requests and raises if it exits or does not come
+    up within startup_timeout. stop() sends SIGTERM, waits for a graceful exit and kills the
+    process if it overruns shutdown_timeout. Also usable as a context manager.
+    With cpus, the registry is pinned to those CPUs (Linux only).
+    """
+
+    def __init__(self,
+                 host: str,
+                 port: int,
+                 log_path: Optional[str] = None,
+                 workers: int = 1,
+                 retention: Optional[RetentionPolicy] = None,
+                 history_path: Optional[str] = None,
+                 cpus: Optional[Iterable[int]] = None,
+                 startup_timeout: float = STARTUP_TIMEOUT,
+                 shutdown_timeout: float = SHUTDOWN_TIMEOUT):
+        self.host = host
+        self.port = port
+        self._options = (log_path, workers, retention, history_path, None if cpus is None else tuple(cpus))
+        self._startup_timeout = startup_timeout
+        self._shutdown_timeout = shutdown_timeout
+        self._process: Optional[multiprocessing.Process] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return None if self._process is None else self._process.pid
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self) -> 'RegistryProcess':
+        if self.is_alive():
+            raise RuntimeError("Registry process is already running.")
+        context = multiprocessing.get_context('spawn')
+        ready, child_ready = context.Pipe(duplex=False)
+        self._process = context.Process(target=serve_registry,
+                                        args=(child_ready, self.host, self.port, *self._options),
+                                        name='historical-nodes-registry')
+        # Not a daemon, as a multi-worker registry starts processes of its own; stopped at exit instead
+        self._process.start()
+        atexit.register(self.stop)
+        child_ready.close()
+        try:
+            self._wait_ready(ready)
+        except BaseException:
+            self.stop()
+            raise
+        finally:
+            ready.close()
+        return self
+
+    def _wait_ready(self, ready) -> None:
+        deadline = time.monotonic() + self._startup_timeout
+        message = None
+        while time.monotonic() < deadline:
+            if not self._process.is_alive():
+                raise RuntimeError(f"Registry process exited during startup with code {self._process.exitcode}.")
+            if message is None:
+                try:
+                    if ready.poll(READY_POLL_INTERVAL):
+                        message = ready.recv()
+                except EOFError:
+                    # Closed without a message: the start failed and the process is exiting
+                    message = EOFError
+            if message == READY_MESSAGE:
+                return
+            if message == PROBE_MESSAGE and port_accepts(self.host, self.port):
+                return
+            if message is not None:
+                time.sleep(READY_POLL_INTERVAL)
+        raise TimeoutError(f"Registry did not start within {self._startup_timeout} seconds.")
+
+    def stop(self) -> Optional[int]:
+        """Shut the registry down and return its exit code; -SIGTERM after uvicorn's graceful shutdown."""
+        process = self._process
+        if process is None:
+            return None
+        atexit.unregister(self.stop)
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+            process.join(self._shutdown_timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        return process.exitcode
+
+    def __enter__(self) -> 'RegistryProcess':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -1,21 +1,77 @@
-import bisect
-import copy
+import gc
+import itertools
+import math
 import threading
 import time
-from typing import Dict, Optional, List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
+from historical_nodes_registry.metrics import Histogram, TimedLock
+from historical_nodes_registry.node_history import NodeTimeline
+from historical_nodes_registry.node_record import NodeRecord, RecordSnapshot, snapshot_fingerprint, to_records
 from historical_nodes_registry.schema import NodeInfo, SnapShotType
+from historical_nodes_registry.retention import (DEFAULT_RETENTION_PERIOD,
+                                                 RetentionPolicy,
+                                                 RetentionReport,
+                                                 downsample_store,
+                                                 interval_lifetime,
+                                                 run_retention,
+                                                 select_survivors)
+from historical_nodes_registry.snapshot_history import (DEFAULT_KEYFRAME_INTERVAL,
+                                                        HistoryGeneration,
+                                                        MemorySnapshotStore,
+                                                        SnapshotDelta,
+                                                        SnapshotHistory)
+from historical_nodes_registry.snapshot_log import open_snapshot_history
+
+IMPORT_BATCH_SIZE = 1000
 
 
 class RegistryStateManager:
-    """Manages a time series of node snapshots and the current state of nodes."""
+    """
+    Manages a time series of node snapshots and the current state of nodes.
+
+    Snapshots are stored and returned as NodeRecord maps; NodeInfo is accepted on writes and
+    converted once, so pydantic models never live in the history.
+
+    Writers serialize on a lock and publish an immutable HistoryGeneration per write; readers
+    take the current generation once per call and never lock, so they always see one
+    consistent history and latest snapshot.
+
+    With a writer, the manager is a read-only view of the log at log_path: writes are forwarded
+    to the writer process that owns the log, and reads pick up whatever it has appended.
+
+    With a retention policy, a background thread downsamples old in-memory history every
+    retention_period seconds; durable logs are compacted offline with log_compactor instead.
+    """
 
-    def __init__(self, logger):
-        self._snapshots: List[Tuple[float, SnapShotType]] = []
-        self._last_timestamp: Optional[float] = None
-        self._last_snapshot: Optional[SnapShotType] = None
+    def __init__(self,
+                 logger,
+                 keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                 log_path: Optional[str] = None,
+                 writer=None,
+                 retention: Optional[RetentionPolicy] = None,
+                 retention_period: float = DEFAULT_RETENTION_PERIOD):
+        if writer is not None and log_path is None:
+            raise ValueError("A registry forwarding writes to a writer must read from its log_path.")
+        if retention is not None and log_path is not None:
+            raise ValueError("Retention applies to in-memory history; compact snapshot logs with log_compactor.")
+        self._writer = writer
+        if log_path is None:
+            self._history = SnapshotHistory(keyframe_interval=keyframe_interval)
+        else:
+            self._history = open_snapshot_history(log_path,
+                                                  keyframe_interval=keyframe_interval,
+                                                  readonly=writer is not None)
+        if len(self._history):
+            logger.info(f"Restored {len(self._history)} snapshots from {log_path}")
         self._logger = logger
-        self._lock = threading.Lock()
+        # Times every writer acquisition, so contention shows up in the lock wait metric
+        self._lock = TimedLock()
+        self._retention_lock = threading.Lock()
+        self._listeners: List[Callable[[float], None]] = []
+        self._retention = retention
+        if retention is not None:
+            threading.Thread(target=run_retention, args=(self, retention, retention_period), daemon=True).start()
 
     @staticmethod
     def _parse_snapshot(snapshot_data) -> SnapShotType:
@@ -31,34 +87,282 @@ class RegistryStateManager:
             for address, node_info in snapshot.items()
         }
 
-    def get_snapshot_by_timestamp(self, query_timestamp: Optional[float]) -> Tuple[float, SnapShotType]:
+    def find_snapshot_timestamp(self, query_timestamp: Optional[float]) -> Optional[float]:
+        """Timestamp of the stored snapshot a query resolves to, or None if it resolves to none."""
+        generation = self._generation()
         if query_timestamp is None:
-            return self._last_timestamp, self._last_snapshot
+            return generation.last_timestamp
+        idx = generation.index_at(query_timestamp)
+        return generation.timestamp_at(idx) if idx >= 0 else None
 
-        timestamps = [ts for ts, _ in self._snapshots]
+    def find_snapshot_interval(self, query_timestamp: Optional[float]) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Timestamp of the stored snapshot a query resolves to and of the snapshot after it.
 
-        # Exact match
-        if query_timestamp in timestamps:
-            idx = timestamps.index(query_timestamp)
-            return self._snapshots[idx]
+        Every query in [snapshot timestamp, next timestamp) resolves to the same snapshot. History
+        is append-only, so once a next snapshot exists that stays true for as long as
+        interval_lifetime says: forever unless retention may downsample the snapshot away.
+        """
+        generation = self._generation()
+        if query_timestamp is None:
+            return generation.last_timestamp, None
+        idx = generation.index_at(query_timestamp)
+        next_timestamp = generation.timestamp_at(idx + 1) if idx + 1 < len(generation) else None
+        return (generation.timestamp_at(idx) if idx >= 0 else None), next_timestamp
+
+    def interval_lifetime(self, snapshot_timestamp: Optional[float], next_timestamp: float) -> Optional[float]:
+        """
+        Seconds for which an interval from find_snapshot_interval is sure to stand, or None if it
+        always will. Only the retention policy the manager runs can shorten it; queries before the
+        first snapshot keep resolving to the empty snapshot, since the first entry always survives.
+        """
+        if self._retention is None or snapshot_timestamp is None:
+            return None
+        return interval_lifetime(self._retention, snapshot_timestamp, next_timestamp, time.time())
 
-        # Closest match
-        idx = bisect.bisect_right(timestamps, query_timestamp) - 1
+    def get_snapshot_by_timestamp(self, query_timestamp: Optional[float]) -> Tuple[float, RecordSnapshot]:
+        generation = self._generation()
+        if query_timestamp is None:
+            return generation.last_timestamp, (generation.latest if len(generation) else None)
+
+        # A single bisect covers both the exact and the closest earlier match
+        idx = generation.index_at(query_timestamp)
         if idx < 0:
             return query_timestamp, {}
-        return self._snapshots[idx]
+        return generation.timestamp_at(idx), generation.snapshot_at(idx)
+
+    def iter_snapshots(self,
+                       start_timestamp: float,
+                       end_timestamp: Optional[float] = None) -> Iterator[Tuple[float, RecordSnapshot]]:
+        """
+        Yield the snapshot in effect at start_timestamp, if any, then every snapshot stored up to
+        end_timestamp (default: the latest at the time of the call).
+        """
+        generation = self._generation()
+        end_index = len(generation) - 1 if end_timestamp is None else generation.index_at(end_timestamp)
+        start_index = max(generation.index_at(start_timestamp), 0)
+        return generation.iter_range(start_index, end_index)
+
+    def get_snapshot_diff(self,
+                          since_timestamp: Optional[float],
+                          until_timestamp: Optional[float] = None
+                          ) -> Tuple[Optional[float], Optional[float], SnapshotDelta]:
+        """
+        Nodes added, changed or removed between the snapshots two timestamps resolve to.
+
+        Returns the resolved (since, until) snapshot timestamps and the delta. A since that
+        resolves to no snapshot diffs from the empty snapshot; until defaults to the latest.
+        """
+        generation = self._generation()
+        end_index = len(generation) - 1 if until_timestamp is None else generation.index_at(until_timestamp)
+        start_index = -1 if since_timestamp is None else generation.index_at(since_timestamp)
+        if end_index < 0:
+            return None, None, SnapshotDelta(upserts={}, removals=())
+        if start_index > end_index:
+            raise ValueError(f"since {since_timestamp} resolves to a snapshot after until {until_timestamp}.")
+        resolved_since = generation.timestamp_at(start_index) if start_index >= 0 else None
+        return resolved_since, generation.timestamp_at(end_index), generation.delta_between(start_index, end_index)
+
+    def get_node_history(self,
+                         node_id: str,
+                         since_timestamp: Optional[float] = None,
+                         until_timestamp: Optional[float] = None) -> Optional[NodeTimeline]:
+        """
+        When node_id was present and when its socket, key or stake changed between two timestamps,
+        or None if it never appeared in them.
+        """
+        generation = self._generation()
+        if not len(generation):
+            return None
+        return self._history.node_index.query(node_id, since_timestamp, until_timestamp, generation.last_timestamp)
+
+    @property
+    def lock_wait(self) -> Histogram:
+        """Seconds each acquisition of the writer lock waited."""
+        return self._lock.wait
+
+    @property
+    def retention(self) -> Optional[RetentionPolicy]:
+        """Policy of the background retention thread, if any."""
+        return self._retention
+
+    def snapshot_count(self) -> int:
+        return len(self._generation())
+
+    def history_bytes(self) -> int:
+        """Estimated memory held by the stored history; a running total, cheap to read."""
+        return self._history.store.nbytes()
+
+    def refresh(self) -> bool:
+        """Pick up snapshots the writer appended to the shared log and notify listeners."""
+        with self._lock:
+            if not self._history.refresh():
+                return False
+            last_timestamp = self._history.generation.last_timestamp
+
+        self._notify(last_timestamp)
+        return True
 
-    def add_snapshot(self, snapshot: SnapShotType):
-        if snapshot != self._last_snapshot:
+    def apply_retention(self, policy: RetentionPolicy, now: Optional[float] = None) -> RetentionReport:
+        """
+        Downsample history older than policy.keep_full seconds before now (default: the current time).
+
+        The surviving entries are rewritten off the writer lock; only carrying over entries
+        written meanwhile and swapping in the new store happen under it.
+        """
+        store = self._history.store
+        if not isinstance(store, MemorySnapshotStore):
+            raise ValueError("Retention applies to in-memory history; compact snapshot logs with log_compactor.")
+        with self._retention_lock:
+            start_time = time.perf_counter()
+            length = len(self._history.generation)
+            cutoff = (time.time() if now is None else now) - policy.keep_full
+            survivors = select_survivors(store.timestamps, length, cutoff, policy)
+            if len(survivors) == length:
+                return RetentionReport(length, length, 0, time.perf_counter() - start_time)
+
+            bytes_before = store.nbytes()
+            # Catch the node index up off the writer lock; replace_store records the rest under it
+            self._history.catch_up_node_index()
+            downsampled = downsample_store(store, survivors)
+            bytes_reclaimed = bytes_before - downsampled.nbytes()
             with self._lock:
-                now_timestamp = time.time()
-                self._last_timestamp, self._last_snapshot, self._snapshots = (snapshot
-                                                                              , now_timestamp
-                                                                              , [*self._snapshots,
-                                                                                 (now_timestamp, snapshot)])
-
-    def update_node_info(self, node_info: NodeInfo):
-        last_snapshot_copy = copy.deepcopy(self._snapshots)
-        last_snapshot_copy = {node_info.id: node_info} if last_snapshot_copy is None else {**last_snapshot_copy,
-                                                                                           node_info.id: node_info}
-        self.add_snapshot(last_snapshot_copy)
+                self._history.replace_store(downsampled, length)
+            report = RetentionReport(entries_before=length,
+                                     entries_after=len(survivors),
+                                     bytes_reclaimed=bytes_reclaimed,
+                                     duration=time.perf_counter() - start_time)
+        self._logger.info(f"Retention dropped {report.entries_before - report.entries_after} snapshots "
+                          f"and reclaimed about {report.bytes_reclaimed} bytes in {report.duration:.3f}s")
+        return report
+
+    def _generation(self) -> HistoryGeneration:
+        self._sync()
+        return self._history.generation
+
+    def _sync(self):
+        if self._writer is not None and self._history.pending():
+            self.refresh()
+
+    def add_listener(self, listener: Callable[[float], None]):
+        """Call listener with the timestamp of every snapshot accepted from now on."""
+        self._listeners.append(listener)
+
+    def _next_timestamp(self) -> float:
+        now_timestamp = time.time()
+        last_timestamp = self._history.generation.last_timestamp
+        if last_timestamp is not None:
+            # Keep timestamps strictly increasing so each one identifies a single snapshot,
+            # even if the wall clock steps backwards
+            now_timestamp = max(now_timestamp, math.nextafter(last_timestamp, math.inf))
+        return now_timestamp
+
+    def _notify(self, timestamp: float):
+        for listener in self._listeners:
+            listener(timestamp)
+
+    def add_snapshot(self, snapshot: Union[SnapShotType, RecordSnapshot]) -> float:
+        """Store snapshot if it changed and return the timestamp of the latest stored snapshot."""
+        snapshot = to_records(snapshot)
+        if self._writer is not None:
+            timestamp = self._writer.add_snapshot(snapshot)
+            self.refresh()
+            return timestamp
+
+        fingerprint = snapshot_fingerprint(snapshot)
+        with self._lock:
+            generation = self._history.generation
+            # Duplicate POSTs are the common case; one integer compare settles them
+            if len(generation) and fingerprint == generation.fingerprint:
+                return generation.last_timestamp
+            now_timestamp = self._next_timestamp()
+            if not self._history.append(now_timestamp, snapshot):
+                return generation.last_timestamp
+
+        self._notify(now_timestamp)
+        return now_timestamp
+
+    def update_nodes_info(self, nodes_info: Iterable[Union[NodeInfo, NodeRecord]]) -> Optional[float]:
+        """
+        Apply many node updates atomically as one new snapshot and return the latest timestamp.
+
+        The new snapshot is stored as a delta over the last one and published without copying
+        the latest snapshot, so its cost grows with the number of updated nodes. The exception is
+        every keyframe_interval-th snapshot, which also stores a full keyframe; amortized, that
+        adds network size / keyframe_interval per write. Later updates of the same node win and
+        updates that change nothing are dropped.
+        """
+        records = [NodeRecord.from_node_info(node_info) for node_info in nodes_info]
+        if self._writer is not None:
+            timestamp = self._writer.update_nodes_info(records)
+            self.refresh()
+            return timestamp
+
+        with self._lock:
+            upserts = {}
+            for node_record in records:
+                current = self._history.latest_node(node_record.id)
+                if current is None or current.fingerprint != node_record.fingerprint:
+                    upserts[node_record.id] = node_record
+                else:
+                    upserts.pop(node_record.id, None)
+            if not upserts:
+                return self._history.generation.last_timestamp
+            now_timestamp = self._next_timestamp()
+            self._history.append_delta(now_timestamp, SnapshotDelta(upserts=upserts, removals=()))
+
+        self._notify(now_timestamp)
+        return now_timestamp
+
+    def update_node_info(self, node_info: Union[NodeInfo, NodeRecord]) -> Optional[float]:
+        return self.update_nodes_info([node_info])
+
+    def export_history(self) -> Iterator[Tuple[float, SnapshotDelta]]:
+        """(timestamp, delta) of every stored snapshot as of the call, oldest first; see history_archive."""
+        return self._generation().iter_deltas()
+
+    def import_history(self, entries: Iterable[Tuple[float, SnapshotDelta]]) -> int:
+        """
+        Bulk-load exported (timestamp, delta) entries after the stored history and return how
+        many were stored. Entries are appended as they are, without diffing or publishing
+        each snapshot, so they must continue the stored history; importing into an empty
+        registry replays a recorded network. An error stops the import at the offending entry;
+        the entries before it stay stored.
+
+        entries may be a slow stream such as a request body: it is drained outside the write
+        lock and stored IMPORT_BATCH_SIZE entries at a time, so other writes go on meanwhile
+        and are ordered between batches.
+        """
+        if self._writer is not None:
+            raise ValueError("History can only be imported into the registry process that owns it.")
+        entries = iter(entries)
+        stored = 0
+        # Bulk loading allocates millions of long-lived records; collecting while they pile up
+        # only rescans them, and roughly doubles the load time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            while True:
+                batch = []
+                try:
+                    batch.extend(itertools.islice(entries, IMPORT_BATCH_SIZE))
+                finally:
+                    # A decoding error still stores the entries read before it
+                    if batch:
+                        stored += self._store_import_batch(batch)
+                if len(batch) < IMPORT_BATCH_SIZE:
+                    break
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        if stored:
+            self._logger.info(f"Imported {stored} snapshots")
+        return stored
+
+    def _store_import_batch(self, batch: List[Tuple[float, SnapshotDelta]]) -> int:
+        with self._lock:
+            stored = self._history.extend(batch)
+            last_timestamp = self._history.generation.last_timestamp
+        if stored:
+            self._notify(last_timestamp)
+        return stored
@@ -0,0 +1,72 @@
+import json
+from typing import Callable, NamedTuple, Optional, Tuple
+
+import xxhash
+
+from historical_nodes_registry.lru_cache import LRUCache
+from historical_nodes_registry.node_record import RecordSnapshot, format_version, snapshot_fingerprint
+from historical_nodes_registry.snapshot_history import SnapshotDelta
+
+
+class EncodedSnapshot(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def encode_snapshot_response(timestamp: Optional[float], snapshot: Optional[RecordSnapshot]) -> bytes:
+    """
+    JSON body of GET /snapshot/: what FastAPI produced for dict(timestamp=..., snapshot=...), plus
+    the snapshot version id, total stake and node count.
+    """
+    snapshot_dict = None if snapshot is None else {
+        address: node_record.to_dict()
+        for address, node_record in snapshot.items()
+    }
+    return json.dumps({"timestamp": timestamp,
+                       "version": format_version(snapshot_fingerprint(snapshot)),
+                       "total_stake": sum(node_record.stake for node_record in (snapshot or {}).values()),
+                       "node_count": len(snapshot or {}),
+                       "snapshot": snapshot_dict}, separators=(',', ':')).encode('utf-8')
+
+
+def encode_diff_response(since: Optional[float], timestamp: Optional[float], delta: SnapshotDelta) -> bytes:
+    """JSON body of GET /snapshot/diff."""
+    return json.dumps({
+        "since": since,
+        "timestamp": timestamp,
+        "upserts": {address: node_record.to_dict() for address, node_record in delta.upserts.items()},
+        "removals": list(delta.removals),
+    }, separators=(',', ':')).encode('utf-8')
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{xxhash.xxh3_64_hexdigest(body)}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag, as RFC 9110 prescribes for GET."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class SnapshotResponseCache(LRUCache):
+    """
+    LRU of encoded GET /snapshot/ bodies keyed by the stored snapshot timestamp.
+
+    Stored snapshots never change, so an entry is encoded and hashed once and then served
+    as raw bytes to every poller until it is evicted.
+    """
+
+    def get(self,
+            snapshot_timestamp: float,
+            load_snapshot: Callable[[float], Tuple[float, RecordSnapshot]]) -> EncodedSnapshot:
+        def encode() -> EncodedSnapshot:
+            body = encode_snapshot_response(*load_snapshot(snapshot_timestamp))
+            return EncodedSnapshot(body=body, etag=make_etag(body))
+
+        return self.get_or_compute(snapshot_timestamp, encode)
@@ -0,0 +1,132 @@
+"""
+Retention and downsampling of registry history.
+
+History newer than the retention window is kept in full. Older history keeps one snapshot
+per downsampling interval: the last one stored in it, which is the state in effect from then
+until the next surviving snapshot. A query timestamp inside a downsampled range therefore
+resolves to the latest surviving snapshot at or before it, which reflects the network at
+some point between the start of its interval and the query.
+
+Downsampling changes what some timestamps resolve to, so an answer that will never change
+under append-only history may change once retention reaches it; interval_lifetime tells how
+long a served answer is sure to stand.
+
+A pass rewrites the surviving entries into a new store off the writer lock, in batches, and
+then swaps it in under the lock after carrying over any entries written meanwhile, so reads
+and writes continue throughout.
+"""
+import logging
+import math
+import time
+from typing import List, NamedTuple, Optional
+
+from historical_nodes_registry.snapshot_history import MemorySnapshotStore, SnapshotDelta, apply_delta
+
+DEFAULT_RETENTION_PERIOD = 60.0
+DEFAULT_BATCH_SIZE = 1_000
+DEFAULT_BATCH_PAUSE = 0.001
+
+
+class RetentionPolicy(NamedTuple):
+    """
+    Keep every snapshot of the last keep_full seconds and one per downsample_interval seconds
+    before that. Intervals start at epoch_origin + k * downsample_interval, so they can be
+    aligned to epoch boundaries.
+    """
+    keep_full: float
+    downsample_interval: float
+    epoch_origin: float = 0.0
+
+    @classmethod
+    def from_hours(cls, keep_hours: float, downsample_interval: float, epoch_origin: float = 0.0) -> 'RetentionPolicy':
+        return cls(keep_full=keep_hours * 3600, downsample_interval=downsample_interval, epoch_origin=epoch_origin)
+
+
+class RetentionReport(NamedTuple):
+    entries_before: int
+    entries_after: int
+    bytes_reclaimed: int
+    duration: float
+
+
+def interval_of(policy: RetentionPolicy, timestamp: float) -> int:
+    return math.floor((timestamp - policy.epoch_origin) / policy.downsample_interval)
+
+
+def select_survivors(timestamps, length: int, cutoff: float, policy: RetentionPolicy) -> List[int]:
+    """Indices among the first length entries that a pass with the given cutoff keeps."""
+    survivors = []
+    for index in range(length):
+        timestamp = timestamps[index]
+        # The last entry of every interval survives, and so does the last entry of the copied
+        # range, which entries written during the pass are stored as deltas against. The first
+        # entry is kept too, so queries early in the first interval still find a snapshot.
+        if (timestamp >= cutoff or index == 0 or index == length - 1 or timestamps[index + 1] >= cutoff
+                or interval_of(policy, timestamps[index + 1]) != interval_of(policy, timestamp)):
+            survivors.append(index)
+    return survivors
+
+
+def interval_lifetime(policy: RetentionPolicy,
+                      snapshot_timestamp: float,
+                      next_timestamp: float,
+                      now: float) -> Optional[float]:
+    """
+    Seconds from now during which queries in [snapshot_timestamp, next_timestamp) are sure to
+    keep resolving to snapshot_timestamp, or None if they always will.
+
+    A snapshot followed by one in a later downsampling interval is the last of its interval
+    and survives every pass. Any other snapshot is dropped by the first pass after its
+    successor leaves the full retention window.
+    """
+    if interval_of(policy, next_timestamp) != interval_of(policy, snapshot_timestamp):
+        return None
+    return max(0.0, next_timestamp + policy.keep_full - now)
+
+
+def downsample_store(store,
+                     survivors: List[int],
+                     batch_size: int = DEFAULT_BATCH_SIZE,
+                     batch_pause: float = DEFAULT_BATCH_PAUSE) -> MemorySnapshotStore:
+    """
+    New store holding only the surviving entries of store, each with a delta folded from the
+    entries it replaces. Pauses every batch_size entries so the pass never hogs the interpreter.
+    """
+    downsampled = MemorySnapshotStore(keyframe_interval=store.keyframe_interval)
+    snapshot = {}
+    upserts = {}
+    removals = set()
+    survivor_idx = 0
+    for index in range(survivors[-1] + 1 if survivors else 0):
+        delta = store.delta(index)
+        apply_delta(snapshot, delta)
+        for node_id in delta.removals:
+            upserts.pop(node_id, None)
+            removals.add(node_id)
+        for node_id, node_record in delta.upserts.items():
+            removals.discard(node_id)
+            upserts[node_id] = node_record
+
+        if index == survivors[survivor_idx]:
+            if not len(downsampled):
+                folded = SnapshotDelta(upserts=dict(snapshot), removals=())
+            else:
+                folded = SnapshotDelta(upserts=upserts, removals=tuple(removals))
+            keyframe = dict(snapshot) if len(downsampled) % downsampled.keyframe_interval == 0 else None
+            downsampled.append(store.timestamps[index], folded, keyframe)
+            upserts, removals = {}, set()
+            survivor_idx += 1
+        if index % batch_size == batch_size - 1:
+            time.sleep(batch_pause)
+    return downsampled
+
+
+def run_retention(manager, policy: RetentionPolicy, period: float = DEFAULT_RETENTION_PERIOD) -> None:
+    """Apply policy to manager every period seconds; meant for a daemon thread."""
+    logger = logging.getLogger('historical_nodes_registry.retention')
+    while True:
+        time.sleep(period)
+        try:
+            manager.apply_retention(policy)
+        except Exception as e:
+            logger.error(f"Retention pass failed: {e}")
@@ -1,17 +1,55 @@
+import argparse
+from typing import Optional
+
 import uvicorn
 
+from historical_nodes_registry.retention import RetentionPolicy
 from historical_nodes_registry.server import create_server_app
 
 registry_host = 'localhost'
 registry_port = 8000
 
 
-def run_registry_server(host, port):
-    snapshot_server_app = create_server_app()
+def run_registry_server(host, port, log_path: Optional[str] = None, workers: int = 1,
+                        retention: Optional[RetentionPolicy] = None, history_path: Optional[str] = None):
+    if workers > 1:
+        if retention is not None:
+            raise ValueError("Retention applies to in-memory history, which multi-worker registries do not use.")
+        if history_path is not None:
+            raise ValueError("Import history into the snapshot log of a multi-worker registry with history_archive.")
+        from historical_nodes_registry.workers import run_multi_worker_registry_server
+        run_multi_worker_registry_server(host=host, port=port, workers=workers, log_path=log_path)
+        return
+
+    snapshot_server_app = create_server_app(log_path=log_path, retention=retention, history_path=history_path)
     config = uvicorn.Config(snapshot_server_app, host=host, port=port)
     server = uvicorn.Server(config)
     server.run()
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the historical nodes registry server.")
+    parser.add_argument("--host", type=str, default=registry_host)
+    parser.add_argument("--port", type=int, default=registry_port)
+    parser.add_argument("--log-path", type=str, default=None,
+                        help="Append-only snapshot log to persist history across restarts.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Read worker processes; more than one adds a writer process owning the log.")
+    parser.add_argument("--retain-hours", type=float, default=None,
+                        help="Keep full in-memory history for this many hours and downsample older history.")
+    parser.add_argument("--downsample-interval", type=float, default=3600.0,
+                        help="Seconds per surviving snapshot in downsampled history.")
+    parser.add_argument("--epoch-origin", type=float, default=0.0,
+                        help="Timestamp downsampling intervals are aligned to.")
+    parser.add_argument("--import-history", type=str, default=None,
+                        help="History archive to bulk-load before serving.")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    run_registry_server(host=registry_host, port=registry_port)
+    args = parse_args()
+    retention = None if args.retain_hours is None else RetentionPolicy.from_hours(args.retain_hours,
+                                                                                  args.downsample_interval,
+                                                                                  args.epoch_origin)
+    run_registry_server(host=args.host, port=args.port, log_path=args.log_path, workers=args.workers,
+                        retention=retention, history_path=args.import_history)
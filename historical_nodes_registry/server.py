@@ -1,47 +1,317 @@
+import asyncio
+import io
 import threading
-import time
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Body, Depends, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
+from historical_nodes_registry.http_protocol import (FINAL_INTERVALS_HEADER,
+                                                     HTTP_304_NOT_MODIFIED,
+                                                     IMMUTABLE_CACHE_CONTROL,
+                                                     NEXT_SNAPSHOT_HEADER)
+from historical_nodes_registry.history_archive import (ARCHIVE_MEDIA_TYPE,
+                                                       READ_CHUNK_SIZE,
+                                                       encode_archive,
+                                                       open_archive,
+                                                       read_archive)
+from historical_nodes_registry.metrics import METRICS_MEDIA_TYPE, HttpMetrics, MetricsMiddleware, RegistryMetrics
 from historical_nodes_registry.registry_state_manager import RegistryStateManager
+from historical_nodes_registry.node_record import format_version, snapshot_fingerprint, to_records
+from historical_nodes_registry.retention import RetentionPolicy
 from historical_nodes_registry.schema import NodeInfo
+from historical_nodes_registry.stake_aggregates import StakeAggregatesCache, compute_stake_aggregates
 from historical_nodes_registry.errors import SnapshotQueryError
+from historical_nodes_registry.response_cache import (SnapshotResponseCache,
+                                                      encode_diff_response,
+                                                      encode_snapshot_response,
+                                                      etag_matches)
+from historical_nodes_registry.subscriptions import (SNAPSHOT_EVENT,
+                                                     SSE_KEEPALIVE_INTERVAL,
+                                                     SSE_MEDIA_TYPE,
+                                                     SnapshotNotifier,
+                                                     format_sse_event,
+                                                     parse_event_id)
 
 # Constants
 HTTP_400_BAD_REQUEST = 400
+HTTP_404_NOT_FOUND = 404
+JSON_MEDIA_TYPE = 'application/json'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
 
 
-def create_server_app() -> FastAPI:
+class RequestBodyReader(io.RawIOBase):
+    """
+    Blocking file-like view of a request body, for parsing it in a worker thread. Each read
+    that runs out of data fetches the next chunk on the event loop, so the body is never
+    buffered whole.
+    """
+
+    def __init__(self, request: Request, loop: asyncio.AbstractEventLoop):
+        self._chunks = request.stream()
+        self._loop = loop
+        self._chunk = memoryview(b'')
+        self._exhausted = False
+
+    def readable(self) -> bool:
+        return True
+
+    async def _next_chunk(self) -> bytes:
+        return await self._chunks.__anext__()
+
+    def readinto(self, buffer) -> int:
+        while not self._chunk and not self._exhausted:
+            try:
+                self._chunk = memoryview(asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result())
+            except StopAsyncIteration:
+                self._exhausted = True
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+def create_server_app(log_path: Optional[str] = None,
+                      state_manager: Optional[RegistryStateManager] = None,
+                      retention: Optional[RetentionPolicy] = None,
+                      history_path: Optional[str] = None) -> FastAPI:
     app = FastAPI()
 
-    state_manager = RegistryStateManager(logging.getLogger('historical_nodes_registry.server'))
+    if state_manager is None:
+        state_manager = RegistryStateManager(logging.getLogger('historical_nodes_registry.server'),
+                                             log_path=log_path,
+                                             retention=retention)
+    if history_path is not None:
+        with open_archive(history_path, 'rb') as stream:
+            state_manager.import_history(read_archive(stream))
+    http_metrics = HttpMetrics(lambda: [route.path for route in app.routes])
+    app.add_middleware(MetricsMiddleware, metrics=http_metrics)
+    registry_metrics = RegistryMetrics(http_metrics, state_manager)
+    response_cache = SnapshotResponseCache()
+    aggregates_cache = StakeAggregatesCache()
+    notifier = SnapshotNotifier()
+    state_manager.add_listener(notifier.publish)
+
+    def encode_snapshot(manager: RegistryStateManager,
+                        timestamp: Optional[float]) -> Tuple[bytes, Optional[str], Optional[float], Optional[float]]:
+        """
+        GET /snapshot/ body, ETag, and timestamps of the resolved and the next snapshot for a
+        query; queries resolving to no stored snapshot are not cached.
+        """
+        snapshot_timestamp, next_timestamp = manager.find_snapshot_interval(timestamp)
+        if snapshot_timestamp is None:
+            body = encode_snapshot_response(*manager.get_snapshot_by_timestamp(timestamp))
+            return body, None, None, next_timestamp
+        encoded = response_cache.get(snapshot_timestamp, manager.get_snapshot_by_timestamp)
+        return encoded.body, encoded.etag, snapshot_timestamp, next_timestamp
 
     async def get_snapshot(
-            timestamp: Optional[int] = None,
+            timestamp: Optional[float] = None,
+            if_none_match: Optional[str] = Header(None),
             manager: RegistryStateManager = Depends(lambda: state_manager),
     ):
         """
         Retrieve the snapshot closest to the given timestamp or the last snapshot if timestamp is None.
 
+        Stored snapshots are served from a cache of pre-encoded bodies with a strong ETag;
+        a matching If-None-Match gets an empty 304.
+        Once a later snapshot exists the response names its timestamp in X-Next-Snapshot-Timestamp,
+        so clients can answer every query in between locally. The answer can then no longer change
+        and is marked immutable, unless retention may still downsample the snapshot away; it is
+        then cacheable only until that can happen.
+
         Args:
-            timestamp (Optional[int]): Query timestamp. If None, retrieves the last snapshot.
+            timestamp (Optional[float]): Query timestamp. If None, retrieves the last snapshot.
+            if_none_match (Optional[str]): ETag of the snapshot the client already holds.
             manager (StateManager): Dependency injection for StateManager.
 
         Returns:
-            dict: The snapshot data.
+            Response: The encoded snapshot data, or 304 Not Modified.
 
         Raises:
             HTTPException: If an error occurs.
         """
         try:
-            timestamp, snapshot = manager.get_snapshot_by_timestamp(timestamp)
-            return dict(timestamp=timestamp,
-                        snapshot=snapshot)
+            body, etag, snapshot_timestamp, next_timestamp = encode_snapshot(manager, timestamp)
+            headers = {}
+            if next_timestamp is not None:
+                headers[NEXT_SNAPSHOT_HEADER] = repr(next_timestamp)
+                lifetime = manager.interval_lifetime(snapshot_timestamp, next_timestamp)
+                headers["Cache-Control"] = (IMMUTABLE_CACHE_CONTROL if lifetime is None
+                                            else f'public, max-age={int(lifetime)}')
+            if etag is None:
+                return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+            headers["ETag"] = etag
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
         except SnapshotQueryError:
             raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail='Snapshot not found.')
 
+    async def get_stake_aggregates(
+            timestamp: Optional[float] = None,
+            threshold_percent: Optional[float] = None,
+            distribution: bool = True,
+            manager: RegistryStateManager = Depends(lambda: state_manager),
+    ):
+        """
+        Retrieve the stake aggregates of the snapshot closest to the given timestamp without its nodes.
+
+        Aggregates are computed once per stored snapshot, so threshold queries cost a bisect.
+
+        Args:
+            timestamp (Optional[float]): Query timestamp. If None, uses the last snapshot.
+            threshold_percent (Optional[float]): Threshold to report the required stake and quorum size for.
+            distribution (bool): Whether to include the stakes sorted largest first.
+            manager (StateManager): Dependency injection for StateManager.
+
+        Returns:
+            dict: Snapshot timestamp, total stake and node count, plus the distribution and quorum fields requested.
+
+        Raises:
+            HTTPException: If threshold_percent is outside [0, 100].
+        """
+        if threshold_percent is not None and not 0 <= threshold_percent <= 100:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail='threshold_percent must be within [0, 100].')
+        snapshot_timestamp = manager.find_snapshot_timestamp(timestamp)
+        if snapshot_timestamp is None:
+            aggregates = compute_stake_aggregates(None)
+        else:
+            aggregates = aggregates_cache.get(snapshot_timestamp, manager.get_snapshot_by_timestamp)
+        return {"timestamp": snapshot_timestamp, **aggregates.to_dict(threshold_percent, distribution)}
+
+    async def get_metrics():
+        """
+        Report request counts, latency and payload size histograms per route, the writer lock
+        wait, the snapshot count and the estimated history size.
+
+        Returns:
+            Response: The metrics in the Prometheus text exposition format.
+        """
+        return Response(content=registry_metrics.render(), media_type=METRICS_MEDIA_TYPE)
+
+    async def get_snapshots_bulk(
+            timestamps: List[Optional[float]] = Body(...),
+            manager: RegistryStateManager = Depends(lambda: state_manager),
+    ):
+        """
+        Retrieve the snapshots for many timestamps in one round trip.
+
+        Args:
+            timestamps (List[Optional[float]]): Query timestamps; null retrieves the last snapshot.
+            manager (StateManager): Dependency injection for StateManager.
+
+        Returns:
+            StreamingResponse: One GET /snapshot/ body per line, in the order of timestamps.
+        """
+
+        def lines():
+            for timestamp in timestamps:
+                body, _, _, _ = encode_snapshot(manager, timestamp)
+                yield body + b'\n'
+
+        return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+    async def get_snapshots_range(
+            start: float,
+            end: Optional[float] = None,
+            manager: RegistryStateManager = Depends(lambda: state_manager),
+    ):
+        """
+        Stream the snapshot in effect at start followed by every snapshot stored up to end.
+
+        Snapshots are rebuilt and encoded one at a time, so the response is never held in memory.
+        Without retention, every interval between consecutive snapshots is final and the response
+        says so in X-Snapshot-Intervals-Final, for clients to cache them.
+
+        Args:
+            start (float): Start of the range.
+            end (Optional[float]): End of the range. If None, streams up to the last snapshot.
+            manager (StateManager): Dependency injection for StateManager.
+
+        Returns:
+            StreamingResponse: One GET /snapshot/ body per line, oldest first.
+        """
+
+        def lines():
+            for timestamp, snapshot in manager.iter_snapshots(start, end):
+                yield encode_snapshot_response(timestamp, snapshot) + b'\n'
+
+        headers = {FINAL_INTERVALS_HEADER: '1'} if manager.retention is None else None
+        return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+    async def get_snapshot_diff(
+            since: Optional[float] = None,
+            until: Optional[float] = None,
+            manager: RegistryStateManager = Depends(lambda: state_manager),
+    ):
+        """
+        Retrieve only the nodes added, changed or removed between two snapshots.
+
+        Args:
+            since (Optional[float]): Timestamp of the snapshot the client holds. If None, diffs from an empty snapshot.
+            until (Optional[float]): Target timestamp. If None, diffs up to the last snapshot.
+            manager (StateManager): Dependency injection for StateManager.
+
+        Returns:
+            Response: The resolved since/timestamp pair with upserted nodes and removed node ids.
+
+        Raises:
+            HTTPException: If since resolves to a snapshot after until.
+        """
+        try:
+            body = encode_diff_response(*manager.get_snapshot_diff(since, until))
+            return Response(content=body, media_type=JSON_MEDIA_TYPE)
+        except ValueError as e:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def subscribe_snapshots(
+            since: Optional[float] = None,
+            last_event_id: Optional[str] = Header(None),
+            manager: RegistryStateManager = Depends(lambda: state_manager),
+    ):
+        """
+        Stream every new snapshot as a server-sent event as soon as it is accepted.
+
+        The current snapshot is sent first unless the client already holds it, as told by
+        `since` or the Last-Event-ID header of a reconnecting EventSource. Event ids are
+        snapshot timestamps and event data is the GET /snapshot/ body.
+
+        Args:
+            since (Optional[float]): Timestamp of the snapshot the client already holds.
+            last_event_id (Optional[str]): Standard SSE reconnection header, same meaning as since.
+            manager (StateManager): Dependency injection for StateManager.
+
+        Returns:
+            StreamingResponse: A text/event-stream of snapshot events.
+        """
+        last_sent_timestamp = since if since is not None else parse_event_id(last_event_id)
+
+        async def event_stream():
+            nonlocal last_sent_timestamp
+            subscription = notifier.subscribe()
+            _, changed = subscription
+            try:
+                while True:
+                    changed.clear()
+                    snapshot_timestamp = manager.find_snapshot_timestamp(None)
+                    if snapshot_timestamp is not None and snapshot_timestamp != last_sent_timestamp:
+                        encoded = response_cache.get(snapshot_timestamp, manager.get_snapshot_by_timestamp)
+                        yield format_sse_event(SNAPSHOT_EVENT, repr(snapshot_timestamp), encoded.body)
+                        last_sent_timestamp = snapshot_timestamp
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=SSE_KEEPALIVE_INTERVAL)
+                    except asyncio.TimeoutError:
+                        yield b': keep-alive\n\n'
+            finally:
+                notifier.unsubscribe(subscription)
+
+        return StreamingResponse(event_stream(),
+                                 media_type=SSE_MEDIA_TYPE,
+                                 headers={"Cache-Control": "no-cache"})
+
     async def add_snapshot(
             nodes_info_snapshot: Dict[str, NodeInfo],
             manager: RegistryStateManager = Depends(lambda: state_manager),
@@ -54,15 +324,87 @@ def create_server_app() -> FastAPI:
             manager (StateManager): Dependency injection for StateManager.
 
         Returns:
-            dict: Success message with timestamp.
+            dict: Success message with the timestamp and version id of the stored snapshot.
 
         Raises:
             HTTPException: If an error occurs.
         """
         try:
-            timestamp = time.time()
-            manager.add_snapshot(nodes_info_snapshot)
-            return {"message": "Snapshot added successfully.", "timestamp": timestamp}
+            snapshot = to_records(nodes_info_snapshot)
+            timestamp = manager.add_snapshot(snapshot)
+            return {"message": "Snapshot added successfully.",
+                    "timestamp": timestamp,
+                    "version": format_version(snapshot_fingerprint(snapshot))}
+        except Exception as e:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def get_node_history(
+            node_id: str,
+            since: Optional[float] = None,
+            until: Optional[float] = None,
+            manager: RegistryStateManager = Depends(lambda: state_manager),
+    ):
+        """
+        Retrieve when a node joined, left and changed its socket, key or stake.
+
+        The first query after new snapshots brings the node index up to date with them, which
+        runs in a worker thread so it does not hold up the event loop.
+
+        Args:
+            node_id (str): Id of the node.
+            since (Optional[float]): Start of the period. If None, from the first snapshot.
+            until (Optional[float]): End of the period. If None, up to the last snapshot.
+            manager (StateManager): Dependency injection for StateManager.
+
+        Returns:
+            dict: The presence intervals overlapping the period, an open one ending in null,
+            and the change timestamps of each field within it.
+
+        Raises:
+            HTTPException: If the node never appeared in the period.
+        """
+        timeline = await run_in_threadpool(manager.get_node_history, node_id, since, until)
+        if timeline is None:
+            raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail='Node not found.')
+        return timeline.to_dict()
+
+    async def export_history(manager: RegistryStateManager = Depends(lambda: state_manager)):
+        """
+        Stream every stored snapshot as a history archive, for replay with POST /history/import.
+
+        Args:
+            manager (StateManager): Dependency injection for StateManager.
+
+        Returns:
+            StreamingResponse: The archive, one delta record per snapshot, oldest first.
+        """
+        return StreamingResponse(encode_archive(manager.export_history()), media_type=ARCHIVE_MEDIA_TYPE)
+
+    async def import_history(
+            request: Request,
+            manager: RegistryStateManager = Depends(lambda: state_manager)):
+        """
+        Bulk-load a history archive after the stored history.
+
+        The body is parsed as it arrives, in a worker thread, so neither the archive nor the
+        import holds up the event loop.
+
+        Args:
+            request (Request): Request whose body is a history archive.
+            manager (StateManager): Dependency injection for StateManager.
+
+        Returns:
+            dict: Success message with the number of imported snapshots and the latest timestamp.
+
+        Raises:
+            HTTPException: If the archive is malformed or does not continue the stored history.
+        """
+        try:
+            body = io.BufferedReader(RequestBodyReader(request, asyncio.get_running_loop()), READ_CHUNK_SIZE)
+            stored = await run_in_threadpool(manager.import_history, read_archive(body))
+            return {"message": "History imported successfully.",
+                    "snapshots": stored,
+                    "timestamp": manager.find_snapshot_timestamp(None)}
         except Exception as e:
             raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -75,24 +417,99 @@ def create_server_app() -> FastAPI:
         except Exception as e:
             raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
 
+    async def update_nodes_info(
+            nodes_info: List[NodeInfo],
+            manager: RegistryStateManager = Depends(lambda: state_manager)):
+        """
+        Apply many node updates atomically as one new snapshot.
+
+        Args:
+            nodes_info (List[NodeInfo]): Updated nodes; a node listed twice takes its last entry.
+            manager (StateManager): Dependency injection for StateManager.
+
+        Returns:
+            dict: Success message with the timestamp of the latest snapshot.
+
+        Raises:
+            HTTPException: If an error occurs.
+        """
+        try:
+            timestamp = manager.update_nodes_info(nodes_info)
+            return {"message": "NodeInfo updated successfully.", "timestamp": timestamp}
+        except Exception as e:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Registering endpoints with add_api_route
+    app.add_api_route(
+        "/metrics",
+        get_metrics,
+        methods=["GET"],
+    )
     app.add_api_route(
         "/snapshot/",
         get_snapshot,
         methods=["GET"],
+    )
+    app.add_api_route(
+        "/snapshot/stake",
+        get_stake_aggregates,
+        methods=["GET"],
         response_model=Dict[str, Any],
     )
+    app.add_api_route(
+        "/snapshot/bulk",
+        get_snapshots_bulk,
+        methods=["POST"],
+    )
+    app.add_api_route(
+        "/snapshot/range",
+        get_snapshots_range,
+        methods=["GET"],
+    )
+    app.add_api_route(
+        "/snapshot/diff",
+        get_snapshot_diff,
+        methods=["GET"],
+    )
+    app.add_api_route(
+        "/snapshot/subscribe",
+        subscribe_snapshots,
+        methods=["GET"],
+    )
     app.add_api_route(
         "/snapshot/",
         add_snapshot,
         methods=["POST"],
         response_model=Dict[str, Any],
     )
+    app.add_api_route(
+        "/nodeInfo/history",
+        get_node_history,
+        methods=["GET"],
+        response_model=Dict[str, Any],
+    )
+    app.add_api_route(
+        "/history/export",
+        export_history,
+        methods=["GET"],
+    )
+    app.add_api_route(
+        "/history/import",
+        import_history,
+        methods=["POST"],
+        response_model=Dict[str, Any],
+    )
     app.add_api_route(
         "/nodeInfo/",
         update_node_info,
         methods=["POST"],
         response_model=Dict[str, Any],
     )
+    app.add_api_route(
+        "/nodeInfo/batch",
+        update_nodes_info,
+        methods=["POST"],
+        response_model=Dict[str, Any],
+    )
 
     return app
@@ -0,0 +1,89 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+from historical_nodes_registry.schema import SnapShotType
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class CachedSnapshot(NamedTuple):
+    start: float
+    end: float
+    snapshot: SnapShotType
+    size: int
+    # time.monotonic() deadline, or None for an interval that never changes
+    expires: Optional[float]
+
+
+class SnapshotIntervalCache:
+    """
+    Client-side LRU of historical snapshots, each valid for the half-open interval of query
+    timestamps [start, end) that the registry resolves to it.
+
+    Only snapshots with a known successor are stored, so appends never make entries stale;
+    entries the registry may still downsample away are stored with the max_age it allows and
+    dropped once that has passed. Entries are accounted by the size of the response they were
+    decoded from and the least recently used ones are evicted once the total exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, lock: Optional[threading.Lock] = None):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[float, CachedSnapshot]" = OrderedDict()
+        # Sorted starts of the entries, for bisect
+        self._starts: List[float] = []
+        # Owners may pass their own lock to guard related state with it
+        self._lock = threading.Lock() if lock is None else lock
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, timestamp: float) -> Optional[SnapShotType]:
+        """Snapshot the registry resolves timestamp to, or None if no cached interval contains it."""
+        with self._lock:
+            idx = bisect.bisect_right(self._starts, timestamp) - 1
+            if idx < 0:
+                return None
+            entry = self._entries[self._starts[idx]]
+            if timestamp >= entry.end:
+                return None
+            if entry.expires is not None and time.monotonic() >= entry.expires:
+                self._remove(entry)
+                return None
+            self._entries.move_to_end(entry.start)
+            return entry.snapshot
+
+    def put(self,
+            start: float,
+            end: float,
+            snapshot: SnapShotType,
+            size: int,
+            max_age: Optional[float] = None) -> None:
+        """Cache snapshot for [start, end), for max_age seconds or, if None, until evicted."""
+        if size > self.max_bytes or not start < end or (max_age is not None and max_age <= 0):
+            return
+        expires = None if max_age is None else time.monotonic() + max_age
+        with self._lock:
+            previous = self._entries.pop(start, None)
+            if previous is None:
+                bisect.insort(self._starts, start)
+            else:
+                self.size_bytes -= previous.size
+            self._entries[start] = CachedSnapshot(start=start, end=end, snapshot=snapshot, size=size, expires=expires)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries.values())))
+
+    def _remove(self, entry: CachedSnapshot) -> None:
+        del self._entries[entry.start]
+        del self._starts[bisect.bisect_left(self._starts, entry.start)]
+        self.size_bytes -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._starts.clear()
+            self.size_bytes = 0
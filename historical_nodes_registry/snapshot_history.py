@@ -0,0 +1,396 @@
+import bisect
+import sys
+import threading
+from array import array
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from historical_nodes_registry.node_history import NodeHistoryIndex
+from historical_nodes_registry.node_record import NodeRecord, RecordSnapshot, snapshot_fingerprint, update_fingerprint
+
+DEFAULT_KEYFRAME_INTERVAL = 256
+
+
+class SnapshotDelta(NamedTuple):
+    """Per-node changes between two consecutive snapshots."""
+    upserts: RecordSnapshot
+    removals: Tuple[str, ...]
+
+    def is_empty(self) -> bool:
+        return not self.upserts and not self.removals
+
+
+def diff_snapshots(old_snapshot: RecordSnapshot, new_snapshot: RecordSnapshot) -> SnapshotDelta:
+    """Nodes that joined or changed in new_snapshot, and nodes that left it, compared by fingerprint."""
+    upserts = {}
+    for node_id, node_record in new_snapshot.items():
+        old_node_record = old_snapshot.get(node_id)
+        if old_node_record is None or old_node_record.fingerprint != node_record.fingerprint:
+            upserts[node_id] = node_record
+    removals = tuple(node_id for node_id in old_snapshot if node_id not in new_snapshot)
+    return SnapshotDelta(upserts=upserts, removals=removals)
+
+
+def apply_delta(snapshot: RecordSnapshot, delta: SnapshotDelta) -> None:
+    """Apply delta to snapshot in place."""
+    for node_id in delta.removals:
+        snapshot.pop(node_id, None)
+    snapshot.update(delta.upserts)
+
+
+def rebuild_entry(store, index: int) -> RecordSnapshot:
+    """Entry index of store rebuilt from its keyframe; a fresh dict the caller may mutate."""
+    keyframe_interval = store.keyframe_interval
+    keyframe_idx = index // keyframe_interval
+    snapshot = dict(store.keyframe(keyframe_idx))
+    for delta_idx in range(keyframe_idx * keyframe_interval + 1, index + 1):
+        apply_delta(snapshot, store.delta(delta_idx))
+    return snapshot
+
+
+def fold_deltas(store, start_index: int, stop_index: int) -> SnapshotDelta:
+    """Single delta equivalent to applying entries start_index..stop_index - 1 of store in order."""
+    upserts = {}
+    removals = set()
+    for delta_idx in range(start_index, stop_index):
+        delta = store.delta(delta_idx)
+        for node_id in delta.removals:
+            upserts.pop(node_id, None)
+            removals.add(node_id)
+        for node_id, node_info in delta.upserts.items():
+            removals.discard(node_id)
+            upserts[node_id] = node_info
+    return SnapshotDelta(upserts=upserts, removals=tuple(removals))
+
+
+class MemorySnapshotStore:
+    """In-process storage backing a SnapshotHistory."""
+
+    def __init__(self, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.timestamps = array('d')
+        self._deltas: List[SnapshotDelta] = []
+        self._keyframes: List[RecordSnapshot] = []
+        # Running estimate of the memory the entries hold, so nbytes() never walks them
+        self._entries_nbytes = 0
+        # Last record counted per key; fields a newer record shares with it are not counted again
+        self._counted: RecordSnapshot = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamp: float, delta: SnapshotDelta, keyframe: Optional[RecordSnapshot] = None) -> None:
+        if keyframe is not None:
+            self._keyframes.append(keyframe)
+            # Its records were counted with the deltas that introduced them
+            self._entries_nbytes += sys.getsizeof(keyframe)
+        self._deltas.append(delta)
+        self.timestamps.append(timestamp)
+        self._entries_nbytes += self._delta_nbytes(delta)
+
+    def _delta_nbytes(self, delta: SnapshotDelta) -> int:
+        size = sys.getsizeof(delta) + sys.getsizeof(delta.upserts) + sys.getsizeof(delta.removals)
+        counted = self._counted
+        for node_id, node_record in delta.upserts.items():
+            previous = counted.get(node_id)
+            if previous is node_record:
+                continue
+            size += sys.getsizeof(node_record)
+            if previous is None:
+                size += sys.getsizeof(node_id) + sum(sys.getsizeof(field) for field in node_record)
+            else:
+                size += sum(sys.getsizeof(field)
+                            for field, previous_field in zip(node_record, previous) if field is not previous_field)
+            counted[node_id] = node_record
+        return size
+
+    def delta(self, index: int) -> SnapshotDelta:
+        return self._deltas[index]
+
+    def keyframe(self, keyframe_idx: int) -> RecordSnapshot:
+        return self._keyframes[keyframe_idx]
+
+    def nbytes(self) -> int:
+        """
+        Estimated memory held by the store: its containers plus every node record and string
+        they reference, counting the fields a record shares with the previous record of its key
+        once. The entries' share is totalled as they are appended, so this is O(1); retention
+        builds its downsampled store by appending too.
+        """
+        return (sys.getsizeof(self.timestamps) + sys.getsizeof(self._deltas) + sys.getsizeof(self._keyframes)
+                + sys.getsizeof(self._counted) + self._entries_nbytes)
+
+    def pending(self) -> bool:
+        return False
+
+    def refresh(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class HistoryGeneration:
+    """
+    Immutable view of a SnapshotHistory as of one write: the first `length` entries of its
+    store and the snapshot after the last of them.
+
+    Stored entries never change and new ones are only appended, so a generation stays valid
+    while later writes publish newer ones; retention publishes a generation over a new store
+    and leaves the old store to generations still in use. Readers take the current generation
+    with a single attribute read and never need the writer's lock; the `latest` mapping must
+    not be mutated. It is rebuilt from the store on first use rather than copied from the
+    writer's head, so publishing costs nothing per node.
+    """
+    __slots__ = ('length', 'last_timestamp', 'fingerprint', '_store', '_latest')
+
+    def __init__(self, store, length: int, fingerprint: int):
+        self._store = store
+        self.length = length
+        self.last_timestamp: Optional[float] = store.timestamps[length - 1] if length else None
+        self.fingerprint = fingerprint
+        self._latest: Optional[RecordSnapshot] = None
+
+    @property
+    def latest(self) -> RecordSnapshot:
+        latest = self._latest
+        if latest is None:
+            # Concurrent first readers may each rebuild it; they get equal snapshots
+            latest = self._latest = rebuild_entry(self._store, self.length - 1) if self.length else {}
+        return latest
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def timestamps(self) -> array:
+        """Timestamps of the store, of which the first `length` belong to this generation."""
+        return self._store.timestamps
+
+    def index_at(self, timestamp: float) -> int:
+        """Index of the last entry at or before timestamp, or -1 if there is none."""
+        return bisect.bisect_right(self._store.timestamps, timestamp, 0, self.length) - 1
+
+    def timestamp_at(self, index: int) -> float:
+        return self._store.timestamps[index]
+
+    def snapshot_at(self, index: int) -> RecordSnapshot:
+        """Rebuild entry index from its nearest preceding keyframe."""
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("snapshot index out of range")
+        if index == self.length - 1:
+            return self.latest
+        return rebuild_entry(self._store, index)
+
+    def delta_between(self, start_index: int, end_index: int) -> SnapshotDelta:
+        """
+        Changes that turn entry start_index into entry end_index; start_index -1 means the empty snapshot.
+
+        Short spans fold the stored deltas; spans longer than a keyframe interval diff the two
+        rebuilt snapshots instead, so the cost is bounded either way.
+        """
+        if not -1 <= start_index <= end_index < self.length:
+            raise IndexError("delta range out of order or out of range")
+        if end_index - start_index > self._store.keyframe_interval:
+            start_snapshot = self.snapshot_at(start_index) if start_index >= 0 else {}
+            return diff_snapshots(start_snapshot, self.snapshot_at(end_index))
+        return fold_deltas(self._store, start_index + 1, end_index + 1)
+
+    def iter_deltas(self) -> Iterator[Tuple[float, SnapshotDelta]]:
+        """Yield (timestamp, delta) for every entry, the first delta being against the empty snapshot."""
+        store = self._store
+        for index in range(self.length):
+            yield store.timestamps[index], store.delta(index)
+
+    def iter_range(self, start_index: int, end_index: int) -> Iterator[Tuple[float, RecordSnapshot]]:
+        """Yield (timestamp, snapshot) for entries start_index..end_index, applying one delta per step."""
+        if start_index > end_index:
+            return
+        if start_index < 0 or end_index >= self.length:
+            raise IndexError("snapshot range out of range")
+        store = self._store
+        timestamps = store.timestamps
+        snapshot = rebuild_entry(store, start_index)
+        yield timestamps[start_index], dict(snapshot)
+        for index in range(start_index + 1, end_index + 1):
+            apply_delta(snapshot, store.delta(index))
+            yield timestamps[index], dict(snapshot)
+
+
+class SnapshotHistory:
+    """
+    Time series of snapshots stored as full keyframes every `keyframe_interval` entries
+    and join/leave/update deltas in between.
+
+    Entry i is rebuilt from keyframe i // keyframe_interval plus at most
+    keyframe_interval - 1 deltas, so reads stay bounded while memory grows with the
+    number of changed nodes rather than with history length times network size.
+    The entries live in a store: MemorySnapshotStore by default, or a durable SnapshotLog.
+
+    Writes must be serialized by the caller. Every write publishes a new HistoryGeneration,
+    which is what readers query; the read methods here are shorthands for the current one.
+    node_index, the per-node join/leave/change index, is built from the stored deltas on first
+    use and caught up with new entries on later uses, so opening a history does not replay it.
+    """
+
+    def __init__(self, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL, store=None):
+        if store is None:
+            if keyframe_interval < 1:
+                raise ValueError("keyframe_interval must be at least 1.")
+            store = MemorySnapshotStore(keyframe_interval=keyframe_interval)
+        self._store = store
+        self.keyframe_interval = store.keyframe_interval
+        # Mutable state after the last entry; never handed out to callers
+        self._head: RecordSnapshot = rebuild_entry(store, len(store) - 1) if len(store) else {}
+        self._node_index: Optional[NodeHistoryIndex] = None
+        # Entries of the store recorded in _node_index so far
+        self._node_index_length = 0
+        self._node_index_lock = threading.Lock()
+        self._head_fingerprint = snapshot_fingerprint(self._head)
+        self.generation = HistoryGeneration(store, len(store), self._head_fingerprint)
+
+    def __len__(self) -> int:
+        return self.generation.length
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def timestamps(self) -> array:
+        """Sorted timestamps of every stored entry, suitable for bisect; may run ahead of the generation."""
+        return self._store.timestamps
+
+    @property
+    def fingerprint(self) -> int:
+        """Content fingerprint of the latest snapshot, kept up to date as deltas are applied."""
+        return self.generation.fingerprint
+
+    @property
+    def node_index(self) -> NodeHistoryIndex:
+        return self.catch_up_node_index()
+
+    def catch_up_node_index(self) -> NodeHistoryIndex:
+        """Build the per-node index or record the entries stored since; safe to call from readers."""
+        with self._node_index_lock:
+            if self._node_index is None:
+                self._node_index = NodeHistoryIndex()
+            self._catch_up_node_index(self._store)
+            return self._node_index
+
+    def _catch_up_node_index(self, store) -> None:
+        stop = len(store)
+        for index in range(self._node_index_length, stop):
+            self._node_index.record(store.timestamps[index], store.delta(index))
+        self._node_index_length = stop
+
+    def index_at(self, timestamp: float) -> int:
+        return self.generation.index_at(timestamp)
+
+    def latest(self) -> RecordSnapshot:
+        return self.generation.latest
+
+    def snapshot_at(self, index: int) -> RecordSnapshot:
+        return self.generation.snapshot_at(index)
+
+    def delta_between(self, start_index: int, end_index: int) -> SnapshotDelta:
+        return self.generation.delta_between(start_index, end_index)
+
+    def iter_range(self, start_index: int, end_index: int) -> Iterator[Tuple[float, RecordSnapshot]]:
+        return self.generation.iter_range(start_index, end_index)
+
+    def append(self, timestamp: float, snapshot: RecordSnapshot) -> bool:
+        """Store snapshot if it differs from the latest one. Returns whether it was stored."""
+        return self.append_delta(timestamp, diff_snapshots(self._head, snapshot))
+
+    def append_delta(self, timestamp: float, delta: SnapshotDelta) -> bool:
+        """Store the snapshot obtained by applying delta to the latest one."""
+        if not self._store_delta(timestamp, delta):
+            return False
+        self._publish()
+        return True
+
+    def extend(self, entries: Iterable[Tuple[float, SnapshotDelta]]) -> int:
+        """
+        Bulk-load (timestamp, delta) entries in order and publish once at the end; entries with
+        empty deltas are skipped as in append_delta. Returns the number of entries stored.
+        """
+        stored = 0
+        try:
+            for timestamp, delta in entries:
+                stored += self._store_delta(timestamp, delta)
+        finally:
+            if stored:
+                self._publish()
+        return stored
+
+    def _store_delta(self, timestamp: float, delta: SnapshotDelta) -> bool:
+        timestamps = self._store.timestamps
+        if timestamps and delta.is_empty():
+            return False
+        if timestamps and timestamp < timestamps[-1]:
+            raise ValueError(f"Timestamp {timestamp} is earlier than the last entry {timestamps[-1]}.")
+
+        self._apply_to_head(delta)
+        keyframe = dict(self._head) if len(timestamps) % self.keyframe_interval == 0 else None
+        self._store.append(timestamp, delta, keyframe)
+        return True
+
+    def replace_store(self, store, copied_length: int) -> None:
+        """
+        Continue on store, which holds this history's first copied_length entries in rewritten
+        form ending in the same snapshot; entries appended since are carried over first.
+
+        The node index records the old store in full before the switch, so it keeps the events
+        of the entries the new store drops; warm it up beforehand to keep that replay short.
+        """
+        if store.keyframe_interval != self.keyframe_interval:
+            raise ValueError("A replacement store must keep the keyframe interval.")
+        old_store = self._store
+        for index in range(copied_length, len(old_store)):
+            keyframe = rebuild_entry(old_store, index) if len(store) % self.keyframe_interval == 0 else None
+            store.append(old_store.timestamps[index], old_store.delta(index), keyframe)
+        with self._node_index_lock:
+            if self._node_index is None:
+                self._node_index = NodeHistoryIndex()
+            self._catch_up_node_index(old_store)
+            self._store = store
+            self._node_index_length = len(store)
+        self._publish()
+
+    def pending(self) -> bool:
+        """Whether another process appended entries that refresh() would load."""
+        return self._store.pending()
+
+    def refresh(self) -> int:
+        """Load entries another process appended to a shared store and advance the latest snapshot."""
+        first_new_index = len(self._store)
+        added = self._store.refresh()
+        for index in range(first_new_index, first_new_index + added):
+            self._apply_to_head(self._store.delta(index))
+        if added:
+            self._publish()
+        return added
+
+    def _publish(self) -> None:
+        # A single reference assignment, so readers see either the old generation or the new one
+        self.generation = HistoryGeneration(self._store, len(self._store), self._head_fingerprint)
+
+    def _apply_to_head(self, delta: SnapshotDelta) -> None:
+        head = self._head
+        replaced = [(node_id, head[node_id])
+                    for node_id in dict.fromkeys((*delta.removals, *delta.upserts)) if node_id in head]
+        self._head_fingerprint = update_fingerprint(self._head_fingerprint, replaced, delta.upserts.items())
+        apply_delta(head, delta)
+
+    def latest_node(self, node_id: str) -> Optional[NodeRecord]:
+        """Record of node_id in the latest snapshot, without copying the snapshot; for writers."""
+        return self._head.get(node_id)
+
+    def delta_at(self, index: int) -> SnapshotDelta:
+        """Changes introduced by entry index relative to the entry before it."""
+        return self._store.delta(index)
+
+    def close(self) -> None:
+        self._store.close()
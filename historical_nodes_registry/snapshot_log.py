@@ -0,0 +1,372 @@
+"""
+Durable append-only storage for the registry history.
+
+The data file starts with a header (magic, format version, keyframe interval) followed by
+records. Every history entry writes one delta record; entries that fall on the keyframe
+interval write a keyframe record right after it. A record is a fixed header
+(kind, timestamp, payload length) followed by length-prefixed node fields. Each node entry
+carries a key flag; entries whose snapshot key differs from the record id also store the key.
+
+A sidecar `<path>.idx` holds one fixed-size (timestamp, delta record offset) pair per
+entry. On startup it is memory-mapped and copied into the timestamp index in bulk, so
+opening the log does not parse any records and stays near-constant as history grows.
+
+A log has a single writer. Other processes may open it read-only and call refresh() to pick
+up the entries it appends, which is how multi-worker registries share one history.
+"""
+import mmap
+import os
+import struct
+from array import array
+from functools import lru_cache
+from typing import Optional
+
+from historical_nodes_registry.node_record import NodeRecord, RecordSnapshot
+from historical_nodes_registry.snapshot_history import (DEFAULT_KEYFRAME_INTERVAL,
+                                                        SnapshotDelta,
+                                                        SnapshotHistory)
+
+LOG_MAGIC = b'ZHNR'
+LOG_VERSION = 2
+FILE_HEADER = struct.Struct('<4sHI')
+RECORD_HEADER = struct.Struct('<BdI')
+INDEX_ENTRY = struct.Struct('<dQ')
+COUNT = struct.Struct('<I')
+FIELD_LENGTH = struct.Struct('<H')
+STAKE_LENGTH = struct.Struct('<B')
+KEY_FLAG = struct.Struct('<B')
+
+RECORD_DELTA = 1
+RECORD_KEYFRAME = 2
+
+KEY_IS_ID = 0
+KEY_FOLLOWS = 1
+
+KEYFRAME_CACHE_SIZE = 16
+
+
+class SnapshotLogError(Exception):
+    """Raised when a snapshot log file is not in the expected format."""
+
+
+def _encode_str(value: str) -> bytes:
+    data = value.encode('utf-8')
+    return FIELD_LENGTH.pack(len(data)) + data
+
+
+def _encode_node_record(node_record: NodeRecord) -> bytes:
+    stake = node_record.stake
+    stake_bytes = stake.to_bytes((stake.bit_length() + 8) // 8, 'little', signed=True)
+    return b''.join((_encode_str(node_record.id),
+                     _encode_str(node_record.public_key_g2),
+                     _encode_str(node_record.address),
+                     _encode_str(node_record.socket),
+                     STAKE_LENGTH.pack(len(stake_bytes)),
+                     stake_bytes))
+
+
+def _encode_entry(key: str, node_record: NodeRecord) -> bytes:
+    if key == node_record.id:
+        return KEY_FLAG.pack(KEY_IS_ID) + _encode_node_record(node_record)
+    return KEY_FLAG.pack(KEY_FOLLOWS) + _encode_node_record(node_record) + _encode_str(key)
+
+
+def _decode_str(buffer, offset: int):
+    (length,) = FIELD_LENGTH.unpack_from(buffer, offset)
+    offset += FIELD_LENGTH.size
+    return str(buffer[offset:offset + length], 'utf-8'), offset + length
+
+
+def _decode_node_record(buffer, offset: int):
+    node_id, offset = _decode_str(buffer, offset)
+    public_key_g2, offset = _decode_str(buffer, offset)
+    address, offset = _decode_str(buffer, offset)
+    socket, offset = _decode_str(buffer, offset)
+    (stake_length,) = STAKE_LENGTH.unpack_from(buffer, offset)
+    offset += STAKE_LENGTH.size
+    stake = int.from_bytes(buffer[offset:offset + stake_length], 'little', signed=True)
+    node_record = NodeRecord.create(node_id, public_key_g2, address, socket, stake)
+    return node_record, offset + stake_length
+
+
+def _decode_entry(buffer, offset: int):
+    """Decode a (key, node record) entry written by _encode_entry."""
+    (key_flag,) = KEY_FLAG.unpack_from(buffer, offset)
+    node_record, offset = _decode_node_record(buffer, offset + KEY_FLAG.size)
+    if key_flag == KEY_IS_ID:
+        return node_record.id, node_record, offset
+    key, offset = _decode_str(buffer, offset)
+    return key, node_record, offset
+
+
+def encode_delta(delta: SnapshotDelta) -> bytes:
+    parts = [COUNT.pack(len(delta.upserts))]
+    parts.extend(_encode_entry(key, node_record) for key, node_record in delta.upserts.items())
+    parts.append(COUNT.pack(len(delta.removals)))
+    parts.extend(_encode_str(node_id) for node_id in delta.removals)
+    return b''.join(parts)
+
+
+def decode_delta(buffer, offset: int) -> SnapshotDelta:
+    (upserts_count,) = COUNT.unpack_from(buffer, offset)
+    offset += COUNT.size
+    upserts = {}
+    for _ in range(upserts_count):
+        key, node_record, offset = _decode_entry(buffer, offset)
+        upserts[key] = node_record
+    (removals_count,) = COUNT.unpack_from(buffer, offset)
+    offset += COUNT.size
+    removals = []
+    for _ in range(removals_count):
+        node_id, offset = _decode_str(buffer, offset)
+        removals.append(node_id)
+    return SnapshotDelta(upserts=upserts, removals=tuple(removals))
+
+
+def encode_keyframe(snapshot: RecordSnapshot) -> bytes:
+    return COUNT.pack(len(snapshot)) + b''.join(_encode_entry(key, node_record) for key, node_record in snapshot.items())
+
+
+def decode_keyframe(buffer, offset: int) -> RecordSnapshot:
+    (nodes_count,) = COUNT.unpack_from(buffer, offset)
+    offset += COUNT.size
+    snapshot = {}
+    for _ in range(nodes_count):
+        key, node_record, offset = _decode_entry(buffer, offset)
+        snapshot[key] = node_record
+    return snapshot
+
+
+class SnapshotLog:
+    """Store for SnapshotHistory backed by an append-only data file and its offset index."""
+
+    def __init__(self,
+                 path: str,
+                 keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                 fsync: bool = False,
+                 readonly: bool = False):
+        self.path = path
+        self.index_path = f'{path}.idx'
+        self._fsync = fsync
+        self._readonly = readonly
+        self.timestamps = array('d')
+        self._offsets = array('Q')
+        self._mmap: Optional[mmap.mmap] = None
+
+        mode = 'rb' if readonly else 'a+b'
+        self._data_file = open(path, mode)
+        self._index_file = open(self.index_path, mode)
+        self._data_file.seek(0, os.SEEK_END)
+        if readonly:
+            self._data_file.seek(0)
+            self._read_header()
+            self.refresh()
+        elif self._data_file.tell() == 0:
+            if keyframe_interval < 1:
+                raise ValueError("keyframe_interval must be at least 1.")
+            self.keyframe_interval = keyframe_interval
+            self._data_file.write(FILE_HEADER.pack(LOG_MAGIC, LOG_VERSION, keyframe_interval))
+            self._data_file.flush()
+            self._index_file.truncate(0)
+        else:
+            self._data_file.seek(0)
+            self._read_header()
+            self._load_index()
+            self._recover_tail()
+        self._keyframe = lru_cache(maxsize=KEYFRAME_CACHE_SIZE)(self._read_keyframe)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def _read_header(self) -> None:
+        magic, version, self.keyframe_interval = FILE_HEADER.unpack(self._data_file.read(FILE_HEADER.size))
+        if magic != LOG_MAGIC or version != LOG_VERSION:
+            raise SnapshotLogError(f"{self.path} is not a version {LOG_VERSION} snapshot log.")
+
+    def _complete_index_size(self) -> int:
+        index_size = os.fstat(self._index_file.fileno()).st_size
+        return index_size - index_size % INDEX_ENTRY.size
+
+    def pending(self) -> bool:
+        """Whether the writer has indexed entries this reader has not loaded yet."""
+        return self._complete_index_size() > len(self._offsets) * INDEX_ENTRY.size
+
+    def refresh(self) -> int:
+        """Load entries appended by the writer since the last refresh. Returns how many were added."""
+        index_size = self._complete_index_size()
+        known_size = len(self._offsets) * INDEX_ENTRY.size
+        if index_size <= known_size:
+            return 0
+        entries = array('Q')
+        entries.frombytes(os.pread(self._index_file.fileno(), index_size - known_size, known_size))
+        # Offsets first: a reader that finds a timestamp must be able to resolve its record
+        self._offsets.extend(entries[1::2])
+        self.timestamps.frombytes(entries[0::2].tobytes())
+        return len(entries) // 2
+
+    def _load_index(self) -> None:
+        index_size = self._complete_index_size()
+        if index_size:
+            with mmap.mmap(self._index_file.fileno(), index_size, access=mmap.ACCESS_READ) as index_map:
+                entries = array('Q')
+                entries.frombytes(index_map)
+            # Entries interleave (timestamp, offset); split them with strided copies
+            self.timestamps.frombytes(entries[0::2].tobytes())
+            self._offsets = entries[1::2]
+        self._index_file.truncate(index_size)
+
+    def _record_end(self, buffer, offset: int) -> int:
+        _, _, payload_length = RECORD_HEADER.unpack_from(buffer, offset)
+        return offset + RECORD_HEADER.size + payload_length
+
+    def _entry_end(self, buffer, index: int, data_size: int) -> int:
+        """End offset of entry index including its keyframe record, or -1 if it is incomplete."""
+        offset = self._offsets[index]
+        if offset + RECORD_HEADER.size > data_size:
+            return -1
+        end = self._record_end(buffer, offset)
+        if index % self.keyframe_interval == 0:
+            if end + RECORD_HEADER.size > data_size or buffer[end] != RECORD_KEYFRAME:
+                return -1
+            end = self._record_end(buffer, end)
+        return end if end <= data_size else -1
+
+    def _recover_tail(self) -> None:
+        """Index complete records written after the last index entry and drop a torn tail."""
+        data_size = os.fstat(self._data_file.fileno()).st_size
+        self._remap(data_size)
+        buffer = self._mmap
+        offset = FILE_HEADER.size
+        while self._offsets:
+            offset = self._entry_end(buffer, len(self._offsets) - 1, data_size)
+            if offset >= 0:
+                break
+            self._offsets.pop()
+            self.timestamps.pop()
+            offset = FILE_HEADER.size if not self._offsets else offset
+        if len(self._offsets) * INDEX_ENTRY.size < os.fstat(self._index_file.fileno()).st_size:
+            self._index_file.truncate(len(self._offsets) * INDEX_ENTRY.size)
+
+        while offset + RECORD_HEADER.size <= data_size:
+            kind, timestamp, payload_length = RECORD_HEADER.unpack_from(buffer, offset)
+            end = offset + RECORD_HEADER.size + payload_length
+            if kind != RECORD_DELTA or end > data_size:
+                break
+            if len(self.timestamps) % self.keyframe_interval == 0:
+                if end + RECORD_HEADER.size > data_size or buffer[end] != RECORD_KEYFRAME:
+                    break
+                keyframe_end = self._record_end(buffer, end)
+                if keyframe_end > data_size:
+                    break
+                end = keyframe_end
+            self._append_index(timestamp, offset)
+            offset = end
+
+        if offset < data_size:
+            self._mmap = None
+            self._data_file.truncate(offset)
+        self._index_file.flush()
+
+    def _remap(self, size: int) -> None:
+        # Readers keep a reference to the previous map, so it is left for the GC to close
+        if size > FILE_HEADER.size:
+            self._mmap = mmap.mmap(self._data_file.fileno(), size, access=mmap.ACCESS_READ)
+
+    def _buffer(self, end: int):
+        buffer = self._mmap
+        if buffer is None or len(buffer) < end:
+            self._data_file.flush()
+            self._remap(os.fstat(self._data_file.fileno()).st_size)
+            buffer = self._mmap
+        return buffer
+
+    def _append_index(self, timestamp: float, offset: int) -> None:
+        self._index_file.write(INDEX_ENTRY.pack(timestamp, offset))
+        self._offsets.append(offset)
+        self.timestamps.append(timestamp)
+
+    def _write_record(self, kind: int, timestamp: float, payload: bytes) -> int:
+        offset = self._data_file.tell()
+        self._data_file.write(RECORD_HEADER.pack(kind, timestamp, len(payload)))
+        self._data_file.write(payload)
+        return offset
+
+    def append(self, timestamp: float, delta: SnapshotDelta, keyframe: Optional[RecordSnapshot] = None) -> None:
+        if self._readonly:
+            raise SnapshotLogError(f"{self.path} is open read-only.")
+        self._data_file.seek(0, os.SEEK_END)
+        offset = self._write_record(RECORD_DELTA, timestamp, encode_delta(delta))
+        if keyframe is not None:
+            self._write_record(RECORD_KEYFRAME, timestamp, encode_keyframe(keyframe))
+        self._data_file.flush()
+        if self._fsync:
+            os.fsync(self._data_file.fileno())
+
+        # The index entry is written last so it never points at an incomplete record
+        self._append_index(timestamp, offset)
+        self._index_file.flush()
+        if self._fsync:
+            os.fsync(self._index_file.fileno())
+
+    def delta(self, index: int) -> SnapshotDelta:
+        offset = self._offsets[index]
+        buffer = self._buffer(offset + RECORD_HEADER.size)
+        buffer = self._buffer(self._record_end(buffer, offset))
+        return decode_delta(buffer, offset + RECORD_HEADER.size)
+
+    def keyframe(self, keyframe_idx: int) -> RecordSnapshot:
+        return self._keyframe(keyframe_idx)
+
+    def _read_keyframe(self, keyframe_idx: int) -> RecordSnapshot:
+        delta_offset = self._offsets[keyframe_idx * self.keyframe_interval]
+        buffer = self._buffer(delta_offset + RECORD_HEADER.size)
+        offset = self._record_end(buffer, delta_offset)
+        buffer = self._buffer(offset + RECORD_HEADER.size)
+        buffer = self._buffer(self._record_end(buffer, offset))
+        return decode_keyframe(buffer, offset + RECORD_HEADER.size)
+
+    def nbytes(self) -> int:
+        """Estimated memory held by the log: its in-memory index plus the mapped data and index files."""
+        return (self.timestamps.itemsize * len(self.timestamps) + self._offsets.itemsize * len(self._offsets)
+                + os.fstat(self._data_file.fileno()).st_size + os.fstat(self._index_file.fileno()).st_size)
+
+    def close(self) -> None:
+        self._mmap = None
+        self._data_file.close()
+        self._index_file.close()
+
+
+def open_snapshot_history(path: str,
+                          keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                          fsync: bool = False,
+                          readonly: bool = False) -> SnapshotHistory:
+    """Open (or create) a durable history at path. An existing log keeps its own keyframe interval."""
+    return SnapshotHistory(store=SnapshotLog(path, keyframe_interval=keyframe_interval, fsync=fsync,
+                                             readonly=readonly))
+
+
+def compact_log(path: str, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> int:
+    """
+    Rewrite the log at path with a keyframe every keyframe_interval entries, dropping any
+    torn tail. No registry process may have the log open while it is compacted.
+    Returns the number of entries written.
+    """
+    compacted_path = f'{path}.compact'
+    for stale_path in (compacted_path, f'{compacted_path}.idx'):
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+    source = SnapshotLog(path)
+    destination = SnapshotHistory(store=SnapshotLog(compacted_path, keyframe_interval=keyframe_interval))
+    try:
+        for index in range(len(source)):
+            destination.append_delta(source.timestamps[index], source.delta(index))
+        entries = len(destination)
+    finally:
+        source.close()
+        destination.close()
+
+    os.replace(f'{compacted_path}.idx', f'{path}.idx')
+    os.replace(compacted_path, path)
+    return entries
+
@@ -0,0 +1,63 @@
+import bisect
+import math
+from fractions import Fraction
+from itertools import accumulate
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from historical_nodes_registry.lru_cache import LRUCache
+from historical_nodes_registry.node_record import RecordSnapshot
+
+
+class StakeAggregates(NamedTuple):
+    """Stake totals of one snapshot, with stakes sorted largest first and their running sums."""
+    total_stake: int
+    node_count: int
+    stakes: Tuple[int, ...]
+    cumulative_stakes: Tuple[int, ...]
+
+    def required_stake(self, threshold_percent: float) -> int:
+        """Smallest stake that reaches threshold_percent of the total."""
+        # Exact arithmetic: stakes are wei-scale integers that a float product would round
+        return math.ceil(self.total_stake * Fraction(str(threshold_percent)) / 100)
+
+    def quorum_size(self, threshold_percent: float) -> Optional[int]:
+        """Fewest nodes whose stake reaches threshold_percent of the total, or None if no set does."""
+        required_stake = self.required_stake(threshold_percent)
+        if required_stake <= 0:
+            return 0
+        size = bisect.bisect_left(self.cumulative_stakes, required_stake) + 1
+        return size if size <= self.node_count else None
+
+    def to_dict(self, threshold_percent: Optional[float] = None, distribution: bool = True) -> dict:
+        body = {"total_stake": self.total_stake, "node_count": self.node_count}
+        if distribution:
+            body["stakes"] = list(self.stakes)
+        if threshold_percent is not None:
+            body["threshold_percent"] = threshold_percent
+            body["required_stake"] = self.required_stake(threshold_percent)
+            body["quorum_size"] = self.quorum_size(threshold_percent)
+        return body
+
+
+def compute_stake_aggregates(snapshot: Optional[RecordSnapshot]) -> StakeAggregates:
+    stakes = tuple(sorted((node_record.stake for node_record in (snapshot or {}).values()), reverse=True))
+    cumulative_stakes = tuple(accumulate(stakes))
+    return StakeAggregates(total_stake=cumulative_stakes[-1] if stakes else 0,
+                           node_count=len(stakes),
+                           stakes=stakes,
+                           cumulative_stakes=cumulative_stakes)
+
+
+class StakeAggregatesCache(LRUCache):
+    """
+    LRU of StakeAggregates keyed by the stored snapshot timestamp.
+
+    Stored snapshots never change, so each one is sorted and summed once and every later
+    threshold query is a bisect over its running sums.
+    """
+
+    def get(self,
+            snapshot_timestamp: float,
+            load_snapshot: Callable[[float], Tuple[float, RecordSnapshot]]) -> StakeAggregates:
+        return self.get_or_compute(snapshot_timestamp,
+                                   lambda: compute_stake_aggregates(load_snapshot(snapshot_timestamp)[1]))
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+from typing import Optional, Set, Tuple
+
+SSE_MEDIA_TYPE = 'text/event-stream'
+SSE_KEEPALIVE_INTERVAL = 15.0
+SNAPSHOT_EVENT = 'snapshot'
+
+Subscription = Tuple[asyncio.AbstractEventLoop, asyncio.Event]
+
+
+class SnapshotNotifier:
+    """
+    Wakes subscribers when the registry accepts a new snapshot.
+
+    Each subscriber owns an asyncio.Event on its event loop; publish() may be called from any
+    thread. Subscribers always read the latest snapshot after waking, so a slow subscriber
+    coalesces bursts of changes instead of queueing them.
+    """
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        subscription = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, _timestamp: Optional[float] = None):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for loop, event in subscriptions:
+            loop.call_soon_threadsafe(event.set)
+
+
+def format_sse_event(event: str, event_id: str, data: bytes) -> bytes:
+    """One server-sent event; data is single-line JSON."""
+    return b''.join((f'id: {event_id}\nevent: {event}\ndata: '.encode('utf-8'), data, b'\n\n'))
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[float]:
+    try:
+        return float(event_id) if event_id else None
+    except ValueError:
+        return None
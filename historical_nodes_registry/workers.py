@@ -0,0 +1,140 @@
+"""
+Multi-process serving mode for the historical nodes registry.
+
+One writer process owns the snapshot log and applies every write. uvicorn read workers open
+the same log read-only, memory-map it and serve GETs from it; they forward writes to the
+writer over a local multiprocessing connection and pick up new entries as soon as the
+writer has indexed them, so every worker sees the same history.
+"""
+import logging
+import multiprocessing
+import os
+import secrets
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI
+
+from historical_nodes_registry.registry_state_manager import RegistryStateManager
+from historical_nodes_registry.node_record import NodeRecord
+from historical_nodes_registry.schema import SnapShotType
+from historical_nodes_registry.server import create_server_app
+
+LOG_PATH_ENV = 'HISTORICAL_NODES_REGISTRY_LOG_PATH'
+WRITER_ADDRESS_ENV = 'HISTORICAL_NODES_REGISTRY_WRITER_ADDRESS'
+WRITER_AUTHKEY_ENV = 'HISTORICAL_NODES_REGISTRY_WRITER_AUTHKEY'
+
+# How often read workers look for entries written through other workers
+FOLLOW_INTERVAL = 0.05
+WRITER_STARTUP_TIMEOUT = 20.0
+
+
+class RegistryWriterError(Exception):
+    """Raised in a read worker when the writer process rejected a forwarded write."""
+
+
+def serve_writer(log_path: str, address: str, authkey: bytes) -> None:
+    """Own the snapshot log and apply writes forwarded by the read workers."""
+    logger = logging.getLogger('historical_nodes_registry.writer')
+    manager = RegistryStateManager(logger, log_path=log_path)
+
+    def handle(connection):
+        with connection:
+            while True:
+                try:
+                    method, argument = connection.recv()
+                except EOFError:
+                    return
+                try:
+                    if method == 'add_snapshot':
+                        connection.send(('ok', manager.add_snapshot(argument)))
+                    elif method == 'update_nodes_info':
+                        connection.send(('ok', manager.update_nodes_info(argument)))
+                    else:
+                        connection.send(('error', f"Unknown writer method {method}."))
+                except Exception as e:
+                    connection.send(('error', str(e)))
+
+    with Listener(address, family='AF_UNIX', authkey=authkey) as listener:
+        logger.info(f"Registry writer listening on {address}")
+        while True:
+            threading.Thread(target=handle, args=(listener.accept(),), daemon=True).start()
+
+
+class RemoteRegistryWriter:
+    """Forwards writes from a read worker to the writer process."""
+
+    def __init__(self, address: str, authkey: bytes):
+        self._connection = Client(address, family='AF_UNIX', authkey=authkey)
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, argument):
+        with self._lock:
+            self._connection.send((method, argument))
+            status, result = self._connection.recv()
+        if status != 'ok':
+            raise RegistryWriterError(result)
+        return result
+
+    def add_snapshot(self, snapshot: SnapShotType) -> float:
+        return self._call('add_snapshot', snapshot)
+
+    def update_nodes_info(self, nodes_info: List[NodeRecord]) -> float:
+        return self._call('update_nodes_info', nodes_info)
+
+
+def follow_writer(manager: RegistryStateManager, interval: float = FOLLOW_INTERVAL) -> None:
+    """Pick up writes made through other workers so subscribers are notified without a request."""
+    while True:
+        manager.refresh()
+        time.sleep(interval)
+
+
+def create_read_worker_app() -> FastAPI:
+    """uvicorn app factory for a read worker, configured through the environment by run_multi_worker_registry_server."""
+    writer = RemoteRegistryWriter(os.environ[WRITER_ADDRESS_ENV], bytes.fromhex(os.environ[WRITER_AUTHKEY_ENV]))
+    manager = RegistryStateManager(logging.getLogger('historical_nodes_registry.server'),
+                                   log_path=os.environ[LOG_PATH_ENV],
+                                   writer=writer)
+    threading.Thread(target=follow_writer, args=(manager,), daemon=True).start()
+    return create_server_app(state_manager=manager)
+
+
+def wait_for_writer(address: str, process: multiprocessing.Process, timeout: float = WRITER_STARTUP_TIMEOUT) -> None:
+    start_time = time.time()
+    while not os.path.exists(address):
+        if not process.is_alive():
+            raise RuntimeError("Registry writer exited during startup.")
+        if time.time() - start_time > timeout:
+            raise TimeoutError(f"Registry writer did not start within {timeout} seconds.")
+        time.sleep(0.05)
+
+
+def run_multi_worker_registry_server(host: str, port: int, workers: int, log_path: Optional[str] = None) -> None:
+    """
+    Serve the registry from `workers` uvicorn processes sharing one writer-owned log.
+    Without log_path the log lives in a temporary directory and history is not kept across runs.
+    Must be called from the main thread, as uvicorn installs signal handlers to supervise workers.
+    """
+    runtime_dir = tempfile.mkdtemp(prefix='historical_nodes_registry_')
+    if log_path is None:
+        log_path = os.path.join(runtime_dir, 'snapshots.log')
+    address = os.path.join(runtime_dir, 'writer.sock')
+    authkey = secrets.token_bytes(16)
+
+    writer_process = multiprocessing.Process(target=serve_writer, args=(log_path, address, authkey), daemon=True)
+    writer_process.start()
+    try:
+        wait_for_writer(address, writer_process)
+        os.environ.update({LOG_PATH_ENV: log_path,
+                           WRITER_ADDRESS_ENV: address,
+                           WRITER_AUTHKEY_ENV: authkey.hex()})
+        uvicorn.run('historical_nodes_registry.workers:create_read_worker_app',
+                    factory=True, host=host, port=port, workers=workers)
+    finally:
+        writer_process.terminate()
+        writer_process.join()
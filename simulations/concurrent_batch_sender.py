@@ -1,53 +1,80 @@
 import asyncio
-import json
 import time
-from uuid import uuid4
+from typing import Iterable
 
 import aiohttp
 
+from simulations.latency_histogram import RESPONSE_TIME, SERVICE_TIME, LatencyReporter
+from simulations.open_loop import CONSTANT_ARRIVALS, DEFAULT_MAX_IN_FLIGHT, OpenLoopScheduler, OpenLoopStats
+from simulations.payload_pool import PayloadPool
+
 
 class BatchSender:
     REQUESTS_PER_SECOND = 150
     BATCH_SIZE = 3
 
-    def __init__(self, logger, app_name):
+    def __init__(self, logger, app_name, latency_reporter: LatencyReporter = None, batch_sizes: Iterable[int] = None):
         self.app_name = app_name
         self._node_sockets = None
         self.logger = logger
         self.shutdown_event = asyncio.Event()
+        # Latencies are aggregated in memory and reported to the logger once per interval
+        self.latency_reporter = latency_reporter or LatencyReporter(sink=logger.log, source=app_name)
+        self._service_time = self.latency_reporter.histogram(SERVICE_TIME)
+        self._response_time = self.latency_reporter.histogram(RESPONSE_TIME)
+        self.payload_pool = PayloadPool(batch_sizes=batch_sizes or [self.BATCH_SIZE],
+                                        transaction={"tx_id": None, "operation": "foo", "t": None},
+                                        id_field="tx_id",
+                                        time_field="t")
 
     def set_node_sockets(self, node_sockets):
         self._node_sockets = node_sockets
 
-    async def send_batch_to_node(self, session: aiohttp.ClientSession, node_url: str):
+    async def send_batch_to_node(self,
+                                 session: aiohttp.ClientSession,
+                                 node_url: str,
+                                 intended_time: float = None) -> bool:
+        """
+        Send one batch. Response time is measured from intended_time, the time.perf_counter()
+        at which the schedule meant the batch to be sent, and defaults to the actual send time.
+        """
         try:
-            t = int(time.time())
-            batch = [{"tx_id": str(uuid4()), "operation": "foo", "t": t} for _ in range(self.BATCH_SIZE)]
-            string_data = json.dumps(batch)
+            body = self.payload_pool.body()
 
             start_time = time.perf_counter()
             async with session.put(
                     url=f"{node_url}/node/{self.app_name}/batches",
-                    data=string_data,
+                    data=body,
                     headers={"Content-Type": "application/json"}
             ) as response:
                 if response.status == 200:
                     end_time = time.perf_counter()
-                    execution_time_ns = (end_time - start_time) * 1_000_000_000
-                    self.logger.log(f"Execution time of client: {execution_time_ns:.0f} ns")
-                    print(f"Batch sent successfully to {node_url} at {time.ctime()}")
-                else:
-                    print(f"Failed to send batch to {node_url} with status code {response.status}")
+                    self._service_time.record(end_time - start_time)
+                    self._response_time.record(end_time - (start_time if intended_time is None else intended_time))
+                    return True
+                print(f"Failed to send batch to {node_url} with status code {response.status}")
         except Exception as error:
             print(f"Error sending batch to {node_url}: {error}")
+        return False
 
     async def send_batches_concurrently(self):
+        self.latency_reporter.start()
+        try:
+            await self._send_batches_closed_loop()
+        finally:
+            await self.latency_reporter.stop()
+
+    async def _send_batches_closed_loop(self):
         async with aiohttp.ClientSession() as session:
+            # Round n is due n seconds after the first, however long the rounds before it took
+            first_round_time = time.perf_counter()
+            round_index = 0
             while not self.shutdown_event.is_set():
-                start_time = time.perf_counter()
+                intended_time = first_round_time + round_index
+                round_index += 1
 
                 tasks = [
-                    self.send_batch_to_node(session, node_url)
+                    self.send_batch_to_node(session, node_url, intended_time=intended_time)
                     for node_url in self._node_sockets
                     for _ in range(self.REQUESTS_PER_SECOND)
                 ]
@@ -55,7 +82,40 @@ class BatchSender:
                 # Run all tasks concurrently
                 await asyncio.gather(*tasks)
 
-                end_time = time.perf_counter()
-
-                time_to_wait = max(0, 1 - (end_time - start_time))
+                # Wait for the next round's due time rather than a second from this round's start,
+                # so a late round does not push back every round after it
+                time_to_wait = max(0, intended_time + 1 - time.perf_counter())
                 await asyncio.sleep(time_to_wait)
+
+    async def send_batches_open_loop(self,
+                                     rate: float = None,
+                                     arrivals: str = CONSTANT_ARRIVALS,
+                                     max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                                     duration: float = None) -> OpenLoopStats:
+        """
+        Send batches at a fixed arrival rate, round-robin over the nodes, whether or not earlier
+        batches have been answered, until duration elapses or shutdown_event is set.
+        rate defaults to REQUESTS_PER_SECOND per node; arrivals is 'constant' or 'poisson'.
+        """
+        node_sockets = list(self._node_sockets)
+        scheduler = OpenLoopScheduler(rate=rate or self.REQUESTS_PER_SECOND * len(node_sockets),
+                                      arrivals=arrivals,
+                                      max_in_flight=max_in_flight)
+        # Size the pool to the in-flight cap so requests never queue inside aiohttp for a connection
+        connector = aiohttp.TCPConnector(limit=max_in_flight)
+        self.latency_reporter.start()
+        try:
+            async with aiohttp.ClientSession(connector=connector) as session:
+                async def send(index: int, intended_time: float) -> bool:
+                    return await self.send_batch_to_node(session, node_sockets[index % len(node_sockets)],
+                                                         intended_time=intended_time)
+
+                stats = await scheduler.run(send, duration=duration, stop_event=self.shutdown_event)
+        finally:
+            await self.latency_reporter.stop()
+
+        report = stats.report()
+        print(f"Offered {report['offered_rate']:.1f} req/s, achieved {report['achieved_rate']:.1f} req/s "
+              f"({report['completed']} completed, {report['failed']} failed, "
+              f"{report['dropped']} dropped at the in-flight cap, {report['late']} sent late)")
+        return stats
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -17,6 +17,18 @@ class SimulationConfig(BaseModel):
         None,
         description="Socket for historical nodes registry",
     )
+    HISTORICAL_NODES_REGISTRY_CPUS: Optional[List[int]] = Field(
+        None,
+        description="CPUs to pin the registry process to, keeping it off the load generator's cores",
+    )
+    HISTORICAL_NODES_REGISTRY_IMPORT_PATH: Optional[str] = Field(
+        None,
+        description="History archive the registry bulk-loads; the simulation then resumes its latest snapshot",
+    )
+    HISTORICAL_NODES_REGISTRY_EXPORT_PATH: Optional[str] = Field(
+        None,
+        description="Where to save the registry history archive once the network transitions are done",
+    )
     ZSEQUENCER_SNAPSHOT_CHUNK: int = Field(10, description="Snapshot chunk size for ZSequencer")
     ZSEQUENCER_REMOVE_CHUNK_BORDER: int = Field(3, description="Chunk border for ZSequencer removal")
     ZSEQUENCER_SEND_BATCH_INTERVAL: float = Field(0.05, description="Interval for sending transactions in ZSequencer")
@@ -3,9 +3,7 @@ import logging
 import os
 import re
 import shutil
-import socket
 import threading
-import time
 from typing import Dict, Tuple
 
 from eigensdk.crypto.bls import attestation
@@ -15,7 +13,7 @@ import simulations.utils as simulations_utils
 from historical_nodes_registry import (NodesRegistryClient,
                                        NodeInfo,
                                        SnapShotType,
-                                       run_registry_server)
+                                       RegistryProcess)
 from simulations.config import SimulationConfig
 
 
@@ -31,7 +29,7 @@ class DisputeAndSwitchSimulation:
 
     def __init__(self, simulation_config: SimulationConfig, logger):
         self.simulation_config = simulation_config
-        self.nodes_registry_thread = None
+        self.nodes_registry_process = None
         self.network_state_handler_thread = None
         self.send_transactions_thread = None
         self.sequencer_address = None
@@ -85,20 +83,6 @@ class DisputeAndSwitchSimulation:
             'env_variables': env_variables
         }
 
-    def wait_nodes_registry_server(self, timeout: float = 20.0, interval: float = 0.5):
-        start_time = time.time()
-        host, port = self.simulation_config.HISTORICAL_NODES_REGISTRY_HOST, self.simulation_config.HISTORICAL_NODES_REGISTRY_PORT
-
-        while time.time() - start_time < timeout:
-            try:
-                with socket.create_connection((host, port), timeout=interval):
-                    self.logger.info(f"Server is up and running on {host}:{port}")
-                    return
-            except (socket.timeout, ConnectionRefusedError):
-                self.logger.info(f"Waiting for server at {host}:{port}...")
-                time.sleep(interval)
-        raise TimeoutError(f"Server did not start within {timeout} seconds.")
-
     def initialize_network(self, nodes_number: int):
         sequencer_address = None
         initialized_network_snapshot: SnapShotType = {}
@@ -134,16 +118,13 @@ class DisputeAndSwitchSimulation:
         self.initialize_network(3)
 
     def run(self):
-        self.nodes_registry_thread = threading.Thread(
-            target=run_registry_server,
-            args=(self.simulation_config.HISTORICAL_NODES_REGISTRY_HOST,
-                  self.simulation_config.HISTORICAL_NODES_REGISTRY_PORT),
-            daemon=True)
-        self.nodes_registry_thread.start()
-
+        self.nodes_registry_process = RegistryProcess(
+            self.simulation_config.HISTORICAL_NODES_REGISTRY_HOST,
+            self.simulation_config.HISTORICAL_NODES_REGISTRY_PORT,
+            cpus=self.simulation_config.HISTORICAL_NODES_REGISTRY_CPUS)
         try:
-            self.wait_nodes_registry_server()
-        except TimeoutError as e:
+            self.nodes_registry_process.start()
+        except (RuntimeError, TimeoutError) as e:
             self.logger.error(f"Error: {e}")
             return
 
@@ -153,7 +134,10 @@ class DisputeAndSwitchSimulation:
 
         self.network_state_handler_thread.start()
         self.network_state_handler_thread.join()
-        self.shutdown_event.wait()
+        try:
+            self.shutdown_event.wait()
+        finally:
+            self.nodes_registry_process.stop()
 
 
 def simulate_dispute_and_switch_without_proxy():
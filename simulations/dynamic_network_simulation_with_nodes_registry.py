@@ -4,7 +4,6 @@ import json
 import os
 import random
 import shutil
-import socket
 import threading
 import time
 from functools import reduce
@@ -19,7 +18,7 @@ import simulations.utils as simulations_utils
 from historical_nodes_registry import (NodesRegistryClient,
                                        NodeInfo,
                                        SnapShotType,
-                                       run_registry_server)
+                                       RegistryProcess)
 from simulations.config import SimulationConfig
 
 
@@ -27,12 +26,14 @@ class DynamicNetworkSimulation:
 
     def __init__(self, simulation_config: SimulationConfig):
         self.simulation_config = simulation_config
-        self.nodes_registry_thread = None
+        self.nodes_registry_process = None
         self.network_transition_thread = None
         self.send_batches_thread = None
+        self.membership_watcher_thread = None
         self.sequencer_address = None
         self.network_nodes_state = None
         self.shutdown_event = threading.Event()
+        self.payload_pool = simulations_utils.create_payload_pool()
         self.nodes_registry_client = NodesRegistryClient(socket=self.simulation_config.HISTORICAL_NODES_REGISTRY_SOCKET)
 
     def get_timeseries_last_node_idx(self):
@@ -92,20 +93,6 @@ class DynamicNetworkSimulation:
             'env_variables': env_variables
         }
 
-    def wait_nodes_registry_server(self, timeout: float = 20.0, interval: float = 0.5):
-        start_time = time.time()
-        host, port = self.simulation_config.HISTORICAL_NODES_REGISTRY_HOST, self.simulation_config.HISTORICAL_NODES_REGISTRY_PORT
-
-        while time.time() - start_time < timeout:
-            try:
-                with socket.create_connection((host, port), timeout=interval):
-                    print(f"Server is up and running on {host}:{port}")
-                    return
-            except (socket.timeout, ConnectionRefusedError):
-                print(f"Waiting for server at {host}:{port}...")
-                time.sleep(interval)
-        raise TimeoutError(f"Server did not start within {timeout} seconds.")
-
     def initialize_network(self, nodes_number: int):
         sequencer_address = None
         initialized_network_snapshot: SnapShotType = {}
@@ -162,6 +149,18 @@ class DynamicNetworkSimulation:
         self.network_nodes_state = next_network_state
         self.nodes_registry_client.add_snapshot(self.network_nodes_state)
 
+    def resume_imported_network(self):
+        """
+        Continue from the latest snapshot of the imported history instead of generating a network.
+        The recorded nodes' keys are not part of the history, so they must already be running.
+        """
+        snapshot = self.nodes_registry_client.get_network_snapshot(None)
+        if not snapshot:
+            print("The imported registry history has no snapshot to start from.")
+            return
+        # The genesis node joins first and keeps its place in every later snapshot
+        self.sequencer_address, self.network_nodes_state = next(iter(snapshot)), snapshot
+
     def simulate_network_nodes_transition(self):
         simulations_utils.delete_directory_contents(self.simulation_config.DST_DIR)
 
@@ -175,6 +174,10 @@ class DynamicNetworkSimulation:
         with open(file=self.simulation_config.APPS_FILE, mode="w", encoding="utf-8") as file:
             file.write(json.dumps({f"{self.simulation_config.APP_NAME}": {"url": "", "public_keys": []}}))
 
+        if self.simulation_config.HISTORICAL_NODES_REGISTRY_IMPORT_PATH is not None:
+            self.resume_imported_network()
+            return
+
         self.initialize_network(self.simulation_config.TIMESERIES_NODES_COUNT[0])
 
         timeseries_nodes_last_idx = self.get_timeseries_last_node_idx()
@@ -184,6 +187,11 @@ class DynamicNetworkSimulation:
                 next_network_nodes_number=self.simulation_config.TIMESERIES_NODES_COUNT[next_network_state_idx],
                 nodes_last_index=timeseries_nodes_last_idx[next_network_state_idx - 1])
 
+        export_path = self.simulation_config.HISTORICAL_NODES_REGISTRY_EXPORT_PATH
+        if export_path is not None:
+            self.nodes_registry_client.export_history(export_path)
+            print(f"Registry history saved to {export_path}")
+
     def simulate_send_batches(self):
         sending_batches_count = 0
         while sending_batches_count < 10:
@@ -193,10 +201,9 @@ class DynamicNetworkSimulation:
                 node_socket = self.network_nodes_state[random_node_address].socket
 
                 try:
-                    string_data = json.dumps(simulations_utils.generate_transactions(random.randint(200, 600)))
                     response: requests.Response = requests.put(
                         url=f"{node_socket}/node/{self.simulation_config.APP_NAME}/batches",
-                        data=string_data,
+                        data=self.payload_pool.body(),
                         headers={"Content-Type": "application/json"},
                     )
                     response.raise_for_status()
@@ -209,20 +216,23 @@ class DynamicNetworkSimulation:
         print('sending batches completed!')
 
     def run(self):
-        self.nodes_registry_thread = threading.Thread(
-            target=run_registry_server,
-            args=(self.simulation_config.HISTORICAL_NODES_REGISTRY_HOST,
-                  self.simulation_config.HISTORICAL_NODES_REGISTRY_PORT),
-            daemon=True)
-        self.nodes_registry_thread.start()
-
+        self.nodes_registry_process = RegistryProcess(
+            self.simulation_config.HISTORICAL_NODES_REGISTRY_HOST,
+            self.simulation_config.HISTORICAL_NODES_REGISTRY_PORT,
+            history_path=self.simulation_config.HISTORICAL_NODES_REGISTRY_IMPORT_PATH,
+            cpus=self.simulation_config.HISTORICAL_NODES_REGISTRY_CPUS)
         try:
-            self.wait_nodes_registry_server()
-        except TimeoutError as e:
+            self.nodes_registry_process.start()
+        except (RuntimeError, TimeoutError) as e:
             print(f"Error: {e}")
             return
         print("Historical Nodes Registry server is running. Press Ctrl+C to stop.")
 
+        self.membership_watcher_thread = threading.Thread(target=simulations_utils.watch_membership_propagation,
+                                                         args=(self.nodes_registry_client, self.shutdown_event),
+                                                         daemon=True)
+        self.membership_watcher_thread.start()
+
         self.network_transition_thread = threading.Thread(target=self.simulate_network_nodes_transition)
         self.send_batches_thread = threading.Thread(target=self.simulate_send_batches)
 
@@ -232,7 +242,10 @@ class DynamicNetworkSimulation:
         self.network_transition_thread.join()
         self.send_batches_thread.join()
 
-        self.shutdown_event.wait()
+        try:
+            self.shutdown_event.wait()
+        finally:
+            self.nodes_registry_process.stop()
 
 
 def simulate_dynamic_network():
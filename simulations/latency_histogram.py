@@ -0,0 +1,206 @@
+"""
+Fixed-memory latency histograms for the load generators.
+
+LatencyHistogram uses HDR-style log-linear buckets over integer microseconds: values below
+2**SUB_BUCKET_BITS get a bucket each, and every further power of two is split into
+2**(SUB_BUCKET_BITS - 1) equal buckets, so any recorded value is known to within
+1 / 2**(SUB_BUCKET_BITS - 1) of itself. Recording is an index computation and a list
+increment; histograms with the same layout merge by adding counts.
+
+LatencyReporter owns named histograms, dumps their percentiles as JSON lines every interval
+and once more at shutdown, so nothing is formatted or written per request. The load
+generators keep two: service time, measured from when a request actually went out, and
+response time, measured from when the schedule meant it to go out. Only the latter includes
+the time a request spent waiting behind earlier ones, which a stalled target causes.
+"""
+import asyncio
+import json
+import math
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+# 128 buckets per power of two, so recorded values are known to within 1/128 (0.78%)
+SUB_BUCKET_BITS = 8
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF_COUNT = SUB_BUCKET_COUNT >> 1
+MAX_TRACKABLE_MICROS = 3_600 * 1_000_000
+REPORT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+REPORT_INTERVAL = 1.0
+SERVICE_TIME = "service"
+RESPONSE_TIME = "response"
+
+
+def bucket_index(value: int) -> int:
+    """Index of the bucket holding a non-negative integer value."""
+    magnitude = value.bit_length() - SUB_BUCKET_BITS
+    if magnitude <= 0:
+        return value
+    return magnitude * SUB_BUCKET_HALF_COUNT + (value >> magnitude)
+
+
+def bucket_upper_bound(index: int) -> int:
+    """Largest value that falls into the bucket at index."""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    magnitude = (index >> (SUB_BUCKET_BITS - 1)) - 1
+    sub_bucket = index - magnitude * SUB_BUCKET_HALF_COUNT
+    return ((sub_bucket + 1) << magnitude) - 1
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in microseconds, covering 0 to max_micros."""
+
+    def __init__(self, max_micros: int = MAX_TRACKABLE_MICROS):
+        self.max_micros = max_micros
+        self.counts = [0] * (bucket_index(max_micros) + 1)
+        self.count = 0
+        self.total_micros = 0
+        self.min_micros = None
+        self.max_recorded_micros = 0
+
+    def record(self, seconds: float) -> None:
+        self.record_micros(int(seconds * 1_000_000))
+
+    def record_micros(self, micros: int) -> None:
+        """Record one value; values beyond max_micros are counted in the last bucket."""
+        if micros < 0:
+            micros = 0
+        elif micros > self.max_micros:
+            micros = self.max_micros
+        self.counts[bucket_index(micros)] += 1
+        self.count += 1
+        self.total_micros += micros
+        if self.min_micros is None or micros < self.min_micros:
+            self.min_micros = micros
+        if micros > self.max_recorded_micros:
+            self.max_recorded_micros = micros
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """Add other's values to this histogram, which must cover the same range."""
+        if other.max_micros != self.max_micros:
+            raise ValueError("Cannot merge latency histograms with different ranges.")
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.count += other.count
+        self.total_micros += other.total_micros
+        if other.min_micros is not None and (self.min_micros is None or other.min_micros < self.min_micros):
+            self.min_micros = other.min_micros
+        self.max_recorded_micros = max(self.max_recorded_micros, other.max_recorded_micros)
+        return self
+
+    def reset(self) -> None:
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total_micros = 0
+        self.min_micros = None
+        self.max_recorded_micros = 0
+
+    def percentile_micros(self, percentile: float) -> int:
+        """Upper bound of the bucket holding the given percentile, capped at the largest recorded value."""
+        if not self.count:
+            return 0
+        # Rounded first so that e.g. 99.9% of 1000 values is rank 999, not 1000 through float error
+        rank = max(1, math.ceil(round(self.count * percentile / 100, 9)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_upper_bound(index), self.max_recorded_micros)
+        return self.max_recorded_micros
+
+    def summary(self, percentiles: Iterable[float] = REPORT_PERCENTILES) -> Dict[str, float]:
+        """Count, mean, percentiles and max in milliseconds."""
+        summary = {"count": self.count,
+                   "mean_ms": self.total_micros / self.count / 1_000 if self.count else 0.0}
+        for percentile in percentiles:
+            summary[f"p{percentile:g}_ms"] = self.percentile_micros(percentile) / 1_000
+        summary["max_ms"] = self.max_recorded_micros / 1_000
+        return summary
+
+    def to_dict(self) -> dict:
+        """Compact form, for sending a histogram to another process; only non-empty buckets are kept."""
+        return {"max_micros": self.max_micros,
+                "counts": {index: count for index, count in enumerate(self.counts) if count},
+                "total_micros": self.total_micros,
+                "min_micros": self.min_micros,
+                "max_recorded_micros": self.max_recorded_micros}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LatencyHistogram':
+        histogram = cls(max_micros=data["max_micros"])
+        for index, count in data["counts"].items():
+            histogram.counts[int(index)] = count
+        histogram.count = sum(data["counts"].values())
+        histogram.total_micros = data["total_micros"]
+        histogram.min_micros = data["min_micros"]
+        histogram.max_recorded_micros = data["max_recorded_micros"]
+        return histogram
+
+
+class LatencyReporter:
+    """
+    Named latency histograms with periodic JSON reports.
+
+    Callers record into histogram(name). Every interval, run() passes sink one JSON line per
+    histogram with the interval's percentiles and folds the interval into the run's total;
+    stop() emits the last interval and the totals.
+    """
+
+    def __init__(self,
+                 names: Iterable[str] = (SERVICE_TIME, RESPONSE_TIME),
+                 sink: Callable[[str], None] = print,
+                 interval: float = REPORT_INTERVAL,
+                 source: Optional[str] = None):
+        self.sink = sink
+        self.interval = interval
+        self.source = source
+        self._histograms = {name: LatencyHistogram() for name in names}
+        self._totals = {name: LatencyHistogram() for name in names}
+        self._task: Optional[asyncio.Task] = None
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        return self._histograms[name]
+
+    def totals(self) -> Dict[str, LatencyHistogram]:
+        """Histograms of everything recorded so far, including the current interval."""
+        return {name: LatencyHistogram().merge(total).merge(self._histograms[name])
+                for name, total in self._totals.items()}
+
+    def _emit(self, scope: str, histograms: Dict[str, LatencyHistogram]) -> None:
+        now = time.time()
+        for name, histogram in histograms.items():
+            report = {"time": now, "scope": scope, "name": name, **histogram.summary()}
+            if self.source is not None:
+                report["source"] = self.source
+            self.sink(json.dumps(report))
+
+    def dump(self) -> None:
+        """Report the current interval and fold it into the totals."""
+        self._emit("interval", self._histograms)
+        for name, histogram in self._histograms.items():
+            self._totals[name].merge(histogram)
+            histogram.reset()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.dump()
+
+    def start(self) -> None:
+        """Start dumping every interval on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the periodic dumps and report the last interval and the totals."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.dump()
+        self._emit("total", self._totals)
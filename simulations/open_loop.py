@@ -0,0 +1,129 @@
+"""
+Open-loop load scheduling.
+
+A closed-loop sender waits for its requests before sending more, so a slow target lowers the
+offered load and hides its own saturation. Here requests are issued on an arrival schedule,
+constant or Poisson, however many are still outstanding. Only a bounded number may be in
+flight: a request due while the cap is reached is dropped and counted rather than queued,
+and one issued well after its due time, because the sender itself fell behind, is counted
+as late.
+"""
+import asyncio
+import itertools
+import random
+import time
+from typing import Awaitable, Callable, Dict, Iterator, Optional
+
+CONSTANT_ARRIVALS = 'constant'
+POISSON_ARRIVALS = 'poisson'
+ARRIVAL_PROCESSES = (CONSTANT_ARRIVALS, POISSON_ARRIVALS)
+DEFAULT_MAX_IN_FLIGHT = 1_000
+DEFAULT_LATE_THRESHOLD = 0.01
+
+# send(index, intended_send_time) -> whether the request succeeded; times are time.perf_counter()
+SendFunction = Callable[[int, float], Awaitable[bool]]
+
+
+def arrival_offsets(rate: float, arrivals: str = CONSTANT_ARRIVALS, rng: Optional[random.Random] = None) -> Iterator[float]:
+    """Seconds after the start at which each request is due: evenly spaced, or exponential gaps for Poisson."""
+    if rate <= 0:
+        raise ValueError("Arrival rate must be positive.")
+    if arrivals == CONSTANT_ARRIVALS:
+        return (index / rate for index in itertools.count())
+    if arrivals == POISSON_ARRIVALS:
+        rng = rng or random.Random()
+        return itertools.accumulate((rng.expovariate(rate) for _ in itertools.count()), initial=0.0)
+    raise ValueError(f"Unknown arrival process {arrivals}; expected one of {ARRIVAL_PROCESSES}.")
+
+
+class OpenLoopStats:
+    """Counters of one open-loop run."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.scheduled = 0
+        self.sent = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.late = 0
+        self.elapsed = 0.0
+
+    def report(self) -> Dict[str, float]:
+        """Offered against achieved rate, plus the raw counters."""
+        elapsed = self.elapsed or float('nan')
+        return {
+            "offered_rate": self.rate,
+            "scheduled_rate": self.scheduled / elapsed,
+            "sent_rate": self.sent / elapsed,
+            "achieved_rate": self.completed / elapsed,
+            "scheduled": self.scheduled,
+            "sent": self.sent,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "late": self.late,
+            "elapsed": self.elapsed,
+        }
+
+
+class OpenLoopScheduler:
+    """Issues send calls at a target arrival rate with at most max_in_flight outstanding."""
+
+    def __init__(self,
+                 rate: float,
+                 arrivals: str = CONSTANT_ARRIVALS,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 late_threshold: float = DEFAULT_LATE_THRESHOLD,
+                 seed: Optional[int] = None):
+        self.rate = rate
+        self.arrivals = arrivals
+        self.max_in_flight = max_in_flight
+        self.late_threshold = late_threshold
+        self._rng = random.Random(seed)
+        arrival_offsets(rate, arrivals)  # validate early
+
+    async def run(self,
+                  send: SendFunction,
+                  duration: Optional[float] = None,
+                  stop_event: Optional[asyncio.Event] = None) -> OpenLoopStats:
+        """Send until duration seconds have been scheduled or stop_event is set, then wait for outstanding requests."""
+        stats = OpenLoopStats(self.rate)
+        in_flight = set()
+
+        async def tracked_send(index: int, intended_time: float):
+            try:
+                succeeded = await send(index, intended_time)
+            except Exception:
+                succeeded = False
+            if succeeded:
+                stats.completed += 1
+            else:
+                stats.failed += 1
+
+        start_time = time.perf_counter()
+        for index, offset in enumerate(arrival_offsets(self.rate, self.arrivals, self._rng)):
+            if duration is not None and offset >= duration:
+                break
+            if stop_event is not None and stop_event.is_set():
+                break
+            intended_time = start_time + offset
+            delay = intended_time - time.perf_counter()
+            # Yield even when behind schedule, so outstanding requests keep making progress
+            await asyncio.sleep(max(0.0, delay))
+
+            stats.scheduled += 1
+            if len(in_flight) >= self.max_in_flight:
+                stats.dropped += 1
+                continue
+            if time.perf_counter() - intended_time > self.late_threshold:
+                stats.late += 1
+            stats.sent += 1
+            task = asyncio.create_task(tracked_send(index, intended_time))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        stats.elapsed = time.perf_counter() - start_time
+        return stats
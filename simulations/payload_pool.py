@@ -0,0 +1,119 @@
+"""
+Pre-rendered batch bodies for the load generators.
+
+Building a batch as fresh dicts with str(uuid4()) ids and json.dumps-ing it costs more CPU
+per request than sending it. A BatchTemplate renders the JSON of a batch once, split into
+constant byte segments around the per-request slots: the transaction ids and, optionally,
+a timestamp. A body is then the template's segment list with the slots filled in, joined in
+a single bytes.join; no per-transaction Python objects are created.
+
+Each id is the pool's random prefix, a per-request counter and the transaction's index in
+the batch, 32 hex digits in all like a uuid4 hex, so ids are unique across requests, batches
+and pools.
+"""
+import json
+import os
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+ID_PREFIX_BYTES = 4
+REQUEST_COUNTER_DIGITS = 16
+SLOT_INDEX_DIGITS = 8
+SLOT_MARKER = '\x00slot\x00'
+DEFAULT_TRANSACTION = {"operation": "foo", "tx_id": None}
+
+
+class BatchTemplate:
+    """
+    JSON body of batch_size copies of transaction, with id_field and time_field left as slots.
+    id_field holds a string id; time_field, if given, an integer Unix time.
+    """
+
+    def __init__(self,
+                 transaction: Dict,
+                 batch_size: int,
+                 id_field: str,
+                 time_field: Optional[str] = None,
+                 id_prefix: str = ''):
+        if batch_size < 1:
+            raise ValueError("Batch size must be positive.")
+        fields = [id_field] if time_field is None else [id_field, time_field]
+        self.batch_size = batch_size
+
+        # Render one transaction with markers in place of the slots and cut it at the markers;
+        # the quotes, the id prefix and the transaction's index go into the constant segments
+        quoted_marker = json.dumps(SLOT_MARKER)
+        rendered = json.dumps({**transaction, **{field: SLOT_MARKER for field in fields}})
+        segments = rendered.split(quoted_marker)
+        if len(segments) != len(fields) + 1:
+            raise ValueError("Transaction template must not contain the slot marker.")
+        order = sorted(fields, key=lambda field: rendered.index(f'{json.dumps(field)}: {quoted_marker}'))
+
+        parts: List[Optional[bytes]] = []
+        pending = '['
+        for index in range(batch_size):
+            if index:
+                pending += ', '
+            for field, segment in zip(order, segments):
+                if field == id_field:
+                    parts += [f'{pending}{segment}"{id_prefix}'.encode(), None]
+                    pending = f'{index:0{SLOT_INDEX_DIGITS}x}"'
+                else:
+                    parts += [f'{pending}{segment}'.encode(), None]
+                    pending = ''
+            pending += segments[-1]
+        parts.append(f'{pending}]'.encode())
+        self._parts = parts
+        stride = 2 * len(fields)
+        self._id_slots = slice(1 + 2 * order.index(id_field), None, stride)
+        self._time_slots = None if time_field is None else slice(1 + 2 * order.index(time_field), None, stride)
+
+    def render(self, request_id: bytes, timestamp: Optional[bytes] = None) -> bytes:
+        """The batch body with every id slot set to request_id and the time slots to timestamp."""
+        parts = self._parts
+        parts[self._id_slots] = [request_id] * self.batch_size
+        if self._time_slots is not None:
+            parts[self._time_slots] = [timestamp] * self.batch_size
+        return b''.join(parts)
+
+
+class PayloadPool:
+    """
+    Batch bodies of the configured sizes with fresh ids on every call.
+
+    Templates are rendered on first use of each size; body() picks a size at random from
+    batch_sizes unless one is given.
+    """
+
+    def __init__(self,
+                 batch_sizes: Iterable[int],
+                 transaction: Dict = DEFAULT_TRANSACTION,
+                 id_field: str = "tx_id",
+                 time_field: Optional[str] = None,
+                 seed: Optional[int] = None):
+        self.batch_sizes = list(batch_sizes)
+        if not self.batch_sizes:
+            raise ValueError("At least one batch size is required.")
+        self.transaction = transaction
+        self.id_field = id_field
+        self.time_field = time_field
+        self.id_prefix = os.urandom(ID_PREFIX_BYTES).hex()
+        self._templates: Dict[int, BatchTemplate] = {}
+        self._rng = random.Random(seed)
+        self._counter = 0
+
+    def template(self, batch_size: int) -> BatchTemplate:
+        template = self._templates.get(batch_size)
+        if template is None:
+            template = self._templates[batch_size] = BatchTemplate(self.transaction, batch_size, self.id_field,
+                                                                  self.time_field, self.id_prefix)
+        return template
+
+    def body(self, batch_size: Optional[int] = None) -> bytes:
+        if batch_size is None:
+            batch_size = self.batch_sizes[0] if len(self.batch_sizes) == 1 else self._rng.choice(self.batch_sizes)
+        self._counter += 1
+        request_id = b'%0*x' % (REQUEST_COUNTER_DIGITS, self._counter)
+        timestamp = None if self.time_field is None else b'%d' % int(time.time())
+        return self.template(batch_size).render(request_id, timestamp)
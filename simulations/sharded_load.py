@@ -0,0 +1,218 @@
+"""
+Multi-process open-loop load generation.
+
+One event loop saturates a core on payload encoding and HTTP handling long before a
+multi-node cluster saturates. ShardedLoadGenerator splits the target rate, the in-flight cap
+and the node sockets across worker processes, each running its own BatchSender with its own
+event loop and connection pool. When they finish, every worker sends its counters and latency
+histograms back through a pipe and the parent merges them into one report.
+
+Usage:
+    python -m simulations.sharded_load --nodes http://127.0.0.1:6001 http://127.0.0.1:6002 --rate 5000 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+from multiprocessing.connection import wait
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from historical_nodes_registry.registry_process import pin_to_cpus
+from simulations.concurrent_batch_sender import BatchSender
+from simulations.latency_histogram import LatencyHistogram, LatencyReporter
+from simulations.open_loop import ARRIVAL_PROCESSES, CONSTANT_ARRIVALS, DEFAULT_MAX_IN_FLIGHT
+
+WORKER_POLL_INTERVAL = 0.1
+COUNTERS = ('scheduled', 'sent', 'completed', 'failed', 'dropped', 'late')
+
+
+class LoadShard(NamedTuple):
+    worker_index: int
+    rate: float
+    max_in_flight: int
+    node_sockets: List[str]
+
+
+def shard_load(rate: float, max_in_flight: int, node_sockets: List[str], workers: int) -> List[LoadShard]:
+    """
+    Split rate and max_in_flight evenly over workers and deal the node sockets out round-robin.
+    With fewer sockets than workers, each worker targets every socket, starting at a different one.
+    """
+    shards = []
+    for worker_index in range(workers):
+        if len(node_sockets) >= workers:
+            sockets = node_sockets[worker_index::workers]
+        else:
+            offset = worker_index % len(node_sockets)
+            sockets = node_sockets[offset:] + node_sockets[:offset]
+        shards.append(LoadShard(worker_index=worker_index,
+                                rate=rate / workers,
+                                max_in_flight=max(1, max_in_flight // workers),
+                                node_sockets=sockets))
+    return shards
+
+
+async def watch_stop_event(stop_event, shutdown_event: asyncio.Event) -> None:
+    while not stop_event.is_set():
+        await asyncio.sleep(WORKER_POLL_INTERVAL)
+    shutdown_event.set()
+
+
+async def run_shard(shard: LoadShard, app_name: str, arrivals: str, duration: Optional[float],
+                    batch_sizes: Optional[List[int]], stop_event) -> dict:
+    # Interval reports are left to the parent; the worker only keeps totals
+    latency_reporter = LatencyReporter(sink=lambda line: None, interval=3_600)
+    sender = BatchSender(logger=None, app_name=app_name, latency_reporter=latency_reporter, batch_sizes=batch_sizes)
+    sender.set_node_sockets(shard.node_sockets)
+    watcher = asyncio.create_task(watch_stop_event(stop_event, sender.shutdown_event))
+    try:
+        stats = await sender.send_batches_open_loop(rate=shard.rate,
+                                                    arrivals=arrivals,
+                                                    max_in_flight=shard.max_in_flight,
+                                                    duration=duration)
+    finally:
+        watcher.cancel()
+    return {"worker_index": shard.worker_index,
+            "stats": stats.report(),
+            "histograms": {name: histogram.to_dict() for name, histogram in latency_reporter.totals().items()}}
+
+
+def load_worker(results, shard: LoadShard, app_name: str, arrivals: str, duration: Optional[float],
+                batch_sizes: Optional[List[int]], stop_event, cpus: Optional[Iterable[int]]) -> None:
+    """Entry point of a worker process: run its shard and send the result through results."""
+    pin_to_cpus(cpus)
+    try:
+        results.send(asyncio.run(run_shard(shard, app_name, arrivals, duration, batch_sizes, stop_event)))
+    finally:
+        results.close()
+
+
+def merge_results(results: List[dict]) -> dict:
+    """Sum the workers' counters and rates and merge their histograms into one report."""
+    histograms: Dict[str, LatencyHistogram] = {}
+    for result in results:
+        for name, data in result["histograms"].items():
+            histogram = LatencyHistogram.from_dict(data)
+            if name in histograms:
+                histograms[name].merge(histogram)
+            else:
+                histograms[name] = histogram
+
+    stats = [result["stats"] for result in results]
+    elapsed = max(worker_stats["elapsed"] for worker_stats in stats)
+    report = {
+        "workers": len(results),
+        "offered_rate": sum(worker_stats["offered_rate"] for worker_stats in stats),
+        "achieved_rate": sum(worker_stats["completed"] for worker_stats in stats) / elapsed,
+        "elapsed": elapsed,
+    }
+    for counter in COUNTERS:
+        report[counter] = sum(worker_stats[counter] for worker_stats in stats)
+    report["latency"] = {name: histogram.summary() for name, histogram in histograms.items()}
+    report["worker_achieved_rates"] = [result["stats"]["achieved_rate"]
+                                       for result in sorted(results, key=lambda result: result["worker_index"])]
+    return report
+
+
+class ShardedLoadGenerator:
+    """
+    Open-loop batch load at a total rate, spread over worker processes.
+
+    run() starts the workers with the spawn method, waits for all of them to finish their
+    duration (or for stop() from another thread) and returns the merged report. With cpus,
+    worker i is pinned to cpus[i % len(cpus)].
+    """
+
+    def __init__(self,
+                 app_name: str,
+                 node_sockets: List[str],
+                 rate: float,
+                 workers: int,
+                 arrivals: str = CONSTANT_ARRIVALS,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 duration: Optional[float] = None,
+                 batch_sizes: Optional[List[int]] = None,
+                 cpus: Optional[List[int]] = None):
+        if workers < 1:
+            raise ValueError("At least one worker is required.")
+        self.app_name = app_name
+        self.arrivals = arrivals
+        self.duration = duration
+        self.batch_sizes = batch_sizes
+        self.cpus = cpus
+        self.shards = shard_load(rate, max_in_flight, list(node_sockets), workers)
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = self._context.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> dict:
+        processes, connections = [], []
+        for shard in self.shards:
+            results, child_results = self._context.Pipe(duplex=False)
+            cpus = None if self.cpus is None else [self.cpus[shard.worker_index % len(self.cpus)]]
+            process = self._context.Process(target=load_worker,
+                                            args=(child_results, shard, self.app_name, self.arrivals,
+                                                  self.duration, self.batch_sizes, self._stop_event, cpus),
+                                            name=f'load-worker-{shard.worker_index}',
+                                            daemon=True)
+            process.start()
+            child_results.close()
+            processes.append(process)
+            connections.append(results)
+
+        worker_results = []
+        try:
+            pending = list(connections)
+            while pending:
+                for connection in wait(pending):
+                    pending.remove(connection)
+                    try:
+                        worker_results.append(connection.recv())
+                    except EOFError:
+                        pass
+        except KeyboardInterrupt:
+            self.stop()
+            raise
+        finally:
+            for process in processes:
+                process.join()
+            for connection in connections:
+                connection.close()
+
+        if len(worker_results) != len(processes):
+            failed = [process.name for process in processes if process.exitcode != 0]
+            raise RuntimeError(f"Load workers exited without a result: {', '.join(failed)}")
+        return merge_results(worker_results)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Send open-loop batch load from several processes.")
+    parser.add_argument("--nodes", type=str, nargs="+", required=True, help="Node base URLs to send batches to.")
+    parser.add_argument("--app-name", type=str, default="simple_app", help="App the batches are sent for.")
+    parser.add_argument("--rate", type=float, required=True, help="Total batches per second over all workers.")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Worker processes.")
+    parser.add_argument("--arrivals", choices=ARRIVAL_PROCESSES, default=CONSTANT_ARRIVALS,
+                        help="Evenly spaced or Poisson arrivals.")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Outstanding requests allowed over all workers.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=None,
+                        help="Transactions per batch, picked at random per request; BatchSender.BATCH_SIZE by default.")
+    parser.add_argument("--cpus", type=int, nargs="+", default=None, help="CPUs to pin the workers to.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    generator = ShardedLoadGenerator(app_name=args.app_name,
+                                     node_sockets=args.nodes,
+                                     rate=args.rate,
+                                     workers=args.workers,
+                                     arrivals=args.arrivals,
+                                     max_in_flight=args.max_in_flight,
+                                     duration=args.duration,
+                                     batch_sizes=args.batch_sizes,
+                                     cpus=args.cpus)
+    print(json.dumps(generator.run(), indent=2))
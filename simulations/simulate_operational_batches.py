@@ -4,7 +4,6 @@ import json
 import os
 import random
 import shutil
-import socket
 import threading
 import time
 from functools import reduce
@@ -19,7 +18,7 @@ import simulations.utils as simulations_utils
 from historical_nodes_registry import (NodesRegistryClient,
                                        NodeInfo,
                                        SnapShotType,
-                                       run_registry_server)
+                                       RegistryProcess)
 from simulations.config import SimulationConfig
 
 
@@ -27,12 +26,14 @@ class DynamicNetworkSimulation:
 
     def __init__(self, simulation_config: SimulationConfig):
         self.simulation_config = simulation_config
-        self.nodes_registry_thread = None
+        self.nodes_registry_process = None
         self.network_transition_thread = None
         self.send_batches_thread = None
+        self.membership_watcher_thread = None
         self.sequencer_address = None
         self.network_nodes_state = None
         self.shutdown_event = threading.Event()
+        self.payload_pool = simulations_utils.create_payload_pool()
         self.nodes_registry_client = NodesRegistryClient(socket=self.simulation_config.HISTORICAL_NODES_REGISTRY_SOCKET)
 
     def get_timeseries_last_node_idx(self):
@@ -91,20 +92,6 @@ class DynamicNetworkSimulation:
             'env_variables': env_variables
         }
 
-    def wait_nodes_registry_server(self, timeout: float = 20.0, interval: float = 0.5):
-        start_time = time.time()
-        host, port = self.simulation_config.HISTORICAL_NODES_REGISTRY_HOST, self.simulation_config.HISTORICAL_NODES_REGISTRY_PORT
-
-        while time.time() - start_time < timeout:
-            try:
-                with socket.create_connection((host, port), timeout=interval):
-                    print(f"Server is up and running on {host}:{port}")
-                    return
-            except (socket.timeout, ConnectionRefusedError):
-                print(f"Waiting for server at {host}:{port}...")
-                time.sleep(interval)
-        raise TimeoutError(f"Server did not start within {timeout} seconds.")
-
     def initialize_network(self, nodes_number: int):
         sequencer_address = None
         initialized_network_snapshot: SnapShotType = {}
@@ -187,10 +174,9 @@ class DynamicNetworkSimulation:
                 node_socket = self.network_nodes_state[random_node_address].socket
 
                 try:
-                    string_data = json.dumps(simulations_utils.generate_transactions(random.randint(200, 600)))
                     response: requests.Response = requests.put(
                         url=f"{node_socket}/node/{self.simulation_config.APP_NAME}/batches",
-                        data=string_data,
+                        data=self.payload_pool.body(),
                         headers={"Content-Type": "application/json"},
                     )
                     response.raise_for_status()
@@ -203,20 +189,22 @@ class DynamicNetworkSimulation:
         print('sending batches completed!')
 
     def run(self):
-        self.nodes_registry_thread = threading.Thread(
-            target=run_registry_server,
-            args=(self.simulation_config.HISTORICAL_NODES_REGISTRY_HOST,
-                  self.simulation_config.HISTORICAL_NODES_REGISTRY_PORT),
-            daemon=True)
-        self.nodes_registry_thread.start()
-
+        self.nodes_registry_process = RegistryProcess(
+            self.simulation_config.HISTORICAL_NODES_REGISTRY_HOST,
+            self.simulation_config.HISTORICAL_NODES_REGISTRY_PORT,
+            cpus=self.simulation_config.HISTORICAL_NODES_REGISTRY_CPUS)
         try:
-            self.wait_nodes_registry_server()
-        except TimeoutError as e:
+            self.nodes_registry_process.start()
+        except (RuntimeError, TimeoutError) as e:
             print(f"Error: {e}")
             return
         print("Historical Nodes Registry server is running. Press Ctrl+C to stop.")
 
+        self.membership_watcher_thread = threading.Thread(target=simulations_utils.watch_membership_propagation,
+                                                         args=(self.nodes_registry_client, self.shutdown_event),
+                                                         daemon=True)
+        self.membership_watcher_thread.start()
+
         self.network_transition_thread = threading.Thread(target=self.simulate_network_nodes_transition)
         self.send_batches_thread = threading.Thread(target=self.simulate_send_batches)
 
@@ -226,7 +214,10 @@ class DynamicNetworkSimulation:
         self.network_transition_thread.join()
         self.send_batches_thread.join()
 
-        self.shutdown_event.wait()
+        try:
+            self.shutdown_event.wait()
+        finally:
+            self.nodes_registry_process.stop()
 
 
 def simulate_dynamic_network():
@@ -4,15 +4,21 @@ import random
 import secrets
 import shutil
 import string
+import threading
+import time
 from uuid import uuid4
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any
 
 from eigensdk.crypto.bls import attestation
 from pydantic import BaseModel
 
 import config
+from historical_nodes_registry import NodesRegistryClient
+from simulations.payload_pool import PayloadPool
 from terminal_exeuction import run_command_on_terminal
 
+TRANSACTION_TEMPLATE = {"operation": "foo", "serial": None, "version": 6}
+
 
 class Keys(BaseModel):
     bls_private_key: str
@@ -87,3 +93,21 @@ def generate_transactions(batch_size: int) -> List[Dict]:
             "version": 6,
         } for _ in range(batch_size)
     ]
+
+
+def create_payload_pool(batch_sizes: Iterable[int] = range(200, 601)) -> PayloadPool:
+    """Pre-rendered bodies of batches shaped like generate_transactions, sized from batch_sizes."""
+    return PayloadPool(batch_sizes=batch_sizes, transaction=TRANSACTION_TEMPLATE, id_field="serial")
+
+
+def watch_membership_propagation(nodes_registry_client: NodesRegistryClient, shutdown_event: threading.Event) -> None:
+    """Log how long each membership change accepted from now on takes to reach a registry subscriber."""
+    # The subscription opens with the current snapshot, accepted before the watch began; its
+    # age is not a propagation time
+    watch_start = time.time()
+    for timestamp, snapshot in nodes_registry_client.subscribe_snapshots():
+        if timestamp >= watch_start:
+            propagation_ms = (time.time() - timestamp) * 1000
+            print(f"Membership change at {timestamp} ({len(snapshot)} nodes) propagated in {propagation_ms:.1f} ms")
+        if shutdown_event.is_set():
+            return
@@ -4,8 +4,11 @@ import string
 import time
 import aiohttp
 
+from simulations.latency_histogram import RESPONSE_TIME, SERVICE_TIME, LatencyReporter
+
 # Number of requests and concurrency level
 TOTAL_REQUESTS = 3
+TARGET_RATE = 3  # requests per second the schedule sends at
 CONCURRENT_REQUESTS = 3
 
 # Target URL with dynamic app_name
@@ -17,21 +20,30 @@ def generate_random_string(length=10):
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
 
-async def send_batch(session, semaphore):
-    """Send a batch (POST request) to the server with form data."""
+async def send_batch(session, semaphore, latency_reporter, intended_time):
+    """
+    Send a batch (POST request) to the server with form data.
+    Response time counts from intended_time, so it includes any wait for the semaphore.
+    """
+    await asyncio.sleep(max(0.0, intended_time - time.perf_counter()))
     async with semaphore:
         batch_data = {
             'simple_app': [generate_random_string() for _ in range(1000)]
         }
         headers = {"Content-Type": "application/json"}
 
+        start_time = time.perf_counter()
         async with session.put(URL, json=batch_data, headers=headers) as response:
-            return await response.text()
+            text = await response.text()
+        end_time = time.perf_counter()
+        latency_reporter.histogram(SERVICE_TIME).record(end_time - start_time)
+        latency_reporter.histogram(RESPONSE_TIME).record(end_time - intended_time)
+        return text
 
 
-async def worker(semaphore, session, results):
+async def worker(semaphore, session, results, latency_reporter, intended_time):
     """Worker that sends requests while respecting concurrency limits."""
-    response = await send_batch(session, semaphore)
+    response = await send_batch(session, semaphore, latency_reporter, intended_time)
     results.append(response)
 
 
@@ -39,13 +51,18 @@ async def stress_test():
     """Main function to send requests concurrently."""
     semaphore = asyncio.Semaphore(CONCURRENT_REQUESTS)  # Limit concurrency
     results = []
+    latency_reporter = LatencyReporter()
 
     async with aiohttp.ClientSession() as session:
-        tasks = [worker(semaphore, session, results) for _ in range(TOTAL_REQUESTS)]
+        schedule_start = time.perf_counter()
+        tasks = [worker(semaphore, session, results, latency_reporter, schedule_start + index / TARGET_RATE)
+                 for index in range(TOTAL_REQUESTS)]
 
+        latency_reporter.start()
         start_time = time.time()
         await asyncio.gather(*tasks)
         end_time = time.time()
+        await latency_reporter.stop()
 
     print(f"Completed {len(results)} requests in {end_time - start_time:.2f} seconds")
     print(f"Requests per second: {len(results) / (end_time - start_time):.2f}")
@@ -0,0 +1,79 @@
+import logging
+import socket
+import threading
+import time
+
+import requests
+import uvicorn
+
+from historical_nodes_registry.history_archive import encode_archive
+from historical_nodes_registry.node_record import NodeRecord
+from historical_nodes_registry.registry_state_manager import IMPORT_BATCH_SIZE, RegistryStateManager
+from historical_nodes_registry.server import create_server_app
+from historical_nodes_registry.snapshot_history import SnapshotDelta
+
+REQUEST_TIMEOUT = 10
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def node_record(index: int, stake: int) -> NodeRecord:
+    return NodeRecord.create(f'node-{index}', f'key-{index}', f'address-{index}', f'localhost:{9000 + index}', stake)
+
+
+def history_entries(count: int):
+    # Recorded ahead of the wall clock, so a snapshot posted mid-import is stamped between
+    # two batches and the rest of the archive still continues it
+    start = time.time() + 1e6
+    for index in range(count):
+        yield start + index, SnapshotDelta({f'node-{index % 10}': node_record(index % 10, index)}, ())
+
+
+def test_snapshot_is_added_during_slow_import():
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    manager = RegistryStateManager(logging.getLogger('test_history_import'))
+    server = uvicorn.Server(uvicorn.Config(create_server_app(state_manager=manager), port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    entry_count = 3 * IMPORT_BATCH_SIZE
+    chunks = list(encode_archive(history_entries(entry_count)))
+    first_half_sent = threading.Event()
+    snapshot_added = threading.Event()
+
+    def slow_body():
+        # Stall mid-archive until the concurrent write is done, as a slow upload would
+        middle = len(chunks) // 2
+        yield b''.join(chunks[:middle])
+        first_half_sent.set()
+        snapshot_added.wait(REQUEST_TIMEOUT)
+        yield b''.join(chunks[middle:])
+
+    import_responses = []
+
+    def upload():
+        import_responses.append(requests.post(f'{url}/history/import', data=slow_body(), timeout=REQUEST_TIMEOUT))
+
+    uploader = threading.Thread(target=upload)
+    uploader.start()
+    try:
+        assert first_half_sent.wait(REQUEST_TIMEOUT)
+        time.sleep(0.2)
+        node = node_record(99, 1).to_dict()
+        response = requests.post(f'{url}/snapshot/', json={node['id']: node}, timeout=REQUEST_TIMEOUT)
+        assert response.status_code == 200
+        assert requests.get(f'{url}/metrics', timeout=REQUEST_TIMEOUT).status_code == 200
+    finally:
+        snapshot_added.set()
+        uploader.join(2 * REQUEST_TIMEOUT)
+        server.should_exit = True
+
+    assert import_responses and import_responses[0].status_code == 200
+    assert import_responses[0].json()['snapshots'] == entry_count
+    assert sum(1 for _ in manager.export_history()) == entry_count + 1